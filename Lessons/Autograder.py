@@ -0,0 +1,473 @@
+#!/usr/bin/env python3
+################################################################################
+# This file contains a batch autograder, for running the lesson exercise       #
+# checkers on many student submissions at once. Run it from a terminal, e.g.:  #
+#                                                                              #
+#   python3 Autograder.py path/to/submissions --workers 8                      #
+#                                                                              #
+# where each folder in 'submissions' holds one student's Lx_1_exercises.py     #
+# files (in any sub-folder layout). Use --help for the full set of options.    #
+# Adding --calibrate first runs each checker's reference solutions, to record  #
+# baseline test times for adaptive timeouts (see TestRun docs).                #
+################################################################################
+
+import argparse # command-line interface
+import concurrent.futures # threads waiting on grading processes in parallel
+import importlib # for loading preloaded modules by name
+import importlib.util # for loading submissions and checkers from file paths
+import json # adding student details to machine-readable results
+import multiprocessing # grading each submission in a killable process
+import os
+import re
+import signal # killing grading processes along with their test processes
+import subprocess # running checkers as scripts for calibration
+import sys
+import time
+import traceback
+
+LESSONS_DIR = os.path.dirname(os.path.abspath(__file__))
+if LESSONS_DIR not in sys.path:
+    sys.path.append(LESSONS_DIR)
+from TestRun import TestRun, TestGroup, TestPrint, WorkerPool, Redirect
+
+
+class Autograder(object):
+    ''' A class for grading many student submissions with the lesson checkers.
+    '''
+    EXERCISES = re.compile(r'^L(\d+)_1_exercises\.py$')
+    LESSON_DIRS = re.compile(r'^L(\d+)$') # lesson folders
+    # runs the checker at sys.argv[1] as a script, recording test baselines
+    CALIBRATE = ('import sys, runpy; sys.path.insert(0, {!r}); '
+                 'from TestRun import TestRun; TestRun.calibrate = True; '
+                 "runpy.run_path(sys.argv[1], run_name='__main__')")
+    LOADED = 'loaded' # sent by a grading process once the submission loads
+
+    def __init__(self, submissions, lessons=None, workers=None, preload=(),
+                 memory_limit=None, cpu_limit=None, load_timeout=10,
+                 grade_timeout=600):
+        ''' A batch grader for a folder of student submissions.
+
+        'submissions' is a folder containing one folder per student. Each
+            student's folder is searched (recursively) for exercise files named
+            as in the course (e.g. 'L6_1_exercises.py'), which are graded with
+            the matching checker (e.g. 'L6/L6_2_exercise_checker.py').
+
+        'lessons' is an iterable of lesson numbers to grade. If left as None,
+            all exercise files found are graded.
+
+        'workers' is the number of submissions graded at the same time. If left
+            as None, it is set to the number of CPUs.
+
+        'preload' is an iterable of module names (e.g. 'numpy') to import once
+            before grading, so grading processes started by forking don't
+            import them again for every submission.
+
+        'memory_limit' and 'cpu_limit' are the extra bytes of memory and the
+            CPU seconds each test (and loading each submission) may use (see
+            TestRun docs), so one submission can't slow down grading for
+            everyone else. If left as None, tests are only limited by their
+            timeouts.
+
+        'load_timeout' is the number of seconds a submission may take to load
+            (i.e. to run its module-level code), and 'grade_timeout' the number
+            of seconds grading a submission may take in total. Submissions
+            which take longer are stopped, and graded as timed out.
+
+        Every submission is loaded and tested in a new process (see grade),
+            so it can be stopped if it takes too long without affecting the
+            other submissions, and its tests are run with the submission's
+            folder as the working directory, so fixture files from different
+            students never clash.
+
+        Constructor: Autograder(str, *iterable[int], *int, *iterable[str],
+                                *int, *int, *float, *float)
+
+        '''
+        self._submissions = submissions
+        self._lessons = None if lessons is None else set(lessons)
+        self._workers = workers or os.cpu_count() or 1
+        self._preload = tuple(preload)
+        self._limits = (memory_limit, cpu_limit)
+        self._timeouts = (load_timeout, grade_timeout)
+
+    def find_jobs(self):
+        ''' Returns the (student, lesson, exercise_path) jobs to grade, sorted.
+
+        self.find_jobs() -> list[tuple(str, int, str)]
+
+        '''
+        jobs = []
+        for student in sorted(os.listdir(self._submissions)):
+            student_dir = os.path.join(self._submissions, student)
+            if not os.path.isdir(student_dir):
+                continue
+            for folder, _, files in os.walk(student_dir):
+                for name in files:
+                    match = Autograder.EXERCISES.match(name)
+                    if not match:
+                        continue
+                    lesson = int(match.group(1))
+                    if self._lessons is None or lesson in self._lessons:
+                        jobs.append((student, lesson,
+                                     os.path.join(folder, name)))
+        return sorted(jobs)
+
+    def run(self):
+        ''' Yields the result of grading each job, in find_jobs order.
+
+        Jobs are graded in parallel, and each result is yielded as soon as it
+            and all earlier jobs are finished. Results are tuples of
+            (student, lesson, num_tests, passes, output, records), where output
+            is the text that running the checker would have printed, and
+            records is the JSON Lines results of the checker's tests (see
+            TestRun.run_tests). Submissions which couldn't be graded in time
+            have a single record of 'type': 'grading', with the 'status'
+            TestRun.TIMEOUT and a 'message' (see grade).
+
+        self.run() -> generator[tuple(str, int, int, int, str, str)]
+
+        '''
+        jobs = self.find_jobs()
+        for module_name in self._preload:
+            importlib.import_module(module_name) # inherited when forking
+        # each thread waits for one grading process at a time, which grade
+        #  stops if it takes too long, so no job can hold up the others
+        with concurrent.futures.ThreadPoolExecutor(self._workers) as executor:
+            try:
+                futures = [executor.submit(Autograder.grade, lesson, path,
+                                           *self._timeouts, *self._limits)
+                           for _, lesson, path in jobs]
+                for (student, lesson, _), future in zip(jobs, futures):
+                    yield (student, lesson) + future.result()
+            finally:
+                executor.shutdown(cancel_futures=True) # if stopped early
+
+    @staticmethod
+    def calibrate(lessons=None, timeout=300, verbose=False):
+        ''' Records baseline test times for the checkers of lessons.
+
+        Each checker is run as a script in its lesson folder, which runs its
+            tests on the reference solutions defined in its main block, with
+            TestRun.calibrate set so the time each passing test takes is
+            recorded (see TestRun docs). If 'lessons' is None, all lessons
+            with checkers are calibrated.
+
+        'timeout' is the number of seconds a checker may run for. Checkers
+            which keep running after their tests (e.g. by opening a GUI) are
+            stopped, but keep the baselines recorded by their tests.
+
+        'verbose' is a boolean specifying if checker output is displayed.
+
+        Returns a list of the lessons whose checkers exited successfully.
+
+        Autograder.calibrate(*iterable[int], *int, *bool) -> list[int]
+
+        '''
+        if lessons is None:
+            lessons = [int(match.group(1)) for match in
+                       map(Autograder.LESSON_DIRS.match, os.listdir(LESSONS_DIR))
+                       if match]
+        output = None if verbose else subprocess.DEVNULL
+        calibrated = []
+        for lesson in sorted(lessons):
+            lesson_dir = os.path.join(LESSONS_DIR, 'L{}'.format(lesson))
+            checker = 'L{}_2_exercise_checker.py'.format(lesson)
+            if not os.path.isfile(os.path.join(lesson_dir, checker)):
+                continue
+            try:
+                process = subprocess.run([sys.executable, '-c',
+                    Autograder.CALIBRATE.format(LESSONS_DIR), checker],
+                    cwd=lesson_dir, stdin=subprocess.DEVNULL, stdout=output,
+                    stderr=output, timeout=timeout)
+            except subprocess.TimeoutExpired:
+                continue
+            if process.returncode == 0:
+                calibrated.append(lesson)
+        return calibrated
+
+    @staticmethod
+    def grade(lesson, exercise_path, load_timeout=None, grade_timeout=None,
+              memory_limit=None, cpu_limit=None):
+        ''' Returns the results of grading the exercise file at exercise_path.
+
+        The submission is graded in a new process (see _grade), which is
+            stopped if loading the submission takes longer than 'load_timeout'
+            seconds, or grading takes longer than 'grade_timeout' seconds in
+            total (None for no limit). Stopped submissions are graded as timed
+            out, with a single JSON record of 'type': 'grading'.
+
+        'memory_limit' and 'cpu_limit' limit each test (see TestRun docs). If
+            left as None, they are set to TestRun.memory_limit and
+            TestRun.cpu_limit.
+
+        Autograder.grade(int, str, *float, *float, *int, *int)
+            -> tuple(int, int, str, str)
+
+        '''
+        if memory_limit is None:
+            memory_limit = TestRun.memory_limit
+        if cpu_limit is None:
+            cpu_limit = TestRun.cpu_limit
+        recv_end, send_end = multiprocessing.Pipe(False)
+        process = TestRun._start_process(None, 'Grading ' + exercise_path,
+            Autograder._grade, (lesson, exercise_path, memory_limit, cpu_limit,
+                                send_end))
+        send_end.close() # only the grading process should send
+        start = time.time()
+        stage, timeout = 'Loading the submission', load_timeout
+        try:
+            result = Autograder._wait(recv_end, timeout)
+            if result == Autograder.LOADED:
+                stage, timeout = 'Grading', grade_timeout
+                result = Autograder._wait(recv_end, None if timeout is None
+                    else max(timeout - (time.time() - start), 0))
+            if result is None:
+                return Autograder._timed_out(stage, timeout)
+            return result
+        except EOFError:
+            process.join()
+            return (0, 0, '{} exited unexpectedly (exit code {}).\n'.format(
+                stage, process.exitcode), '')
+        finally:
+            Autograder._kill(process)
+            recv_end.close()
+
+    @staticmethod
+    def _wait(conn, timeout):
+        ''' Returns the next value sent through conn, or None if nothing is
+            sent within timeout seconds (None to wait as long as needed).
+
+        Raises EOFError if the sender exits without sending anything.
+
+        Autograder._wait(Connection, float/None) -> object
+
+        '''
+        if not conn.poll(timeout):
+            return None
+        return conn.recv()
+
+    @staticmethod
+    def _kill(process):
+        ''' Kills process (started by grade), along with its test processes.
+
+        Autograder._kill(Process) -> None
+
+        '''
+        if process.is_alive() and hasattr(os, 'killpg'):
+            try:
+                os.killpg(process.pid, signal.SIGKILL) # its process group
+            except OSError:
+                pass # already exited
+        if process.is_alive():
+            process.kill()
+        process.join()
+        TestRun._remove_scratch_dirs(process.pid)
+
+    @staticmethod
+    def _timed_out(stage, timeout):
+        ''' Returns the results of a submission stopped after timeout seconds
+            of 'stage' (e.g. 'Loading the submission').
+
+        Autograder._timed_out(str, float) -> tuple(int, int, str, str)
+
+        '''
+        message = '{} timed out after {} seconds'.format(stage, timeout)
+        record = {'type': 'grading', 'status': TestRun.TIMEOUT,
+                  'result': 'TIMEOUT', 'message': message}
+        return (0, 0, message + '.\n', json.dumps(record) + '\n')
+
+    @staticmethod
+    def _grade(lesson, exercise_path, memory_limit, cpu_limit, send_end):
+        ''' Grades the exercise file at exercise_path, sending the results
+            through send_end (for grade).
+
+        The submission is loaded as module 'Lx_1_exercises', with anything it
+            prints saved to 'out.txt' in a scratch folder of the grading
+            process (as the exercise files save it to 'test_files/out.txt' when
+            run directly), and with the memory and CPU limits of each test.
+            Autograder.LOADED is sent once it has loaded. The checker for the
+            lesson is then loaded into a namespace which starts with the
+            submission's public names, and all the TestRun suites it defines
+            are run. Tests are run in a pool of workers started after loading,
+            which is closed after grading. Finally the results are sent as a
+            tuple of (num_tests, passes, output, records).
+
+        Runs in its own process group (where available), so grade can stop
+            it along with its test processes.
+
+        Autograder._grade(int, str, int/None, int/None, Connection) -> None
+
+        '''
+        if hasattr(os, 'setpgid'):
+            os.setpgid(0, 0)
+        TestRun.memory_limit = memory_limit
+        TestRun.cpu_limit = cpu_limit
+        exercise_dir = os.path.dirname(os.path.abspath(exercise_path))
+        checker_path = os.path.join(LESSONS_DIR, 'L{}'.format(lesson),
+                                    'L{}_2_exercise_checker.py'.format(lesson))
+        exercise_name = 'L{}_1_exercises'.format(lesson)
+        checker_name = 'L{}_2_exercise_checker'.format(lesson)
+
+        output = []
+        IO = TestRun._redirect_output(output)
+        records = []
+        num_tests = passes = 0
+        # printed output is kept out of the student's folder (removed by
+        #  grade if this process is killed)
+        out_dir = TestRun._make_scratch_dir('grading')
+        out_file = os.path.join(out_dir, 'out.txt')
+        try:
+            os.chdir(exercise_dir)
+            sys.path.insert(0, exercise_dir)
+
+            # load the submission, saving its printed output
+            limits = TestRun()._set_limits()
+            try:
+                with Redirect(sys.stdout, open(out_file, 'w'), maintain=False):
+                    exercises = Autograder._load(exercise_name, exercise_path)
+            finally:
+                TestRun._reset_limits(limits)
+            send_end.send(Autograder.LOADED)
+
+            # load the checker with access to the submission's public names
+            checker = Autograder._load(checker_name, checker_path,
+                {name: value for name, value in vars(exercises).items()
+                 if not name.startswith('_')})
+
+            test_runs = [Autograder._create_suite(suite, out_file)
+                         for suite in Autograder._get_suites(checker)]
+            test_runs = [test_run for test_run in test_runs if test_run]
+
+            TestRun.pool = WorkerPool()
+            for test_run in test_runs:
+                test_run._capture = True # test output is needed for grading
+            TestGroup(*test_runs).run_tests(
+                results=TestRun._Output('results', records))
+            TestRun.pool.close()
+
+            for test_run in test_runs:
+                num_tests += len(test_run.get_test_methods())
+                passes += len(test_run._last_passed)
+        except (Exception, SystemExit, TestRun._Timeout):
+            print('Grading could not be completed, due to:', file=sys.stderr)
+            traceback.print_exc()
+        finally:
+            IO.close()
+            TestRun._remove_scratch_dir(out_dir, os.getpid())
+
+        send_end.send((num_tests, passes,
+                       ''.join(message for _, message in output),
+                       ''.join(message for _, message in records)))
+
+    @staticmethod
+    def _load(name, path, namespace=None):
+        ''' Returns the file at path loaded as a module called name.
+
+        The module is added to sys.modules before it is run, so it can be
+            imported by other modules (and its classes pickled). 'namespace'
+            is an optional dictionary of names to define before the module is
+            run.
+
+        Autograder._load(str, str, *dict) -> module
+
+        '''
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        vars(module).update(namespace or {})
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+        return module
+
+    @staticmethod
+    def _get_suites(module):
+        ''' Returns the TestRun classes defined in module, in defining order.
+
+        Autograder._get_suites(module) -> list[type]
+
+        '''
+        return [value for value in vars(module).values()
+                if isinstance(value, type) and issubclass(value, TestRun)
+                and value.__module__ == module.__name__]
+
+    @staticmethod
+    def _create_suite(suite, out_file):
+        ''' Returns an instance of the TestRun class suite, or None on failure.
+
+        Suites which need an argument (like L3Tests) are given out_file, the
+            path of the submission's saved printed output.
+
+        Autograder._create_suite(type, str) -> TestRun/None
+
+        '''
+        TP = TestPrint()
+        try:
+            try:
+                return suite()
+            except TypeError:
+                return suite(out_file)
+        except Exception as e:
+            TP.print_section(suite.__name__)
+            print('  Test suite could not be created, due to:', file=sys.stderr)
+            print('    {}: {}\n'.format(type(e).__name__, str(e)),
+                  file=sys.stderr)
+            return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Grade a folder of student '
+        'submissions using the lesson exercise checkers.')
+    parser.add_argument('submissions', help='folder containing one folder per '
+                        'student')
+    parser.add_argument('-l', '--lessons', type=int, nargs='+',
+                        help='lesson numbers to grade (default all)')
+    parser.add_argument('-w', '--workers', type=int,
+                        help='number of processes to grade with (default CPUs)')
+    parser.add_argument('-p', '--preload', nargs='+', default=[],
+                        help='modules to import once per worker (e.g. numpy)')
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help='only print the summary, not test output')
+    parser.add_argument('-r', '--results', type=argparse.FileType('w'),
+                        help='file to write JSON Lines test results to, with '
+                        "each record's student and lesson")
+    parser.add_argument('-m', '--memory-limit', type=float, metavar='MiB',
+                        help='extra memory each test may allocate')
+    parser.add_argument('-t', '--cpu-limit', type=float, metavar='SECONDS',
+                        help='CPU time each test may use')
+    parser.add_argument('--load-timeout', type=float, default=10,
+                        metavar='SECONDS', help='time each submission may '
+                        'take to load (default 10)')
+    parser.add_argument('--grade-timeout', type=float, default=600,
+                        metavar='SECONDS', help='time grading each submission '
+                        'may take in total (default 600)')
+    parser.add_argument('-c', '--calibrate', action='store_true',
+                        help='record baseline test times from the reference '
+                        'solutions first, for adaptive timeouts')
+    args = parser.parse_args()
+
+    if args.calibrate:
+        calibrated = Autograder.calibrate(args.lessons)
+        print('Calibrated timeouts for lessons:',
+              ', '.join(map(str, calibrated)) or 'none')
+
+    memory_limit = args.memory_limit and int(args.memory_limit * 2**20)
+    grader = Autograder(args.submissions, args.lessons, args.workers,
+                        args.preload, memory_limit, args.cpu_limit,
+                        args.load_timeout, args.grade_timeout)
+    summary = []
+    for student, lesson, num_tests, passes, output, records in grader.run():
+        if not args.quiet:
+            title = ' {}: L{} '.format(student, lesson)
+            print('\n' + title.center(80, '='))
+            print(output)
+        if args.results:
+            for line in records.splitlines():
+                record = {'student': student, 'lesson': lesson}
+                record.update(json.loads(line))
+                args.results.write(json.dumps(record) + '\n')
+            args.results.flush()
+        summary.append((student, lesson, num_tests, passes))
+
+    print('\n' + ' Summary '.center(80, '='))
+    for student, lesson, num_tests, passes in summary:
+        print('  {:<50} L{:<4} {:>4}/{:<4} passed'.format(student, lesson,
+                                                         passes, num_tests))
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+################################################################################
+# This file contains micro-benchmarks for the TestRun module's helpers, for    #
+# checking the overhead they add to tests. Run it from a terminal, e.g.:       #
+#                                                                              #
+#   python3 Benchmarks.py                                                      #
+#                                                                              #
+# Each benchmark prints the average time per operation in microseconds.        #
+################################################################################
+
+import io
+import os
+import sys
+import timeit
+
+from TestRun import TestRun, TestGroup, Redirect, MultiRedirect
+
+
+def time_per_call(func, number):
+    ''' Returns the best average microseconds per call of func over 5 runs.
+
+    func is called once per run, and should do 'number' operations.
+
+    time_per_call(function, int) -> float
+
+    '''
+    return min(timeit.repeat(func, number=1, repeat=5)) / number * 1e6
+
+def redirect_prints(number=100000, **kwargs):
+    ''' Returns the microseconds per print through a Redirect of sys.stdout.
+
+    Prints go to os.devnull and a StringIO (as in a typical checker, which
+        saves printed output to a file). kwargs are passed to Redirect.
+
+    redirect_prints(*int, **bool) -> float
+
+    '''
+    def run():
+        with open(os.devnull, 'w') as null:
+            with Redirect(sys.stdout, null, io.StringIO(), maintain=False,
+                          **kwargs):
+                for i in range(number):
+                    print('Message', i)
+    return time_per_call(run, number)
+
+def redirect_writelines(number=100000, **kwargs):
+    ''' Returns the microseconds per line of Redirect.writelines.
+
+    redirect_writelines(*int, **bool) -> float
+
+    '''
+    lines = ['Message {}\n'.format(i) for i in range(number)]
+    def run():
+        with open(os.devnull, 'w') as null:
+            with Redirect(io.StringIO(), null, maintain=False,
+                          **kwargs) as out:
+                out.writelines(lines)
+    return time_per_call(run, number)
+
+def redirect_inputs(number=100000):
+    ''' Returns the microseconds per input() from a list of scripted lines.
+
+    redirect_inputs(*int) -> float
+
+    '''
+    lines = [str(i) for i in range(number)]
+    def run():
+        with Redirect(sys.stdin, lines, maintain=False):
+            for i in range(number):
+                input()
+    return time_per_call(run, number)
+
+def multi_redirect_writes(number=100000):
+    ''' Returns the microseconds per write through a MultiRedirect of two
+        Redirects.
+
+    multi_redirect_writes(*int) -> float
+
+    '''
+    def run():
+        redirects = MultiRedirect(Redirect(io.StringIO(), maintain=False),
+                                  Redirect(io.StringIO(), maintain=False))
+        for i in range(number):
+            redirects.write('Message\n')
+    return time_per_call(run, number)
+
+def test_group_calls(number=100000, suites=10):
+    ''' Returns the microseconds per method call on a TestGroup of 'suites'
+        test suites, limited to every second suite. The method does nothing,
+        so only the TestGroup's overhead is measured.
+
+    test_group_calls(*int, *int) -> float
+
+    '''
+    class Tests(TestRun):
+        def test_nothing(self):
+            ''' Does nothing. '''
+            pass
+
+        def nothing(self):
+            ''' Does nothing. '''
+            pass
+    group = TestGroup(*(Tests() for i in range(suites)))
+    ids = range(0, suites, 2)
+    def run():
+        for i in range(number):
+            group.nothing(ids=ids)
+    return time_per_call(run, number)
+
+
+if __name__ == '__main__':
+    print('Redirect (microseconds per operation):')
+    for name, benchmark in (('print', redirect_prints),
+                            ('writelines', redirect_writelines)):
+        plain = benchmark()
+        buffered = benchmark(buffered=True)
+        print('  {:<12} {:>8.3f} unbuffered {:>8.3f} buffered'.format(
+            name, plain, buffered))
+    print('  {:<12} {:>8.3f}'.format('input', redirect_inputs()))
+
+    print('Emulator (microseconds per call):')
+    print('  {:<12} {:>8.3f}'.format('MultiRedirect', multi_redirect_writes()))
+    print('  {:<12} {:>8.3f}'.format('TestGroup', test_group_calls()))
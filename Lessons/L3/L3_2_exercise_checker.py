@@ -7,6 +7,7 @@ import sys; sys.path.append('..')
 from TestRun import TestRun, Redirect
 
 import os
+import tempfile # example solution output, kept out of test_files
 if not os.path.exists('test_files'):
     os.mkdir('test_files')
 
@@ -84,7 +85,8 @@ class L3Tests(TestRun):
 #------------------------------ Example Solutions -----------------------------#
 
 if __name__ == '__main__':
-    out_file = 'test_files/outX.txt'
+    out_dir = tempfile.TemporaryDirectory()
+    out_file = os.path.join(out_dir.name, 'outX.txt')
     with Redirect(sys.stdout, open(out_file,'w'), maintain=False):
         a = []
 
@@ -158,4 +160,5 @@ if __name__ == '__main__':
 
     with open(out_file) as out:
         print(out.read())
+    out_dir.cleanup()
     
@@ -7,7 +7,7 @@ import sys; sys.path.append('..')
 from TestRun import TestRun, Redirect
 
 from random import randint
-import os # for unnecessary file removal
+import os # for scratch file paths
 
 class L4Tests(TestRun):
     def __init__(self, num_trials=100):
@@ -46,44 +46,41 @@ class L4Tests(TestRun):
     # test functions
     def test_light_switch(self):
         ''' Tests the 'light_switch' function. '''
-        out_file = 'temp.txt'
-        try:
-            with Redirect(sys.stdout, open(out_file,'w'), maintain=False):
-                light_switch()
-                a = [False]; light_switch(a)
-                assert a[0], 'a = [False]; light_switch(a) should mean ' +\
-                       'a = [True] afterwards.'
-                light_switch(a)
-                assert not a[0], 'a = [True]; light_switch(a) should mean ' +\
-                       'a = [False] afterwards.'
-                try:
-                    light_switch(False)
-                    light_switch(True)
-                except TypeError:
-                    assert False, 'Should detect when a boolean is passed ' +\
-                           'in and respond appropriately.'
-                try:
-                    light_switch((False,))
-                    light_switch((True,))
-                except TypeError:
-                    assert False, 'Should detect when a tuple is passed in ' +\
-                           'and respond appropriately.'
+        out_file = os.path.join(self.scratch_dir, 'out.txt')
+        with Redirect(sys.stdout, open(out_file,'w'), maintain=False):
+            light_switch()
+            a = [False]; light_switch(a)
+            assert a[0], 'a = [False]; light_switch(a) should mean ' +\
+                   'a = [True] afterwards.'
+            light_switch(a)
+            assert not a[0], 'a = [True]; light_switch(a) should mean ' +\
+                   'a = [False] afterwards.'
+            try:
+                light_switch(False)
+                light_switch(True)
+            except TypeError:
+                assert False, 'Should detect when a boolean is passed ' +\
+                       'in and respond appropriately.'
+            try:
+                light_switch((False,))
+                light_switch((True,))
+            except TypeError:
+                assert False, 'Should detect when a tuple is passed in ' +\
+                       'and respond appropriately.'
 
-            with open(out_file) as out:
-                calls = ['', '[False]', '[True]', 'False', 'True',
-                         '(False,)', '(True,)']
-                expecteds = ['turned off the light',
-                             'turned on the light', 'turned off the light',
-                             'light is stuck off', 'light is stuck on']
-                
-                for i, expected in enumerate(expecteds):
-                    line = out.readline()[:-1]
-                    assert line == expected, \
-                           'light_switch({})'.format(calls[i]) +\
-                           'should print {!r}, not \n    {!r}'.format(expected,
-                                                                      line)
-        finally:
-            os.remove(out_file) # unnecessary file
+        with open(out_file) as out:
+            calls = ['', '[False]', '[True]', 'False', 'True',
+                     '(False,)', '(True,)']
+            expecteds = ['turned off the light',
+                         'turned on the light', 'turned off the light',
+                         'light is stuck off', 'light is stuck on']
+            
+            for i, expected in enumerate(expecteds):
+                line = out.readline()[:-1]
+                assert line == expected, \
+                       'light_switch({})'.format(calls[i]) +\
+                       'should print {!r}, not \n    {!r}'.format(expected,
+                                                                  line)
     
     def test_flatten(self, f2=''):
         ''' Tests the 'flatten' function, or 'flatten2' if f2 == 2 or '2'. '''
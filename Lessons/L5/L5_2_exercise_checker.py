@@ -7,6 +7,7 @@ import sys; sys.path.append('..')
 from TestRun import TestRun, Redirect, MultiRedirect
 
 import os
+import io
 if not os.path.exists('test_files'):
     os.mkdir('test_files')
 
@@ -15,43 +16,50 @@ class L5Tests(TestRun):
         ''' Initialise this test suite. '''
         super().__init__()
 
-        # create input file
+        # create inputs
         self._inputs = ['exit','10','exit'] # immediate exit (on 2, not 0)
         self._inputs += ['Name','10','1','2','3','exit'] # random exit
         self._inputs += ['Name','10','1','2','3','4']    # finish questions
-        self._in_file = 'test_files/in.txt'
-        with open(self._in_file,'w') as in_file:
-            in_file.write('\n'.join(self._inputs) + '\n')
         
-        # create question file
+        # create questions (see _q_file)
         self._qs = ['Hmm?', 'And I should care why?', '???', 'No...?']
-        self._q_file = 'test_files/qs.txt'
-        with open(self._q_file,'w') as q_file:
-            q_file.write('\n'.join(self._qs) + '\n')
-
-        # store file names for logging and printed output
-        self._out_file = 'test_files/out.txt'
-        self._log_file = 'test_files/log.txt'
 
     # helper methods
+    @property
+    def _q_file(self):
+        ''' The file of questions to ask (private to the running test). '''
+        q_path = os.path.join(self.scratch_dir, 'qs.txt')
+        if not os.path.exists(q_path):
+            with open(q_path,'w') as q_file:
+                q_file.write('\n'.join(self._qs) + '\n')
+        return q_path
+
+    @property
+    def _log_file(self):
+        ''' The file question_asker logs to (private to the running test). '''
+        return os.path.join(self.scratch_dir, 'log.txt')
+
     def _run_qs(self, n):
-        ''' Runs the question_asker n times with redirected IO. '''
-        # redirect standard IO
-        IO = MultiRedirect(Redirect(sys.stdin, open(self._in_file)),
-            Redirect(sys.stdout, open(self._out_file,'w'), maintain=False))
+        ''' Runs the question_asker n times with redirected IO.
+
+        Returns the printed output.
+
+        '''
+        # redirect standard IO (printed output captured in memory)
+        IO = MultiRedirect(Redirect(sys.stdin, self._inputs),
+            Redirect(sys.stdout, maintain=False, capture=True))
 
         try:
             for i in range(n):
                 question_asker(self._q_file, self._log_file)
         finally:
             IO.close()
+        return IO.getvalue(ids=[1])[0]
 
     def _general_exit(self, n):
         ''' Tests that exiting occurs correctly for n runs of input. '''
         num = [7, 7+13, 7+13+14] # expected number of lines of printing
-        self._run_qs(n)
-
-        with open(self._out_file) as out:
+        with io.StringIO(self._run_qs(n)) as out:
             num_lines = len(out.readlines())
             assert num_lines == num[n-1], 'question_asker should exit '   +\
                    "after the first 'exit' command received after the "   +\
@@ -107,9 +115,7 @@ class L5Tests(TestRun):
     # test functions
     def test_startup(self):
         ''' Tests the printed output for qs 1 and 2, and the confirmation. '''
-        self._run_qs(1)
-
-        with open(self._out_file) as out:
+        with io.StringIO(self._run_qs(1)) as out:
             name_q = out.readline()
             assert name_q == 'What is your name?\n', 'First question should ' +\
                    "be 'What is your name?', not '{}'.".format(name_q.rstrip())
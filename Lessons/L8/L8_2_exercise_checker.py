@@ -159,36 +159,37 @@ class LoopTests(TestRun):
 class ErrorsTests(TestRun):
     ''' Tests for the error-handling section. '''
     def __init__(self):
-        ''' Initialise tests and test files. '''
+        ''' Initialise tests and test file contents. '''
         super().__init__()
+        self._files = {} # contents of each test file (see _test_file)
         # generate some valid files
         for i in range(3):
-            with open('test_files/valid{}.txt'.format(i+1), 'w') as valid_file:
-                number = random.randint(1,40)
-                lines = []
-                for line_ind in range(number):
-                    line = ''
-                    letter_count = 0
-                    while letter_count != number:
-                        char = self.char()
-                        line += char
-                        if char.isalpha():
-                            letter_count += 1
-                    lines += [line]
-                valid_file.write('\n'.join(lines) + '\n')
+            number = random.randint(1,40)
+            lines = []
+            for line_ind in range(number):
+                line = ''
+                letter_count = 0
+                while letter_count != number:
+                    char = self.char()
+                    line += char
+                    if char.isalpha():
+                        letter_count += 1
+                lines += [line]
+            self._files['valid{}.txt'.format(i+1)] = '\n'.join(lines) + '\n'
         
         # create some invalid files
-        with open('test_files/invalid1.txt', 'w') as invalid_file:
-            invalid_file.write('14>32 9.30') # 1 line, 0 letters
-        with open('test_files/invalid2.txt', 'w') as invalid_file:
-            invalid_file.write('abc123\nd4e5f6') # 2 lines, 3 letters per line
-        with open('test_files/invalid3.txt', 'w') as invalid_file:
-            invalid_file.write('abc\ndefg\nhij') # 3 lines, 4 letters 2nd line
-
-        # store redirect filenames
-        self._in_name = 'test_files/in.txt'
-        self._err_name = 'test_files/err.txt'
-        self._out_name = 'test_files/out.txt'
+        self._files['invalid1.txt'] = '14>32 9.30' # 1 line, 0 letters
+        self._files['invalid2.txt'] = 'abc123\nd4e5f6' # 2 lines, 3 letters
+        self._files['invalid3.txt'] = 'abc\ndefg\nhij' # 4 letters 2nd line
+
+    def _test_file(self, name):
+        ''' Returns the path of test file 'name' (e.g. 'valid1.txt'), written
+            to the running test's scratch folder. '''
+        path = os.path.join(self.scratch_dir, name)
+        if not os.path.exists(path):
+            with open(path, 'w') as test_file:
+                test_file.write(self._files[name])
+        return path
 
     def char(self):
         ''' Returns a random character. '''
@@ -201,7 +202,7 @@ class ErrorsTests(TestRun):
         check_file # check existence
         
         for i in range(3):
-            filename = 'test_files/valid{}.txt'.format(i+1)
+            filename = self._test_file('valid{}.txt'.format(i+1))
             # test a valid file
             try:
                 assert check_file(filename) # raises exception on failure
@@ -211,7 +212,7 @@ class ErrorsTests(TestRun):
 
             # test an invalid file
             try:
-                check_file('test_files/invalid{}.txt'.format(i+1))
+                check_file(self._test_file('invalid{}.txt'.format(i+1)))
                 assert False, "File in{} should register as invalid.".format(
                     filename)
             except InvalidFileError:
@@ -236,47 +237,39 @@ class ErrorsTests(TestRun):
         user_interface # check existence
 
         # set up input
-        with open(self._in_name, 'w') as in_file:
-            in_file.write('test_files/valid1.txt\n' +\
-                          'test_files/invalid1.txt\n' + \
-                          'test_files/valid2.txt\n')
-
-        redirects = MultiRedirect(Redirect(sys.stdin, open(self._in_name, 'r')),
-            Redirect(sys.stderr, open(self._err_name, 'w'), maintain=False),
-            Redirect(sys.stdout, open(self._out_name, 'w'), maintain=False))
+        inputs = [self._test_file(name) for name in
+                  ('valid1.txt', 'invalid1.txt', 'valid2.txt')]
+
+        redirects = MultiRedirect(Redirect(sys.stdin, inputs),
+            Redirect(sys.stderr, maintain=False, capture=True),
+            Redirect(sys.stdout, maintain=False, capture=True))
         
-        user_interface()
-        redirects.close(0, ids=[1,2]) # close error and out files
         try:
-            with open(self._err_name,'r') as err_file:
-                error_text = err_file.read()
-                assert error_text == '', "No prints should be made to stderr"+\
-                       " for a valid file input.\n" +\
-                       "'{}' should have been ''.".format(error_text)
-                           
-            with open(self._out_name,'r') as out_file:
-                out_text = [line for line in out_file.readlines() if line != '']
-                num_lines = len(out_text)
-                assert num_lines == 1, "Only 1 prompt should be displayed"+\
-                       " for a valid file input, not {}.".format(num_lines)
-                prompt = out_text[0]
+            user_interface()
+            error_text, out_text = redirects.getvalue(ids=[1,2])
+            assert error_text == '', "No prints should be made to stderr" +\
+                   " for a valid file input.\n" +\
+                   "'{}' should have been ''.".format(error_text)
+
+            out_text = [line for line in out_text.splitlines(True)
+                        if line != '']
+            num_lines = len(out_text)
+            assert num_lines == 1, "Only 1 prompt should be displayed" +\
+                   " for a valid file input, not {}.".format(num_lines)
+            prompt = out_text[0]
                 
-            # reopen error and out files
-            redirects.replace_stream(0, open(self._err_name, 'w'), ids=[1])
-            redirects.replace_stream(0, open(self._out_name, 'w'), ids=[2])
+            # discard the captured error and out text
+            redirects.clear(ids=[1,2])
             
             user_interface()
             
-            redirects.close(0, ids=[1,2]) # close error and out files
-            with open(self._err_name,'r') as err_file:
-                assert err_file.read() != '', "Prints should be made to " +\
-                       "stderr for an invalid file input."
-                
-            with open(self._out_name,'r') as out_file:
-                out_text = out_file.read()
-                assert out_text.count(prompt) == 2, "2 prompts should be " +\
-                       "displayed for an invalid then a valid file input, " +\
-                       "not {}.".format(num_lines)
+            error_text, out_text = redirects.getvalue(ids=[1,2])
+            assert error_text != '', "Prints should be made to " +\
+                   "stderr for an invalid file input."
+
+            assert out_text.count(prompt) == 2, "2 prompts should be " +\
+                   "displayed for an invalid then a valid file input, " +\
+                   "not {}.".format(num_lines)
         finally:
             redirects.close() # restore stdin, stderr, and stdout
 
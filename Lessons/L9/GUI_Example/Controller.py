@@ -3,32 +3,42 @@
 from Model import Model
 from View import View
 import tkinter as tk
+import sys
 
 class Controller(object):
     ''' A class for controlling a graph-analyser. '''
-    def __init__(self, master, graph_img=None):
+    def __init__(self, master, graph_img=None, session=None):
         ''' A class for managing a GUI graph-analyser.
 
         Users select an image of a graph, then identify three points with well-
             defined locations, then add as many points as desired to the graph.
-            The selected points are saveable in a csv format, and the graph
-            image is saveable as a PNG image.
+            The selected points are saveable in csv or NumPy formats, and the
+            graph image is saveable as a PNG image. Sessions (the graph image
+            and all points) can be saved, and reopened where you left off, by
+            specifying 'session' or with File/Open Session.
 
         Could be expanded to include zooming, logarithmic axis scaling,
-            automatic line detection, saving of state (to reopen where you left
-            off), or full automation with automatic axis detection and line
-            detection combined.
+            automatic line detection, or full automation with automatic axis
+            detection and line detection combined.
 
-        Constructor: Controller(tk.Tk, *str)
+        Constructor: Controller(tk.Tk, *str, *str)
 
         '''
-        # initialise data storage
-        self._model = Model()
+        # initialise data storage (compact, so sessions stay memory-mapped)
+        self._model = Model(compact=True)
+        if session and not graph_img:
+            # start with the session's graph image, rather than asking for one
+            try:
+                graph_img = Model.read_session(session)['image_path']
+            except Exception:
+                pass # ask for an image - the View shows the session's error
 
         # initialise display and event bindings
         self._root = master # overarching 'main' window for the application
         self._view = View(self._root, graph_img)
         self._add_bind_functions()
+        if session:
+            self._view.load_session(session)
 
     def _add_bind_functions(self):
         ''' Link the Model functionality to View binding functions.
@@ -43,11 +53,15 @@ class Controller(object):
             set_def_pts      = self._model.set_defining_points,
             new_point        = self._model.add_stored_point,
             del_point        = self._model.remove_stored_point,
+            save_session     = self._model.save_session,
+            read_session     = Model.read_session,
+            load_session     = self._model.load_session,
         )
 
 
 if __name__ == '__main__':
     root = tk.Tk()
-    C1 = Controller(root)
+    # optionally reopen a saved session, as 'python3 Controller.py file.session'
+    C1 = Controller(root, session=sys.argv[1] if len(sys.argv) > 1 else None)
     # turn over the code to event-driven, waiting for user input/actions
     root.mainloop()
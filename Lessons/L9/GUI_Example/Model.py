@@ -2,20 +2,38 @@
 
 import cv2 # opencv (open computer vision) library
 import numpy as np # numerical python library
+import math # distances and grid cells of points
+from collections.abc import MutableMapping # dict interface for stored points
+import csv # streaming data export
+import os # file extensions of export formats
+import json # session file headers
+import hashlib # identifying the graph image of a session
 
 class Model(object):
     ''' A class for the data of a graph-analyser. '''
-    def __init__(self):
+    SAVE_FORMATS = {'.csv':'csv', '.txt':'csv', '.npy':'npy', '.npz':'npz'}
+    CHUNK_SIZE = 4096 # rows of array-stored points converted at once on save
+    SESSION_MAGIC = b'GraphSession 1\n' # first line of session files
+    SESSION_ALIGN = 64 # byte alignment of the point arrays in session files
+
+    def __init__(self, compact=False):
         ''' A class for storing user-specified points on a graph.
 
         Users specify defining points mapping the pixel-plane to the graph-
             plane. The Model stores the mapping, and converts additional pixel-
             point values to graph-points.
 
-        Constructor: Model()
+        If 'compact' is True, stored points are kept in NumPy arrays (see
+            ColumnarPoints) rather than a dictionary of tuples, which uses much
+            less memory for large numbers of points, and lets all of them be
+            re-projected in place when the defining points change. Stored
+            pixel points must then have whole-number coordinates.
+
+        Constructor: Model(*bool)
 
         '''
         # initialise memory and points
+        self._compact = compact
         self.clear_data()
 
     def set_defining_points(self, points_map):
@@ -53,6 +71,7 @@ class Model(object):
 
         graph_point = self.get_graph_point(pixel_point)
         self._stored_points[tuple(pixel_point)] = graph_point
+        self._point_grid.add(tuple(pixel_point))
 
         return graph_point
 
@@ -73,25 +92,37 @@ class Model(object):
         self._verify_defined() # check if defining points defined
 
         # try to remove the exact point
+        pixel_point = tuple(pixel_point)
         point_removed = self._stored_points.pop(pixel_point, None)
 
         if point_removed is None:
             # pixel_point is not a key in stored points, find nearest
-            closest_point, dist = Model.get_closest(pixel_point,
-                    list(self._stored_points.keys()))
+            closest_point, dist = self._point_grid.get_closest(pixel_point,
+                                                               max_dist)
             if dist < max_dist:
                 point_removed = self._stored_points.pop(closest_point)
+                self._point_grid.remove(closest_point)
+        else:
+            self._point_grid.remove(pixel_point)
 
         return point_removed
 
     def _update_stored_points(self):
         ''' Updates all stored points based off the current affine transform.
 
+        Stored points were validated when added, so are all transformed at once.
+
         self._update_stored_points() -> None
 
         '''
-        for pixel_point in self._stored_points:
-            self.add_stored_point(pixel_point)
+        if not self._stored_points:
+            return
+        if self._compact:
+            self._stored_points.update_graph_points(self.get_graph_points)
+            return
+        pixel_points = list(self._stored_points)
+        graph_points = self.get_graph_points(pixel_points).tolist()
+        self._stored_points = dict(zip(pixel_points, map(tuple, graph_points)))
 
     def clear_data(self):
         ''' Clears the defining and stored points.
@@ -116,7 +147,8 @@ class Model(object):
         self.clear_stored_points(None) -> None
 
         '''
-        self._stored_points = {}
+        self._stored_points = ColumnarPoints() if self._compact else {}
+        self._point_grid = PointGrid() # spatial index of the stored points
 
     def get_graph_point(self, pixel_point):
         ''' Returns the graph point related to the specified pixel point.
@@ -126,35 +158,263 @@ class Model(object):
         self.get_graph_point(tuple(int,int)) -> tuple(float,float)
 
         '''
-        # [xg, yg]' = A_T * [xp, yp, 1]'
-        point = self._affine_transform * np.transpose(np.matrix(
-            list(pixel_point) + [1]))
-        return (point.item(0), point.item(1)) # (xg, yg)
+        return tuple(self.get_graph_points([pixel_point])[0].tolist())
 
-    def save_data(self, filename, pixel_point=False):
-        ''' Saves the stored points into the specified file, in a csv format.
+    def get_graph_points(self, pixel_points):
+        ''' Returns the graph points related to many pixel points at once.
+
+        'pixel_points' should be an Nx2 array (or a sequence of N points), and
+            the result is an Nx2 array of graph points, in the same order.
+
+        self.get_graph_points(np.ndarray/list[tuple(int,int)]) -> np.ndarray
+
+        '''
+        pixel_points = np.asarray(pixel_points, dtype=np.float64).reshape(-1, 2)
+        # [xg, yg]' = A_T * [xp, yp, 1]' for each point, as one product
+        transform = np.asarray(self._affine_transform)
+        return pixel_points @ transform[:, :2].T + transform[:, 2]
 
-        'filename' should have extension '.csv' or '.txt'.
+    def save_data(self, filename, pixel_point=False, file_format=None):
+        ''' Saves the stored points into the specified file.
+
+        'filename' should have extension '.csv' or '.txt' (text, with a header
+            row), '.npy' (a NumPy array with a column per header value), or
+            '.npz' (NumPy columns, saved separately by header value).
         'pixel_point' is a boolean specifying if the pixel points are also saved
             with their corresponding graph points
+        'file_format' is one of 'csv', 'npy', or 'npz', to override the format
+            implied by the extension (unknown extensions are saved as csv).
+
+        Rows are written to csv files as they're generated, so large numbers of
+            points don't need to be held as text in memory.
 
-        self.save_data(str.csv, *bool) -> None
+        self.save_data(str, *bool, *str) -> None
 
         '''
+        if file_format is None:
+            extension = os.path.splitext(filename)[1].lower()
+            file_format = Model.SAVE_FORMATS.get(extension, 'csv')
+        header = ['graphX','graphY']
         if pixel_point:
-            output = 'pixelX,pixelY,graphX,graphY\n'
+            header = ['pixelX','pixelY'] + header
+
+        if file_format == 'csv':
+            # write rows to file as generated, closes itself on completion
+            with open(filename, 'w', newline='') as file:
+                writer = csv.writer(file, lineterminator='\n')
+                writer.writerow(header)
+                writer.writerows(self._get_rows(pixel_point))
+            return
+
+        pixel_points, graph_points = self.get_point_arrays()
+        columns = [graph_points[:, 0], graph_points[:, 1]]
+        if pixel_point:
+            columns = [pixel_points[:, 0], pixel_points[:, 1]] + columns
+        if file_format not in ('npy', 'npz'):
+            raise Exception("Invalid file format {!r} - should be one of "
+                            "'csv', 'npy', or 'npz'.".format(file_format))
+        # saved through an open file, so NumPy doesn't add an extension
+        with open(filename, 'wb') as file:
+            if file_format == 'npy':
+                np.save(file, np.column_stack(columns).astype(np.float64))
+            else:
+                np.savez(file, **dict(zip(header, columns)))
+
+    def get_point_arrays(self):
+        ''' Returns Nx2 arrays of the stored pixel points and graph points.
+
+        The pixel points are integers, unless any stored point has fractional
+            pixel coordinates (only possible if not compact).
+
+        self.get_point_arrays() -> tuple(np.ndarray, np.ndarray)
+
+        '''
+        if self._compact:
+            return (self._stored_points.pixel_points(),
+                    self._stored_points.graph_points())
+        pixel_points = np.array(list(self._stored_points.keys()),
+                                dtype=np.float64).reshape(-1, 2)
+        if np.all(pixel_points == np.round(pixel_points)):
+            pixel_points = pixel_points.astype(np.int64)
+        graph_points = np.array(list(self._stored_points.values()),
+                                dtype=np.float64).reshape(-1, 2)
+        return pixel_points, graph_points
+
+    def save_session(self, filename, image_path=None):
+        ''' Saves the defining points, transform, and stored points to a session
+            file, along with the path and hash of the graph image.
+
+        The file is a JSON header line, followed by the stored pixel points and
+            graph points as raw arrays, which load_session memory-maps instead
+            of parsing. As the file may be mapped by a loaded session, it's
+            never overwritten in place - the session is written to a temporary
+            file which then replaces it (leaving existing maps of the old file
+            intact).
+
+        self.save_session(str, *str) -> None
+
+        '''
+        pixel_points, graph_points = self.get_point_arrays()
+        pixel_dtype = '<f8' if pixel_points.dtype.kind == 'f' else '<i8'
+        transform = getattr(self, '_affine_transform', None)
+        if image_path is not None:
+            image_path = os.path.abspath(image_path)
+        header = {
+            'image_path': image_path,
+            'image_hash': image_path and Model.hash_file(image_path),
+            'defining_points': [list(pixel) + list(graph) for pixel, graph in
+                                self._defining_points.items()],
+            'affine_transform': None if not self._defining_points else
+                                np.asarray(transform).tolist(),
+            'num_points': len(graph_points),
+            'pixel_dtype': pixel_dtype,
+        }
+        header = Model.SESSION_MAGIC + (json.dumps(header) + '\n').encode()
+        padding = -len(header) % Model.SESSION_ALIGN
+
+        temp_filename = '{}.{}.tmp'.format(filename, os.getpid())
+        try:
+            with open(temp_filename, 'wb') as file:
+                file.write(header + b'\0' * padding)
+                file.write(np.ascontiguousarray(pixel_points,
+                                                dtype=pixel_dtype))
+                file.write(np.ascontiguousarray(graph_points, dtype='<f8'))
+            os.replace(temp_filename, filename)
+        except BaseException:
+            if os.path.exists(temp_filename):
+                os.remove(temp_filename)
+            raise
+
+    @staticmethod
+    def read_session(filename, check_image=True):
+        ''' Returns the header of a session file saved with save_session.
+
+        The header is a dictionary with keys 'image_path', 'image_hash',
+            'defining_points' (a {pixel point: graph point} dictionary),
+            'affine_transform', 'num_points', 'pixel_dtype' (of the stored pixel
+            points), and 'offset' (the position of the point arrays in the
+            file).
+
+        Raises Exception if the file isn't a session file, or if 'check_image'
+            is True and the graph image is missing or has changed since the
+            session was saved.
+
+        Model.read_session(str, *bool) -> dict
+
+        '''
+        with open(filename, 'rb') as file:
+            if file.readline() != Model.SESSION_MAGIC:
+                raise Exception("Invalid session file '{}'.".format(filename))
+            header = json.loads(file.readline().decode())
+            end = file.tell()
+        header['offset'] = end + -end % Model.SESSION_ALIGN
+        header.setdefault('pixel_dtype', '<i8')
+        header['defining_points'] = {(px, py): (gx, gy) for px, py, gx, gy
+                                     in header['defining_points']}
+
+        image_path = header['image_path']
+        if check_image and image_path is not None:
+            if not os.path.isfile(image_path):
+                raise Exception("Session graph image '{}' not found.".format(
+                    image_path))
+            if Model.hash_file(image_path) != header['image_hash']:
+                raise Exception("Session graph image '{}' has changed since "
+                                "the session was saved.".format(image_path))
+        return header
+
+    def load_session(self, filename):
+        ''' Replaces all points with those in a session file, and returns the
+            stored pixel points.
+
+        The stored point arrays are memory-mapped from the file (copy-on-write,
+            so the file isn't modified), rather than read and parsed. A compact
+            model stores its points in the mapped arrays themselves, so only
+            the parts in use are loaded, while other models copy the points
+            into their dictionary. The graph image isn't checked (see
+            read_session).
+
+        Raises Exception if the model is compact and the session has pixel
+            points with fractional coordinates.
+
+        self.load_session(str) -> np.ndarray
+
+        '''
+        header = Model.read_session(filename, check_image=False)
+        points_map = header['defining_points']
+        if points_map:
+            self._verify_points_map(points_map)
+
+        num_points = header['num_points']
+        pixel_points = np.zeros((0, 2), dtype=np.int64)
+        if num_points:
+            pixel_points = np.memmap(filename, dtype=header['pixel_dtype'],
+                                     mode='c', offset=header['offset'],
+                                     shape=(num_points, 2))
+            graph_points = np.memmap(filename, dtype='<f8', mode='c',
+                                     offset=header['offset'] +
+                                            pixel_points.nbytes,
+                                     shape=(num_points, 2))
+        if self._compact and pixel_points.dtype.kind == 'f':
+            if not np.all(pixel_points == np.round(pixel_points)):
+                raise Exception("Session '{}' has fractional pixel points, "
+                                "which a compact model can't store.".format(
+                                filename))
+            pixel_points = pixel_points.astype(np.int64)
+
+        self.clear_data()
+        if points_map:
+            self._defining_points = points_map
+            self._affine_transform = np.array(header['affine_transform'])
+        if not num_points:
+            return pixel_points
+        if self._compact:
+            self._stored_points = ColumnarPoints.from_arrays(pixel_points,
+                                                             graph_points)
+        else:
+            self._stored_points = dict(zip(map(tuple, pixel_points.tolist()),
+                                           map(tuple, graph_points.tolist())))
+        if pixel_points.dtype.kind == 'f': # fractional points, not compact
             for point in self._stored_points:
-                add_str = list(point) + list(self._stored_points[point])
-                output += ','.join([str(i) for i in add_str]) + '\n'
+                self._point_grid.add(point)
         else:
-            output = 'graphX,graphY\n'
-            for pixel_point in self._stored_points:
-                graph_point = self._stored_points[pixel_point]
-                output += ','.join([str(i) for i in graph_point]) + '\n'
+            self._point_grid.add_many(pixel_points)
+        return pixel_points
 
-        # write output to file, closes itself on completion
-        with open(filename, 'w') as file:
-            file.write(output)
+    @staticmethod
+    def hash_file(filename):
+        ''' Returns the SHA-256 hash of the contents of a file, as hex.
+
+        Model.hash_file(str) -> str
+
+        '''
+        file_hash = hashlib.sha256()
+        with open(filename, 'rb') as file:
+            for block in iter(lambda: file.read(2**16), b''):
+                file_hash.update(block)
+        return file_hash.hexdigest()
+
+    def _get_rows(self, pixel_point):
+        ''' Yields a list of values to save for each stored point.
+
+        Array-stored points are converted CHUNK_SIZE rows at a time.
+
+        self._get_rows(bool) -> generator(list[int/float])
+
+        '''
+        if not self._compact:
+            for point, graph_point in self._stored_points.items():
+                yield list(point) + list(graph_point) if pixel_point else \
+                      list(graph_point)
+            return
+
+        pixel_points, graph_points = self.get_point_arrays()
+        for start in range(0, len(graph_points), Model.CHUNK_SIZE):
+            chunk = slice(start, start + Model.CHUNK_SIZE)
+            if pixel_point:
+                yield from (pixels + graphs for pixels, graphs in zip(
+                    pixel_points[chunk].tolist(), graph_points[chunk].tolist()))
+            else:
+                yield from graph_points[chunk].tolist()
 
     def _verify_defined(self):
         ''' Check if the defining points have been defined yet, else Exception.
@@ -273,3 +533,310 @@ class Model(object):
                                       key=lambda dist_sp: dist_sp[0])
 
         return (closest_point, min_dist)
+
+
+def pack_point(point):
+    ''' Returns integer point (x,y) packed into one int (a compact key).
+
+    pack_point(tuple(int,int)) -> int
+
+    '''
+    return (int(point[0]) << 32) + int(point[1]) + 2**31
+
+def pack_points(points):
+    ''' Returns an array of the Nx2 integer points packed by pack_point.
+
+    pack_points(np.ndarray) -> np.ndarray
+
+    '''
+    points = np.asarray(points, dtype=np.int64).reshape(-1, 2)
+    return (points[:, 0] << 32) + points[:, 1] + 2**31
+
+def unpack_point(key):
+    ''' Returns the integer point (x,y) packed into key by pack_point.
+
+    unpack_point(int) -> tuple(int,int)
+
+    '''
+    return (key >> 32, (key & 0xFFFFFFFF) - 2**31)
+
+def is_whole_point(point):
+    ''' Returns True if both coordinates of point (x,y) are whole numbers, so
+        it can be packed by pack_point without changing it.
+
+    is_whole_point(tuple(int/float,int/float)) -> bool
+
+    '''
+    return float(point[0]).is_integer() and float(point[1]).is_integer()
+
+
+class PointGrid(object):
+    ''' A spatial index of 2D points, for finding points near a location. '''
+    def __init__(self, cell_size=16):
+        ''' A grid of square cells, each holding the points inside it.
+
+        Finding the closest point within a maximum distance only checks the
+            cells that distance overlaps, so takes time proportional to the
+            number of points near the search location rather than the total
+            number of points. Points are added and removed individually.
+            Points with integer coordinates are stored packed (see pack_point),
+            and any others as the points themselves, so found points are always
+            equal to the points added.
+
+        Constructor: PointGrid(*int)
+
+        '''
+        self._cell_size = cell_size
+        self._cells = {} # packed (cell x, cell y) -> points (or keys) in it
+
+    def add(self, point):
+        ''' Adds point (x,y) to the grid (if not already in it).
+
+        self.add(tuple(int/float,int/float)) -> None
+
+        '''
+        key = PointGrid._get_key(point)
+        points = self._cells.setdefault(self._get_cell(point), [])
+        if key not in points:
+            points.append(key)
+
+    def add_many(self, points):
+        ''' Adds an Nx2 array of integer points, which aren't already in the
+            grid, all at once.
+
+        self.add_many(np.ndarray) -> None
+
+        '''
+        points = np.asarray(points, dtype=np.int64).reshape(-1, 2)
+        if not len(points):
+            return
+        cells = pack_points(points // self._cell_size)
+        order = np.argsort(cells, kind='stable') # group points by cell
+        cells, keys = cells[order], pack_points(points[order]).tolist()
+        # the first point of each cell, and the end of the last cell
+        bounds = [0] + (np.flatnonzero(np.diff(cells)) + 1).tolist()
+        for cell, start, end in zip(cells[bounds].tolist(), bounds,
+                                    bounds[1:] + [len(keys)]):
+            self._cells.setdefault(cell, []).extend(keys[start:end])
+
+    def remove(self, point):
+        ''' Removes point (x,y) from the grid, if it is in it.
+
+        self.remove(tuple(int/float,int/float)) -> None
+
+        '''
+        cell = self._get_cell(point)
+        points = self._cells.get(cell)
+        key = PointGrid._get_key(point)
+        if points is not None and key in points:
+            points.remove(key)
+            if not points:
+                del self._cells[cell] # only keep occupied cells
+
+    def get_closest(self, check_point, max_dist=math.inf):
+        ''' Returns the closest point and its distance to check_point.
+
+        Only points within max_dist of check_point are found. Returns
+            (None, inf) if there are none.
+
+        self.get_closest(tuple(float,float), *float) ->
+                tuple(tuple(int/float,int/float)/None, float)
+
+        '''
+        closest_point, min_dist = None, math.inf
+        for points in self._get_cells_near(check_point, max_dist):
+            for key in points:
+                point = unpack_point(key) if type(key) is int else key
+                dist = math.hypot(point[0] - check_point[0],
+                                  point[1] - check_point[1])
+                if dist < min_dist:
+                    closest_point, min_dist = point, dist
+        if min_dist > max_dist:
+            return (None, math.inf)
+        return (closest_point, min_dist)
+
+    @staticmethod
+    def _get_key(point):
+        ''' Returns the key point (x,y) is stored by - packed if its coordinates
+            are whole numbers, otherwise the point itself.
+
+        PointGrid._get_key(tuple(int/float,int/float)) -> int/tuple
+
+        '''
+        if is_whole_point(point):
+            return pack_point(point)
+        return tuple(point)
+
+    def _get_cell(self, point):
+        ''' Returns the (packed) grid cell containing point.
+
+        self._get_cell(tuple(float,float)) -> int
+
+        '''
+        return pack_point((point[0] // self._cell_size,
+                           point[1] // self._cell_size))
+
+    def _get_cells_near(self, check_point, max_dist):
+        ''' Returns the point lists of occupied cells within max_dist of
+            check_point (checking every occupied cell if that's fewer).
+
+        self._get_cells_near(tuple(float,float), float) -> list[list[int]]
+
+        '''
+        if max_dist == math.inf:
+            return list(self._cells.values())
+        x_min, y_min = unpack_point(self._get_cell(
+            (check_point[0] - max_dist, check_point[1] - max_dist)))
+        x_max, y_max = unpack_point(self._get_cell(
+            (check_point[0] + max_dist, check_point[1] + max_dist)))
+        if (x_max - x_min + 1) * (y_max - y_min + 1) > len(self._cells):
+            return list(self._cells.values())
+        cells = (pack_point((x, y)) for x in range(x_min, x_max + 1)
+                 for y in range(y_min, y_max + 1))
+        return [self._cells[cell] for cell in cells if cell in self._cells]
+
+
+class ColumnarPoints(MutableMapping):
+    ''' A compact mapping of pixel points to graph points, stored in arrays. '''
+    def __init__(self, capacity=1024):
+        ''' A dictionary-like store of {(int,int): (float,float)} points.
+
+        Pixel and graph coordinates are stored as rows of two contiguous NumPy
+            arrays, rather than as tuples of Python numbers. Rows of removed
+            points are marked unused, and reused by later points. The arrays
+            double in size when full. Pixel coordinates are stored as integers,
+            so storing a pixel point with a fractional coordinate raises an
+            Exception (and such points are never found).
+
+        Constructor: ColumnarPoints(*int)
+
+        '''
+        self._pixels = np.zeros((capacity, 2), dtype=np.int64)
+        self._graphs = np.zeros((capacity, 2), dtype=np.float64)
+        self._rows = {} # packed pixel point -> row, in insertion order
+        self._free = [] # unused rows before the end of the used rows
+        self._end = 0   # rows after this have never been used
+
+    @classmethod
+    def from_arrays(cls, pixel_points, graph_points):
+        ''' Returns a store of the Nx2 arrays of (distinct) pixel points and
+            graph points, using the arrays themselves as its storage.
+
+        The arrays must be writable (e.g. copy-on-write memory maps), and are
+            only copied once the store grows past them.
+
+        ColumnarPoints.from_arrays(np.ndarray, np.ndarray) -> ColumnarPoints
+
+        '''
+        points = cls(capacity=1)
+        if len(pixel_points):
+            points._pixels = pixel_points
+            points._graphs = graph_points
+            points._end = len(pixel_points)
+            points._rows = dict(zip(pack_points(pixel_points).tolist(),
+                                    range(len(pixel_points))))
+        return points
+
+    def __getitem__(self, pixel_point):
+        ''' Returns the graph point of pixel_point (KeyError if not stored). '''
+        row = self._rows[ColumnarPoints._get_key(pixel_point)]
+        return tuple(self._graphs[row].tolist())
+
+    def __setitem__(self, pixel_point, graph_point):
+        ''' Stores graph_point as the graph point of pixel_point. '''
+        if not is_whole_point(pixel_point):
+            raise Exception("Invalid pixel point {} - compact stored points "
+                            "need whole-number pixel coordinates.".format(
+                            tuple(pixel_point)))
+        key = pack_point(pixel_point)
+        row = self._rows.get(key)
+        if row is None:
+            if self._free:
+                row = self._free.pop()
+            else:
+                if self._end == len(self._pixels):
+                    self._grow()
+                row = self._end
+                self._end += 1
+            self._rows[key] = row
+            self._pixels[row] = pixel_point
+        self._graphs[row] = graph_point
+
+    def __delitem__(self, pixel_point):
+        ''' Removes pixel_point (KeyError if not stored). '''
+        self._free.append(self._rows.pop(ColumnarPoints._get_key(pixel_point)))
+
+    def __iter__(self):
+        ''' Iterates over the stored pixel points, in the order added. '''
+        for row in list(self._rows.values()):
+            yield tuple(self._pixels[row].tolist())
+
+    def __len__(self):
+        ''' Returns the number of stored points. '''
+        return len(self._rows)
+
+    def clear(self):
+        ''' Removes all stored points (keeping the arrays' capacity). '''
+        self._rows = {}
+        self._free = []
+        self._end = 0
+
+    def pixel_points(self):
+        ''' Returns an Nx2 array of the stored pixel points, in the order added.
+
+        self.pixel_points() -> np.ndarray
+
+        '''
+        return self._pixels[self._get_rows()]
+
+    def graph_points(self):
+        ''' Returns an Nx2 array of the stored graph points, in the order added.
+
+        self.graph_points() -> np.ndarray
+
+        '''
+        return self._graphs[self._get_rows()]
+
+    def update_graph_points(self, transform):
+        ''' Replaces all graph points with transform(pixel points).
+
+        'transform' should map an Nx2 array of pixel points to an Nx2 array of
+            graph points (e.g. Model.get_graph_points).
+
+        self.update_graph_points(function) -> None
+
+        '''
+        rows = self._get_rows()
+        self._graphs[rows] = transform(self._pixels[rows])
+
+    @staticmethod
+    def _get_key(pixel_point):
+        ''' Returns the key of pixel_point in the rows, or None if it can't be
+            stored (so is never a key).
+
+        ColumnarPoints._get_key(tuple(int/float,int/float)) -> int/None
+
+        '''
+        return pack_point(pixel_point) if is_whole_point(pixel_point) else None
+
+    def _get_rows(self):
+        ''' Returns an array of the used rows, in the order they were added.
+
+        self._get_rows() -> np.ndarray
+
+        '''
+        return np.fromiter(self._rows.values(), dtype=np.intp,
+                           count=len(self._rows))
+
+    def _grow(self):
+        ''' Doubles the number of rows in the arrays.
+
+        self._grow() -> None
+
+        '''
+        capacity = 2 * len(self._pixels)
+        for name in ('_pixels', '_graphs'):
+            array = getattr(self, name)
+            grown = np.zeros((capacity, 2), dtype=array.dtype)
+            grown[:len(array)] = array
+            setattr(self, name, grown)
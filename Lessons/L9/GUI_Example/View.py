@@ -17,11 +17,18 @@ class View(object):
     CURSOR = {'define':'circle', 'add':'crosshair', 'delete':'draped_box'}
     # the set of valid external bindings used in the class
     external_bindings = ('save_data', 'clear_data', 'clear_stored_pts',
-                         'set_def_pts', 'new_point', 'del_point')
+                         'set_def_pts', 'new_point', 'del_point',
+                         'save_session', 'read_session', 'load_session')
     INVALID_BINDING_MSG = "Invalid binding '{}'\nValid bindings are found " \
                           "using View.external_bindings."
     # the set of valid internal bindings used in the class
     _internal_bindings = ('define', 'add', 'delete')
+    # drawing properties of stored points
+    STORED_POINT = {'outline':'', 'fill':'blue', 'tags':('stored','point')}
+    # Tcl function drawing points (as in _draw_point) from a flat list of x,y
+    DRAW_POINTS = ('canvas coords options', 'foreach {x y} $coords {'
+                   '$canvas create oval [expr {$x-2}] [expr {$y-2}] '
+                   '[expr {$x+3}] [expr {$y+3}] {*}$options}')
 
     def __init__(self, master, graph_img=None):
         ''' A class for managing the display of a graph-analysis GUI.
@@ -319,8 +326,8 @@ class View(object):
     def _setup_filemenu(self):
         ''' Initialises the dropdown File menu.
 
-        Adds options to select a graph image, save the stored data, and exit
-            the application.
+        Adds options to select a graph image, open and save sessions, save the
+            stored data, and exit the application.
 
         self._setup_filemenu() -> None
 
@@ -328,6 +335,9 @@ class View(object):
         filemenu = tk.Menu(self._menubar, tearoff=0)
         filemenu.add_command(label="Select Graph", command=self._set_img)
         filemenu.add_separator() # add a separation line (denote sections)
+        filemenu.add_command(label="Open Session", command=self.load_session)
+        filemenu.add_command(label="Save Session", command=self._save_session)
+        filemenu.add_separator()
         filemenu.add_command(label="Save Data", command=self._save_data)
         filemenu.add_command(label="Save Graph", command=self._save_graph)
 
@@ -377,6 +387,7 @@ class View(object):
                                  ("All Files","*.*")))
 
         img = Image.open(graph_img) # extract image as PIL Image
+        self._img_path = graph_img  # stored for saving sessions
         # scale image to take up the full canvas (stretching is fine)
         size = (self._graph_canvas.winfo_width(),
                 self._graph_canvas.winfo_height())
@@ -397,9 +408,10 @@ class View(object):
         self._reset_def_points()    # reset defining points controls
 
     def _save_data(self, filename=None):
-        ''' Saves the graph points to a csv format.
+        ''' Saves the graph points to a csv or NumPy format.
 
-        Prompts the user for a filename if not provided.
+        Prompts the user for a filename if not provided. The format is chosen
+            by the file's extension (see Model.save_data).
 
         self._save_data(*str) -> None
 
@@ -407,10 +419,68 @@ class View(object):
         if not filename:
             filename = tk.filedialog.asksaveasfilename(title = "Save Data As",
                 filetypes = (("Comma Separated Value","*.csv"),
+                             ("NumPy Array","*.npy"),
+                             ("NumPy Columns","*.npz"),
                              ("All Files","*.*")))
 
         self._call_bind_func('save_data', filename)
 
+    def _save_session(self, filename=None):
+        ''' Saves the current session (graph image, defining points, and stored
+            points), to be reopened later with load_session.
+
+        Prompts the user for a filename if not provided.
+
+        self._save_session(*str) -> None
+
+        '''
+        if not filename:
+            filename = tk.filedialog.asksaveasfilename(
+                title = "Save Session As",
+                filetypes = (("Graph Session","*.session"),
+                             ("All Files","*.*")))
+
+        self._call_bind_func('save_session', filename, self._img_path)
+
+    def load_session(self, filename=None):
+        ''' Reopens a session saved with File/Save Session.
+
+        Prompts the user for a filename if not provided. The session's graph
+            image is displayed, then its points are loaded into the external
+            data (Model), and drawn.
+
+        self.load_session(*str) -> None
+
+        '''
+        if not filename:
+            filename = tk.filedialog.askopenfilename(
+                title = "Open Session",
+                filetypes = (("Graph Session","*.session"),
+                             ("All Files","*.*")))
+
+        session = self._call_bind_func('read_session', filename)
+        if session is None:
+            return # invalid session (error displayed)
+        self._set_img(session['image_path']) # clears all previous data
+        pixel_points = self._call_bind_func('load_session', filename)
+        if pixel_points is None:
+            return # loading failed (error displayed)
+
+        # draw the defining points, and set their controls as submitted
+        defining_points = session['defining_points']
+        for index, pixel_point in enumerate(defining_points):
+            self._dpid = index
+            self._add_def_point(pixel_point)
+            control = self._def_pt_controls[index]
+            for entry_val, value in zip(control.entry_vals,
+                                        defining_points[pixel_point]):
+                entry_val.set(value)
+            control.submit()
+        if defining_points:
+            self._change_mode_to('add')
+
+        self._draw_points(pixel_points.tolist(), View.STORED_POINT)
+
     def _clear_data(self):
         ''' Clears all data from the graph display and model.
 
@@ -455,8 +525,7 @@ class View(object):
         point_added = self._call_bind_func('new_point', pixel_point)
 
         if point_added:
-            self._draw_point(pixel_point, {'outline':'','fill':'blue',
-                                           'tags':('stored','point')})
+            self._draw_point(pixel_point, View.STORED_POINT)
 
     def _add_def_point(self, pixel_point):
         ''' Add a new defining point to the graph.
@@ -484,6 +553,25 @@ class View(object):
         ppx, ppy = pixel_point # extract coordinates
         self._graph_canvas.create_oval(ppx-2, ppy-2, ppx+3, ppy+3, **properties)
 
+    def _draw_points(self, pixel_points, properties):
+        ''' Draw many points on the graph canvas with the given properties.
+
+        The points are drawn by a single Tcl loop, rather than a separate Tk
+            call for each point, which is much faster for large sessions.
+
+        'pixel_points' should be a sequence of (x,y) coordinates of points
+        'properties' should be a dictionary of desired properties of the points
+
+        self._draw_points(list[tuple(int,int)], dict) -> None
+
+        '''
+        coords = tuple(value for pixel_point in pixel_points
+                       for value in pixel_point)
+        options = tuple(item for name, value in properties.items()
+                        for item in ('-' + name, value))
+        self._graph_canvas.tk.call('apply', View.DRAW_POINTS,
+                                   str(self._graph_canvas), coords, options)
+
     def _delete_point(self, pixel_point, max_dist=5):
         ''' Deletes the point nearest pixel_point, if within max_dist.
 
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+# Tests of the graph-analyser Model (run with 'python3 -m pytest test_Model.py')
+
+import csv
+import multiprocessing
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from Model import Model, PointGrid
+
+
+class ModelTestCase(unittest.TestCase):
+    ''' Base class for tests of a Model with defining points set. '''
+    compact = False
+    DEFINING_POINTS = {(0, 0): (0.0, 0.0), (100, 0): (1.0, 0.0),
+                       (0, 100): (0.0, 1.0)}
+
+    def setUp(self):
+        self.model = Model(compact=self.compact)
+        self.model.set_defining_points(self.DEFINING_POINTS)
+
+
+class RemoveTests(ModelTestCase):
+    def test_remove_exact_float_point(self):
+        ''' A point with fractional pixel coordinates can be removed. '''
+        graph_point = self.model.add_stored_point((10.5, 20.5))
+        self.assertEqual(self.model.remove_stored_point((10.5, 20.5)),
+                         graph_point)
+        self.assertEqual(dict(self.model._stored_points), {})
+
+    def test_remove_nearest_float_point(self):
+        ''' The nearest point is removed, even with fractional coordinates. '''
+        graph_point = self.model.add_stored_point((10.5, 20.5))
+        self.model.add_stored_point((50, 50))
+        self.assertEqual(self.model.remove_stored_point((11, 21)),
+                         graph_point)
+        self.assertEqual(list(self.model._stored_points), [(50, 50)])
+        self.assertIsNone(self.model.remove_stored_point((11, 21)))
+
+    def test_remove_nearest(self):
+        ''' Only points within max_dist are removed. '''
+        graph_points = [self.model.add_stored_point(point)
+                        for point in ((10, 10), (40, 40), (90, 90))]
+        self.assertIsNone(self.model.remove_stored_point((60, 60)))
+        self.assertEqual(self.model.remove_stored_point((43, 44)),
+                         graph_points[1])
+        self.assertEqual(list(self.model._stored_points), [(10, 10), (90, 90)])
+
+
+class CompactRemoveTests(RemoveTests):
+    compact = True
+
+    def test_remove_exact_float_point(self):
+        ''' Fractional pixel points can't be stored, so aren't found. '''
+        self.model.add_stored_point((10, 20))
+        with self.assertRaises(Exception):
+            self.model.add_stored_point((10.5, 20.5))
+        self.assertNotIn((10.5, 20.5), self.model._stored_points)
+        with self.assertRaises(KeyError):
+            self.model._stored_points.pop((10.5, 20.5))
+        self.assertEqual(list(self.model._stored_points), [(10, 20)])
+
+    def test_remove_nearest_float_point(self):
+        ''' A fractional point removes the nearest stored point. '''
+        graph_point = self.model.add_stored_point((10, 20))
+        self.model.add_stored_point((50, 50))
+        self.assertEqual(self.model.remove_stored_point((10.5, 20.5)),
+                         graph_point)
+        self.assertEqual(list(self.model._stored_points), [(50, 50)])
+
+    def test_whole_float_point(self):
+        ''' Pixel points with whole-number float coordinates can be stored. '''
+        graph_point = self.model.add_stored_point((10.0, 20.0))
+        self.assertEqual(dict(self.model._stored_points),
+                         {(10, 20): graph_point})
+        self.assertEqual(self.model.remove_stored_point((10, 20)),
+                         graph_point)
+
+
+class TransformTests(ModelTestCase):
+    # rotated, skewed and mirrored, so every transform entry matters
+    SKEWED_POINTS = {(12, 300): (-5.0, 2.5), (410, 95): (7.25, 40.0),
+                     (250, 480): (1.0, -3.0)}
+
+    def get_reference(self, pixel_points):
+        ''' Returns the graph points of pixel_points, transformed one at a
+            time as [xp, yp, 1] vectors (as the Model originally did).
+        '''
+        transform = np.asarray(self.model._affine_transform)
+        return [tuple(transform @ np.array(list(point) + [1.0]))
+                for point in pixel_points]
+
+    def test_batch_matches_single(self):
+        ''' Transforming points in a batch matches transforming each alone. '''
+        self.model.set_defining_points(self.SKEWED_POINTS)
+        rng = np.random.default_rng(0)
+        pixel_points = rng.uniform(-100, 1000, (500, 2)).tolist()
+        np.testing.assert_allclose(self.model.get_graph_points(pixel_points),
+                                   self.get_reference(pixel_points),
+                                   rtol=1e-12, atol=1e-9)
+        self.assertEqual(len(self.model.get_graph_points([])), 0)
+
+    def test_recalibration_matches_single(self):
+        ''' Stored points re-projected together when the defining points
+            change match transforming each point alone. '''
+        rng = np.random.default_rng(1)
+        pixel_points = [tuple(point) for point in
+                        rng.integers(0, 500, (2000, 2)).tolist()]
+        for point in pixel_points:
+            self.model.add_stored_point(point)
+        self.model.set_defining_points(self.SKEWED_POINTS)
+        stored = {tuple(pixel): graph for pixel, graph in zip(*(
+                  points.tolist() for points in self.model.get_point_arrays()))}
+        pixel_points = list(dict.fromkeys(pixel_points)) # distinct, in order
+        np.testing.assert_allclose([stored[point] for point in pixel_points],
+                                   self.get_reference(pixel_points),
+                                   rtol=1e-12, atol=1e-9)
+
+
+class CompactTransformTests(TransformTests):
+    compact = True
+
+
+class SaveTests(ModelTestCase):
+    POINTS = [(10, 20), (30, 40.5), (99, 1), (0, 0), (57, 12), (3, 88), (1, 2)]
+
+    def setUp(self):
+        super().setUp()
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.folder = folder.name
+        self.points = [pixel + self.model.add_stored_point(pixel)
+                       for pixel in self.POINTS
+                       if not self.compact or pixel == tuple(map(int, pixel))]
+        self.expected = np.array(self.points, dtype=np.float64)
+
+    def test_csv(self):
+        ''' csv files have a header row, then a row of numbers per point. '''
+        for pixel_point, header, columns in (
+                (False, ['graphX', 'graphY'], slice(2, None)),
+                (True, ['pixelX', 'pixelY', 'graphX', 'graphY'], slice(None))):
+            filename = os.path.join(self.folder, 'points.csv')
+            self.model.save_data(filename, pixel_point)
+            with open(filename, newline='') as file:
+                rows = list(csv.reader(file))
+            self.assertEqual(rows[0], header)
+            np.testing.assert_array_equal(np.array(rows[1:], dtype=np.float64),
+                                          self.expected[:, columns])
+
+    def test_npy(self):
+        ''' npy files hold an array with a column per header value. '''
+        filename = os.path.join(self.folder, 'points.npy')
+        self.model.save_data(filename)
+        np.testing.assert_array_equal(np.load(filename), self.expected[:, 2:])
+        self.model.save_data(filename, pixel_point=True)
+        np.testing.assert_array_equal(np.load(filename), self.expected)
+
+    def test_npz(self):
+        ''' npz files hold a column array per header value. '''
+        filename = os.path.join(self.folder, 'points.npz')
+        self.model.save_data(filename, pixel_point=True)
+        with np.load(filename) as columns:
+            self.assertEqual(sorted(columns.files),
+                             ['graphX', 'graphY', 'pixelX', 'pixelY'])
+            for index, name in enumerate(('pixelX', 'pixelY', 'graphX',
+                                          'graphY')):
+                np.testing.assert_array_equal(columns[name],
+                                              self.expected[:, index])
+
+    def test_file_format(self):
+        ''' file_format overrides the extension, without changing the file
+            name, and unknown extensions are saved as csv. '''
+        filename = os.path.join(self.folder, 'points.dat')
+        for file_format in ('npy', 'npz'):
+            self.model.save_data(filename, file_format=file_format)
+            self.assertEqual(os.listdir(self.folder), ['points.dat'])
+        with np.load(filename) as columns:
+            np.testing.assert_array_equal(columns['graphX'],
+                                          self.expected[:, 2])
+        self.model.save_data(filename)
+        with open(filename) as file:
+            self.assertEqual(file.readline(), 'graphX,graphY\n')
+        with self.assertRaises(Exception):
+            self.model.save_data(filename, file_format='xlsx')
+
+    def test_no_points(self):
+        ''' Saving without stored points gives just the header (or empty
+            arrays). '''
+        self.model.clear_stored_points()
+        filename = os.path.join(self.folder, 'points.csv')
+        self.model.save_data(filename)
+        with open(filename) as file:
+            self.assertEqual(file.read(), 'graphX,graphY\n')
+        filename = os.path.join(self.folder, 'points.npy')
+        self.model.save_data(filename, pixel_point=True)
+        self.assertEqual(np.load(filename).shape, (0, 4))
+
+
+class CompactSaveTests(SaveTests):
+    compact = True
+
+    def setUp(self):
+        # convert several chunks of rows
+        chunk_size = Model.CHUNK_SIZE
+        Model.CHUNK_SIZE = 2
+        self.addCleanup(setattr, Model, 'CHUNK_SIZE', chunk_size)
+        super().setUp()
+
+
+class SessionTests(ModelTestCase):
+    POINTS = [(10, 20), (30.5, 40.25), (99, 1)]
+
+    def setUp(self):
+        super().setUp()
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.folder = folder.name
+        self.filename = os.path.join(self.folder, 'graph.session')
+
+    def get_points(self, model):
+        ''' Returns the stored points of model as a dictionary. '''
+        return {tuple(pixel): tuple(graph) for pixel, graph in
+                zip(*(points.tolist() for points in model.get_point_arrays()))}
+
+    def save_after_load(self, point):
+        ''' Loads the session, removes point, and saves the session over the
+            file it was loaded from, checking the loaded points don't change.
+        '''
+        model = Model(compact=self.compact)
+        pixel_points = model.load_session(self.filename)
+        loaded_pixel_points = pixel_points.tolist()
+        points = self.get_points(model)
+        del points[point]
+        model.remove_stored_point(point)
+        model.save_session(self.filename)
+        self.assertEqual(pixel_points.tolist(), loaded_pixel_points)
+        self.assertEqual(self.get_points(model), points)
+
+    def test_save_after_load(self):
+        ''' A loaded session can be saved back to the same file. '''
+        points = {point: self.model.add_stored_point(point)
+                  for point in self.POINTS}
+        self.model.save_session(self.filename)
+        del points[self.POINTS[0]]
+
+        # in a separate process, as overwriting a mapped file can kill it
+        process = multiprocessing.get_context('fork').Process(
+            target=self.save_after_load, args=(self.POINTS[0],))
+        process.start()
+        process.join()
+        self.assertEqual(process.exitcode, 0)
+
+        model = Model(compact=self.compact)
+        self.assertEqual(sorted(map(tuple, model.load_session(self.filename))),
+                         sorted(points))
+        self.assertEqual(self.get_points(model), points)
+        self.assertEqual(model._defining_points, self.DEFINING_POINTS)
+        self.assertEqual(os.listdir(self.folder), ['graph.session'])
+
+    def test_empty_session(self):
+        ''' Loading a session with no stored points clears them. '''
+        self.model.save_session(self.filename)
+        self.model.add_stored_point((10, 20))
+        self.assertEqual(len(self.model.load_session(self.filename)), 0)
+        self.assertEqual(self.get_points(self.model), {})
+        self.assertIsNone(self.model.remove_stored_point((10, 20)))
+        self.assertEqual(self.model._defining_points, self.DEFINING_POINTS)
+
+    def test_image_changed(self):
+        ''' Reading a session whose graph image has changed is an error. '''
+        image_path = os.path.join(self.folder, 'graph.png')
+        with open(image_path, 'wb') as image:
+            image.write(b'graph')
+        self.model.save_session(self.filename, image_path)
+        self.assertEqual(Model.read_session(self.filename)['image_path'],
+                         image_path)
+        with open(image_path, 'ab') as image:
+            image.write(b'changed')
+        with self.assertRaises(Exception):
+            Model.read_session(self.filename)
+        Model.read_session(self.filename, check_image=False)
+
+
+class CompactSessionTests(SessionTests):
+    compact = True
+    POINTS = [(10, 20), (30, 40), (99, 1)]
+
+    def test_fractional_session(self):
+        ''' A session with fractional pixel points can't be loaded compact,
+            and the model is left unchanged. '''
+        model = Model()
+        model.set_defining_points(self.DEFINING_POINTS)
+        model.add_stored_point((30.5, 40.25))
+        model.save_session(self.filename)
+        graph_point = self.model.add_stored_point((10, 20))
+        with self.assertRaises(Exception):
+            self.model.load_session(self.filename)
+        self.assertEqual(self.get_points(self.model), {(10, 20): graph_point})
+
+    def test_points_mapped(self):
+        ''' A compact model stores loaded points in the mapped file itself. '''
+        points = {point: self.model.add_stored_point(point)
+                  for point in self.POINTS}
+        self.model.save_session(self.filename)
+        model = Model(compact=True)
+        model.load_session(self.filename)
+        self.assertIsInstance(model._stored_points._pixels, np.memmap)
+        self.assertIsInstance(model._stored_points._graphs, np.memmap)
+        self.assertEqual(self.get_points(model), points)
+
+
+class PointGridTests(unittest.TestCase):
+    def test_closest_matches_brute_force(self):
+        ''' The grid finds the same closest points as checking every point. '''
+        points = [(x * 7 % 101, x * 13 % 97) for x in range(200)]
+        grid = PointGrid()
+        for point in points:
+            grid.add(point)
+        for check_point in ((0, 0), (50.5, 50.5), (-20, 120), (33, 7)):
+            closest, dist = Model.get_closest(check_point, points)
+            self.assertEqual(grid.get_closest(check_point),
+                             (tuple(closest), dist))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -54,26 +54,31 @@ class L9Tests(TestRun):
                 assert False, "Class {} does not exist".format(class_name)
 
     # required setup methods
+    @TestRun.depends_on('test_classes_exist')
     def test_setup_controls(self):
         ''' Testing for existence of _setup_io in View. '''
         assert '_setup_controls' in dir(View), 'Controls not set up with ' +\
                '_setup_controls method in View.'
 
+    @TestRun.depends_on('test_classes_exist')
     def test_setup_canvas(self):
         ''' Testing for existence of _setup_canvas in View. '''
         assert '_setup_canvas' in dir(View), 'Canvas not set up with ' +\
                '_setup_canvas method in View.'
 
+    @TestRun.depends_on('test_classes_exist')
     def test_setup_menubar(self):
         ''' Testing for existence of _setup_menubar in View. '''
         assert '_setup_menubar' in dir(View), 'Menubar not set up with ' +\
                '_setup_menubar method in View.'
 
+    @TestRun.depends_on('test_classes_exist')
     def test_init_bindings(self):
         ''' Testing for existence of _init_bindings in View. '''
         assert '_init_bindings' in dir(View), 'Bindings not initialised with' +\
                ' _init_bindings method in View.'
 
+    @TestRun.depends_on('test_classes_exist')
     def test_add_bindings(self):
         ''' Testing for existence of _add_bindings in Controller. '''
         assert '_add_bindings' in dir(Controller), 'Bindings not set up with' +\
@@ -47,6 +47,12 @@
 #       'TestGroup': A class for grouping multiple TestRun instances as though #
 #           they are a single instance.                                        #
 #                                                                              #
+#       'TestResult': A class for the full result of running a test, which can #
+#           also be written out as JSON for machine-readable results.          #
+#                                                                              #
+#       'WorkerPool': A class for keeping test processes alive between tests,  #
+#           so process creation is paid once per worker instead of per test.   #
+#                                                                              #
 #       'Redirect': A class for stream redirection and multiplication, focused #
 #           on stdin, stdout, and stderr, but also usable for general file     #
 #           streams. Allows for capturing printed output and simulating typed  #
@@ -58,26 +64,102 @@
 #                                                                              #
 ###--------------------------------------------------------------------------###
 #                                                                              #
-# Modified: YYYY-MM-DD                                                         #
-# Author: _                                                                    #
+# Modified: 2026-10-18                                                         #
+# Author: agent                                                                #
 #                                                                              #
-# Modification details                                                         #
+# Added parallel and persistent-worker test runs (WorkerPool), concurrent      #
+#   TestGroup suites, a configurable start method with a preloading fork       #
+#   server, per-test timing, profiling, memory and CPU limits                  #
+#   (MEMORY_EXCEEDED), adaptive timeouts, an on-disk result cache, fail-fast   #
+#   runs with test dependencies (SKIPPED), JSON Lines results, shared-memory   #
+#   result transfer and per-test scratch folders. Redirect gained in-memory,   #
+#   buffered, line-input and per-thread/per-task modes.                        #
 #                                                                              #
 ################################################################################
 
 import traceback # controlled printing of tracebacks (from caught Exceptions)
 import multiprocessing # used for automatic timeouts (not available in IDLE)
+import multiprocessing.connection # waiting on multiple test processes at once
 import time      # used for measuring test times and user-generated timeouts
 import sys       # used for shell io functionality (stream redirections)
 import os        # for creating folders if necessary
-
-class TestRun(object):
+import pickle    # for detecting test suites which can't be sent to workers
+import json      # machine-readable test results
+import heapq     # tracking the slowest tests in a run
+import cProfile  # optional per-test profiling
+import pstats    # summarising per-test profiles
+import tracemalloc # optional per-test peak memory measurement
+import signal    # stopping profiled tests before they're killed for timing out
+import threading # checking if signals can be used
+import weakref   # caching test methods per class without keeping classes alive
+import types     # finding modules to preload in a fork server
+import multiprocessing.forkserver # starting tests from a preloaded server
+import hashlib   # identifying checker versions for calibrated timeouts
+import math      # rounding CPU limits up to whole seconds
+import io        # capturing redirected streams in memory
+import tempfile  # private scratch folders for each test
+import shutil    # removing scratch folders
+import contextvars # redirecting standard streams per thread/asyncio task
+try:
+    import resource # per-test memory and CPU limits (not available on Windows)
+except ImportError:
+    resource = None
+try:
+    import fcntl # locking the result cache (not available on Windows)
+except ImportError:
+    fcntl = None
+
+class _TestRunType(type):
+    ''' The type of TestRun classes, which forgets the test methods found for
+        TestRun classes when a test method is added, removed, or replaced. '''
+    def __setattr__(cls, name, value):
+        ''' Set an attribute of cls, forgetting test methods if needed. '''
+        super().__setattr__(name, value)
+        if name.startswith('test_'):
+            TestRun._registries.clear() # subclasses inherit the test
+
+    def __delattr__(cls, name):
+        ''' Delete an attribute of cls, forgetting test methods if needed. '''
+        super().__delattr__(name)
+        if name.startswith('test_'):
+            TestRun._registries.clear()
+
+
+class TestRun(object, metaclass=_TestRunType):
     ''' A class for running tests. '''
 
     PASS = 1
     FAIL = 0
     ERROR = -1
     TIMEOUT = -2
+    MEMORY_EXCEEDED = -3
+    SKIPPED = -4
+
+    pool = None # optional WorkerPool for running tests (see WorkerPool docs)
+    start_method = None # how test processes are started (see __init__ docs)
+    preload = () # extra modules for a 'forkserver' to import once
+    PROFILE_GRACE = 1 # extra seconds given to profiled tests to send results
+    profile_timeout_scale = 5 # profiled tests get this many times the timeout
+    profile_memory = False # also trace peak memory of profiled tests (slow)
+    _registries = weakref.WeakKeyDictionary() # test methods of each class
+    _forkserver_pid = None # process which started the fork server
+    calibrate = False # record test baselines for adaptive timeouts
+    timeout_cache = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                 'timeouts.json') # calibrated test baselines
+    timeout_scale = 10 # adaptive timeouts are this many times the baseline
+    min_timeout = 1 # shortest adaptive timeout, in seconds
+    _timeout_data = (None, {}) # (modification time, data) of timeout_cache
+    _file_hashes = {} # (file, modification time) -> hash of file
+    memory_limit = None # extra bytes each test process may allocate, if set
+    cpu_limit = None # CPU seconds each test may use, if set
+    result_cache = None # file to reuse results of unchanged tests from, if set
+    result_cache_size = 1000 # most results kept in result_cache
+    fixtures = () # input files the tests read, for the result cache
+    _use_cache = True # False while re-running failed tests
+    # instance attributes which aren't inputs of the tests (for result_cache)
+    _RUN_STATE = ('_TP', '_timeout', '_last_failed', '_last_passed',
+                  '_capture', '_profile', '_scratch_dir', '_use_cache', 'pool')
+    scratch_root = None # folder for per-test scratch folders (tmpfs if None)
     
     def __init__(self, timeout=5):
         ''' A class for running tests and printing relevant output.
@@ -101,6 +183,81 @@ class TestRun(object):
             test stalls while running from IDLE (or more generally), pressing
             CTRL+C to trigger a KeyboardInterrupt is treated as a TIMEOUT of
             that test, and the remaining tests are run.
+
+        By default each test is run in a new process. Setting TestRun.pool (or
+            self.pool) to a WorkerPool instead runs tests in persistent worker
+            processes, which is much faster for large numbers of short tests.
+
+        Test processes are started with the platform's default multiprocessing
+            start method, unless TestRun.start_method is set to one of 'fork',
+            'spawn', or 'forkserver'. With 'spawn', every test process imports
+            the checker (and everything it imports) again. With 'forkserver',
+            a server process imports the test suite's module (and so the
+            student's module, and heavy imports like numpy) once, and each test
+            process is forked from it, e.g.:
+
+                TestRun.start_method = 'forkserver'
+                TestRun.preload = ['numpy'] # optional extra modules to import
+
+            The modules a fork server imports are fixed once it has started.
+            Test suites which can't be pickled (e.g. which store a GUI), and
+            test suites defined in the script being run (whose module is
+            '__main__', so other processes would import it again without
+            running its "if __name__ == '__main__':" block, which defines the
+            reference solutions in the checkers), are run with 'fork' where it
+            is available.
+
+        Timeouts can instead be adapted to each test, from baselines measured
+            by running the reference solutions. Setting TestRun.calibrate to
+            True and running a checker as a script (e.g. with Autograder.py
+            --calibrate) records the time each passing test took, in
+            TestRun.timeout_cache, keyed by a hash of the checker file, along
+            with how long a test process takes to start (measured from the
+            running process, so including importing the checker with 'spawn').
+            While the checker is unchanged, tests run without a specified
+            timeout then use TestRun.timeout_scale times their baseline (but at
+            least TestRun.min_timeout seconds), plus the start-up time for the
+            current start method (or the longest recorded, if it wasn't
+            calibrated), instead of the default 'timeout'.
+
+        Tests run in separate processes can also be limited in the memory and
+            CPU time they use, by setting TestRun.memory_limit (in bytes, as
+            extra address space on top of what the process already uses) or
+            TestRun.cpu_limit (in seconds), or the same for a single suite
+            instance. Tests which run out of memory have the result
+            TestRun.MEMORY_EXCEEDED, and tests which run out of CPU time are
+            treated as timed out. Limits are only available where the
+            'resource' module is (e.g. not on Windows), and are not applied in
+            IDLE, where tests run in the main process.
+
+        Setting TestRun.result_cache to a file path (e.g.
+            'test_files/results.json') skips re-running tests whose inputs
+            haven't changed. Each test is fingerprinted from its name, the
+            suite's attributes (e.g. those set from its constructor
+            arguments), the files listed in self.fixtures (input files the
+            tests read), and the source files of the checker and the modules
+            it uses, directly or through other modules (e.g. the student's
+            module). Passes and failures are stored in the file by
+            fingerprint, and later runs with the same fingerprint reuse the
+            stored result instead of running the test. Only the
+            TestRun.result_cache_size most recently used results are kept.
+            Tests are always run when calibrating or profiling, and by
+            run_failed_tests. Suites whose attributes can't be compared between
+            runs (e.g. objects without a repr) aren't cached.
+
+        While a test runs, self.scratch_dir is the path of an empty folder only
+            that test uses, for any files it needs to write, e.g.:
+
+                out_file = os.path.join(self.scratch_dir, 'out.txt')
+
+            The folder (and everything in it) is removed when the test
+            finishes, so tests (and suites run in parallel) can't interfere
+            with each other's files. Scratch folders are made in
+            TestRun.scratch_root if it is set, otherwise in memory (/dev/shm)
+            where available, or the system's temporary folder. Outside of a
+            test run (e.g. when calling a test method directly), the folder is
+            made when first used, and removed when the instance is deleted or
+            Python exits.
             
         Constructor: TestRun(*int)
 
@@ -109,13 +266,23 @@ class TestRun(object):
         self._TP = TestPrint()
         self._timeout = timeout
         self._last_failed = []
-
-        # update test method docstrings with run information
-        for method_name in self.get_test_methods():
-            method = eval('self.' + method_name)
-            method.__func__.__doc__ += \
-                    '\n\nself.run_test({!r}) -> None\n\n'.format(
-                        method_name)
+        self._last_passed = []
+        self._capture = False # capture output of tests in other processes
+        self._profile = None  # folder for profiles of running tests, if any
+        self._scratch_dir = None # private folder of the running test
+
+        # find test methods, and update their docstrings with run information
+        self._get_registry()
+
+    def __getstate__(self):
+        ''' Pickle the resource limits and profiling options in effect along
+            with the instance. '''
+        state = dict(vars(self))
+        state['memory_limit'] = self.memory_limit
+        state['cpu_limit'] = self.cpu_limit
+        state['profile_memory'] = self.profile_memory
+        state['_scratch_dir'] = None # other processes make their own
+        return state
 
     def get_test_methods(self):
         ''' Returns the available test methods in this class.
@@ -125,13 +292,66 @@ class TestRun(object):
         self.get_test_methods() -> list[str]
 
         '''
-        return [m for m in dir(self) if m.startswith('test_')]
+        names, tests = self._get_registry()
+        # tests set on the instance itself
+        extra = [name for name, value in getattr(self, '__dict__', {}).items()
+                 if name.startswith('test_') and callable(value) and
+                 name not in tests]
+        return sorted(names + tuple(extra)) if extra else list(names)
+
+    @classmethod
+    def _get_registry(cls):
+        ''' Returns the registry of test methods of cls.
+
+        Test methods are found once per class, so finding a test takes the same
+            time however many tests there are. The registries of all classes
+            are forgotten whenever a test method is added to, removed from, or
+            replaced in a TestRun class (see _TestRunType), so they're found
+            again when next used. The registry is a tuple of (names, tests),
+            where names is the sorted test method names, and tests maps each
+            name to its (unbound) function.
+
+        cls._get_registry() -> tuple(tuple[str], dict)
+
+        '''
+        registry = TestRun._registries.get(cls)
+        if registry is not None:
+            return registry
+
+        tests = {}
+        for klass in reversed(cls.__mro__):
+            tests.update((name, value) for name, value in vars(klass).items()
+                         if name.startswith('test_'))
+        for name, function in tests.items():
+            usage = '\n\nself.run_test({!r}) -> None\n\n'.format(name)
+            if usage not in function.__doc__: # only document each test once
+                function.__doc__ += usage
 
-    def run_tests(self, methods=[], section='', verbose=False, timeout=None):
+        registry = TestRun._registries[cls] = (tuple(sorted(tests)), tests)
+        return registry
+
+    def _get_test(self, test_name):
+        ''' Returns the test method test_name, bound to this instance.
+
+        Tests set on the instance itself take priority over the class's.
+
+        self._get_test(str) -> method
+
+        '''
+        function = self._get_registry()[1].get(test_name)
+        if function is None or test_name in getattr(self, '__dict__', ()):
+            return getattr(self, test_name) # unregistered, or instance override
+        return function.__get__(self, type(self))
+
+    def run_tests(self, methods=[], section='', verbose=False, timeout=None,
+                  workers=1, results=None, slowest=0, profile=None,
+                  fail_fast=False):
         ''' Runs the specified methods at the given verbosity.
 
         'methods' is a list of the test methods to run. If left empty all the
             tests in the class are run (in sorted order, not defining order).
+            Tests which depend on other tests being run (see depends_on) are
+            run after them, and skipped if any of them don't pass.
 
         'section' is the name of the section currently being tested. If left
             empty defaults to the name of the testing class.
@@ -142,12 +362,51 @@ class TestRun(object):
             any tests which raise exceptions will print their traceback.
 
         'timeout' is the number of seconds after which a test is terminated as
-            'timed out'. If left as None, it is set to the instance default
-            timeout value. AUTOMATIC TIMEOUTS CANNOT BE IMPLEMENTED IN IDLE
-            (see __init__ docs).
-
-        self.run_tests(*list, *str, *bool, *int) -> None
+            'timed out'. If left as None, it is set to the test's adaptive
+            timeout if it has been calibrated, or otherwise the instance
+            default timeout value. AUTOMATIC TIMEOUTS CANNOT BE IMPLEMENTED IN
+            IDLE (see __init__ docs).
+
+        'workers' is the number of tests to run at the same time, in separate
+            worker processes (see WorkerPool docs). Output from each test is
+            held until it finishes, so results are still printed in order.
+            Uses self.pool if set, otherwise a pool is created for this run.
+            Tests can only be run in parallel outside IDLE.
+
+        'results' is a writable text stream (e.g. an open file) for machine-
+            readable results. If specified, a JSON record is written to it for
+            each test as soon as the test finishes, followed by a summary
+            record for the section, with one record per line (JSON Lines).
+            See TestPrint.json_result and TestPrint.json_section_end.
+
+        'slowest' is the number of slowest tests to list (with their wall and
+            CPU times) after the section summary. If 0, no list is printed.
+
+        'profile' is a folder to profile tests into. If specified, each test
+            is run with cProfile, and its hottest functions are printed after
+            its result (see run_test).
+
+        'fail_fast' is a boolean specifying if testing stops at the first test
+            which doesn't pass. If True, all later tests are skipped, and any
+            tests running in parallel are cancelled.
+
+        self.run_tests(*list, *str, *bool, *int, *int, *stream, *int, *str,
+                       *bool) -> None
         
+        '''
+        self._profile = profile
+        try:
+            self._run_tests(methods, section, verbose, timeout, workers,
+                            results, slowest, fail_fast)
+        finally:
+            self._profile = None
+
+    def _run_tests(self, methods, section, verbose, timeout, workers, results,
+                   slowest, fail_fast):
+        ''' Runs the specified methods, with arguments as for run_tests.
+
+        self._run_tests(list, str, bool, int, int, stream, int, bool) -> None
+
         '''
         if not section:
             section = type(self).__name__
@@ -155,23 +414,56 @@ class TestRun(object):
         self._print_IDLE_warning() # timeout warning for IDLE users
             
         self._last_failed = []
+        self._last_passed = []
         
         if not methods:
             # default to run all methods
             methods = self.get_test_methods()
+        all_tests = methods == self.get_test_methods()
+        # run tests after the tests they depend on
+        levels = self._get_dependency_levels(methods)
+        methods = [method for level in levels for method in level]
         
         # initialise counts
         num_tests = len(methods)
         passes = 0; failures = 0; errors = 0; timeouts = 0
+        memory_exceeded = 0; skipped = 0
 
         start = time.time()
 
+        # reuse results of unchanged tests, if using a result cache
+        use_cache = TestRun.result_cache and self._use_cache and \
+                    not TestRun.calibrate and not self._profile
+        cache = TestRun._load_result_cache() if use_cache else {}
+        fingerprints = self._get_fingerprints(methods) if use_cache else {}
+        cached = {method: TestResult.from_dict(cache[fingerprint])
+                  for method, fingerprint in fingerprints.items()
+                  if fingerprint in cache}
+
         # run the specified methods
-        for method in methods:
-            result = self.run_test(method, verbose, timeout) # run the test
+        test_results = self._run_methods(levels, cached, verbose, timeout,
+                                         workers, fail_fast)
+
+        suite = type(self).__name__
+        slowest_tests = [] # heap of the slowest tests so far
+        baselines = {} # durations of passing tests, if calibrating
+        for index, (method, test_result) in enumerate(zip(methods,
+                                                          test_results)):
+            if results is not None:
+                self._TP.json_result(results, suite, test_result)
+            if slowest:
+                # index breaks ties, so results themselves aren't compared
+                item = (test_result.duration, index, test_result)
+                if len(slowest_tests) < slowest:
+                    heapq.heappush(slowest_tests, item)
+                else:
+                    heapq.heappushpop(slowest_tests, item)
             # increment the relevant count
+            result = test_result.status
             if result == TestRun.PASS:
+                self._last_passed += [method]
                 passes += 1
+                baselines[method] = test_result.duration
             elif result == TestRun.FAIL:
                 self._last_failed += [method]
                 failures += 1
@@ -181,41 +473,73 @@ class TestRun(object):
             elif result == TestRun.TIMEOUT:
                 self._last_failed += [method]
                 timeouts += 1
+            elif result == TestRun.MEMORY_EXCEEDED:
+                self._last_failed += [method]
+                memory_exceeded += 1
+            elif result == TestRun.SKIPPED:
+                self._last_failed += [method]
+                skipped += 1
+            # store repeatable results for reuse
+            if use_cache and fingerprints[method] and \
+                    result in (TestRun.PASS, TestRun.FAIL):
+                cache[fingerprints[method]] = test_result.to_dict()
+                cache[fingerprints[method]]['used'] = time.time()
 
         duration = time.time() - start
         
-        if passes == 0 and methods == self.get_test_methods():
+        if passes == 0 and all_tests:
             print("  Run 'help({})'".format(type(self).__name__),
                   "to find out more about this test suite.", file=sys.stderr)
             
         # print an output specifying results and the end of the section
+        if cached:
+            self._TP.cached_results(len(cached))
         self._TP.section_end(num_tests, duration, passes, failures, errors,
-                             timeouts)
+                             timeouts, memory_exceeded, skipped)
+        if results is not None:
+            self._TP.json_section_end(results, suite, section, num_tests,
+                                      duration, passes, failures, errors,
+                                      timeouts, memory_exceeded, skipped)
+        if slowest:
+            self._TP.slowest_tests([test_result for *_, test_result in
+                                    sorted(slowest_tests, reverse=True)])
+        if TestRun.calibrate:
+            self._save_baselines(baselines)
+        if use_cache:
+            TestRun._save_result_cache(cache)
         
 
     def run_failed_tests(self, timeout=None):
         ''' Runs all tests from the last test run which did not pass.
 
-        Tests are run in verbose mode to display reasoning.
+        Tests are run in verbose mode to display reasoning, and are always
+            run rather than reused from the result cache (see __init__ docs).
 
         If no tests were failed in the last run, or there have been no previous
             runs, all tests are run.
 
         'timeout' is the number of seconds after which a test is terminated as
-            'timed out'. If left as None, it is set to the instance default
-            timeout value. AUTOMATIC TIMEOUTS CANNOT BE IMPLEMENTED IN IDLE
-            (see __init__ docs).
+            'timed out'. If left as None, it is set to the test's adaptive
+            timeout if it has been calibrated, or otherwise the instance
+            default timeout value. AUTOMATIC TIMEOUTS CANNOT BE IMPLEMENTED IN
+            IDLE (see __init__ docs).
 
         self.run_failed_tests(*int) -> None
 
         '''
-        self.run_tests(self._last_failed, 'Last Failed Tests', True, timeout)
+        self._use_cache = False
+        try:
+            self.run_tests(self._last_failed, 'Last Failed Tests', True,
+                           timeout)
+        finally:
+            del self._use_cache
 
-    def run_test(self, test_name, verbose=True, timeout=None):
+    def run_test(self, test_name, verbose=True, timeout=None, profile=None):
         ''' Returns the success state of running test_name.
 
         Return values are within the set [TestRun.PASS, TestRun.FAIL,
-            TestRun.ERROR, TestRun.TIMEOUT].
+            TestRun.ERROR, TestRun.TIMEOUT, TestRun.MEMORY_EXCEEDED,
+            TestRun.SKIPPED].
 
         'test_name' should be an instance method of the running class.
 
@@ -225,77 +549,1194 @@ class TestRun(object):
             a test which raises an exception will print its traceback.
 
         'timeout' is the number of seconds after which a test is terminated as
-            'timed out'. If left as None, it is set to the instance default
-            timeout value. AUTOMATIC TIMEOUTS CANNOT BE IMPLEMENTED IN IDLE
-            (see __init__ docs).
+            'timed out'. If left as None, it is set to the test's adaptive
+            timeout if it has been calibrated, or otherwise the instance
+            default timeout value. AUTOMATIC TIMEOUTS CANNOT BE IMPLEMENTED IN
+            IDLE (see __init__ docs).
+
+        'profile' is a folder to profile the test into. If specified, the test
+            is run with cProfile, its cProfile stats are saved in the folder as
+            'SuiteName.test_name.prof' (for use with pstats or snakeviz), and
+            its hottest functions are printed after its result. Profiling slows
+            tests down, so profiled tests get TestRun.profile_timeout_scale
+            times their usual timeout. Outside IDLE, a profiled test which runs
+            out of time is stopped just before it would be killed, so that its
+            profile shows where the time went (e.g. an infinite loop, or a
+            slow algorithm). If TestRun.profile_memory is True, the test's peak
+            memory use is also traced (with tracemalloc) and printed, which
+            slows tests down much further.
+
+        self.run_test(str, *bool, *int, *str) -> int
 
-        self.run_test(str, *bool, *int) -> int
+        '''
+        self._profile = profile
+        try:
+            return self._get_result(test_name, verbose, timeout).status
+        finally:
+            self._profile = None
+
+    def _get_result(self, test_name, verbose, timeout):
+        ''' Returns the full result of running test_name (see run_test).
+
+        self._get_result(str, bool, int) -> TestResult
 
         '''
-        if not timeout:
-            timeout = self._timeout
+        timeout = self._get_timeout(test_name, timeout)
 
         if self._TP.mode == 'TERM':
             # only auto-check for timeout if not in IDLE
-            # set up a pipe for the result
-            recv_end, send_end = multiprocessing.Pipe(False)
-            # set up the test function for running
-            p = multiprocessing.Process(name = test_name,
-                target = self._run_test, args=(test_name,verbose,timeout,
-                                               send_end))
-            # run and check for timeout
-            p.start(); p.join(timeout)
-            
-            if p.is_alive():
-                p.terminate(); p.join() # automatic timeout has occurred
-                self._TP.test_result('TIMEOUT') # test_name?
-                if verbose:
-                    print('    Automatic timeout after {}'.format(timeout),
-                          'seconds\n')
-                return TestRun.TIMEOUT
-            # test completed without timeout
-            return recv_end.recv() # extract and return result
+            try:
+                result = self._run_test_process(test_name, verbose, timeout)
+            except (TimeoutError, EOFError) as e:
+                if not self._capture:
+                    return self._process_failed(test_name, e, verbose,
+                                                timeout)
+                result = e # test name was only printed in the captured output
+            return self._replay(test_name, result, verbose, timeout)
         else:
             # run the test with only user-generated timeouts
             return self._run_test(test_name, verbose, timeout)
-                
-    def _run_test(self, test_name, verbose, timeout, send_end=None):
-        ''' Returns the result of running test_name with the given parameters.
 
-        If send_end is specified, sends the result via the result pipe.
+    def _run_tests_parallel(self, methods, verbose, timeout, workers,
+                            fail_fast=False):
+        ''' Yields the results of running methods in parallel, in order.
+
+        Each test's output is printed just before its result is yielded.
+
+        If fail_fast is True, as soon as any test finishes without passing,
+            the tests still running are cancelled, and yielded as skipped.
+
+        self._run_tests_parallel(list, bool, int, int, *bool)
+            -> generator[TestResult]
+
+        '''
+        timeouts = [self._get_timeout(method, timeout) for method in methods]
+
+        pool = self.pool or WorkerPool(workers)
+        running = pool.run_tests(self, methods, verbose, timeouts, workers)
+        finished = {}   # results which can't be printed yet, by index
+        next_index = 0  # index of the next result to print
+        stopped = None  # test which stopped the run, if fail_fast
+        try:
+            for index, result in running:
+                finished[index] = result
+                if fail_fast and not TestRun._passed(result):
+                    stopped = methods[index]
+                    running.close() # cancel the tests still running
+                    break
+                while next_index in finished:
+                    yield self._replay(methods[next_index],
+                                       finished.pop(next_index), verbose,
+                                       timeouts[next_index])
+                    next_index += 1
+        except pickle.PicklingError:
+            # suite can't be sent to workers - run the tests one at a time
+            for method in methods[next_index:]:
+                yield self._get_result(method, verbose, timeout)
+            return
+        finally:
+            running.close()
+            if pool is not self.pool:
+                pool.close() # pool was only created for this run
+
+        # print the tests which finished, and skip the cancelled ones
+        for index in range(next_index, len(methods)):
+            if index in finished:
+                yield self._replay(methods[index], finished.pop(index),
+                                   verbose, timeouts[index])
+            else:
+                yield self._skip(methods[index], 'Cancelled after {} did not '
+                                 'pass'.format(stopped), verbose)
+
+    @staticmethod
+    def _passed(result):
+        ''' Returns True if result (from WorkerPool.run_tests) is a pass.
+
+        TestRun._passed(tuple/Exception) -> bool
+
+        '''
+        return not isinstance(result, Exception) and \
+               result[0].status == TestRun.PASS
+
+    def _run_methods(self, levels, cached, verbose, timeout, workers,
+                     fail_fast):
+        ''' Yields the results of running the methods in levels, in order.
+
+        'levels' is a list of lists of methods, where methods only depend on
+            methods in earlier levels (see _get_dependency_levels). Each level
+            is run in parallel if workers > 1 (see run_tests).
+
+        Results in 'cached' (by method name) are reused instead of running the
+            method. Methods which depend on a method which didn't pass are
+            skipped, as are all methods after the first which doesn't pass if
+            fail_fast is True.
+
+        self._run_methods(list[list[str]], dict[str: TestResult], bool, int,
+                          int, bool) -> generator[TestResult]
+
+        '''
+        parallel = workers > 1 and self._TP.mode == 'TERM'
+        statuses = {}   # statuses of the methods run so far
+        stopped = None  # method which stopped the run, if fail_fast
+        for level in levels:
+            to_run = [method for method in level if method not in cached and
+                      not self._failed_dependencies(method, statuses)]
+            if parallel:
+                test_results = self._run_tests_parallel(to_run, verbose,
+                                                        timeout, workers,
+                                                        fail_fast)
+            else:
+                test_results = (self._get_result(method, verbose, timeout)
+                                for method in to_run)
+            try:
+                for method in level:
+                    failed = self._failed_dependencies(method, statuses)
+                    if method in cached:
+                        result = self._replay_cached(cached[method], verbose)
+                    elif stopped:
+                        result = self._skip(method, 'Skipped after {} did not '
+                                            'pass'.format(stopped), verbose)
+                    elif failed:
+                        result = self._skip(method, 'Skipped, as {} did not '
+                                            'pass'.format(', '.join(failed)),
+                                            verbose)
+                    else:
+                        result = next(test_results)
+                    statuses[method] = result.status
+                    if fail_fast and not stopped and result.status not in \
+                            (TestRun.PASS, TestRun.SKIPPED):
+                        stopped = method
+                        test_results.close() # cancel any tests still running
+                    yield result
+            finally:
+                test_results.close()
+
+    def _replay_cached(self, result, verbose):
+        ''' Prints the cached result as though its test had just been run.
+
+        self._replay_cached(TestResult, bool) -> TestResult
+
+        '''
+        self._TP.test_run(result.test_name)
+        self._TP.test_result(TestResult.NAMES[result.status])
+        if verbose and result.status == TestRun.FAIL:
+            print('    ' + result.message + '\n')
+        return result
+
+    def _skip(self, test_name, message, verbose):
+        ''' Prints and returns a skipped result for test_name.
 
-        self._run_test(str, bool, int, pipe) -> str/None
+        self._skip(str, str, bool) -> TestResult
 
         '''
+        self._TP.test_run(test_name)
+        self._TP.test_result('SKIPPED')
+        if verbose:
+            print('    ' + message + '\n')
+        return TestResult(test_name, TestRun.SKIPPED, message=message)
+
+    def _failed_dependencies(self, test_name, statuses):
+        ''' Returns the dependencies of test_name which ran but didn't pass.
+
+        'statuses' is a dictionary of the statuses of the tests run so far.
+
+        self._failed_dependencies(str, dict[str: int]) -> list[str]
+
+        '''
+        test = self._get_registry()[1].get(test_name)
+        return [name for name in getattr(test, '_dependencies', ())
+                if statuses.get(name, TestRun.PASS) != TestRun.PASS]
+
+    def _get_dependency_levels(self, methods):
+        ''' Returns methods grouped so tests run after their dependencies.
+
+        Each level holds the methods (in their given order) whose dependencies
+            in methods are all in earlier levels. Dependencies which aren't in
+            methods are ignored.
+
+        Raises ValueError if tests depend on each other in a cycle.
+
+        self._get_dependency_levels(list[str]) -> list[list[str]]
+
+        '''
+        tests = self._get_registry()[1]
+        levels = {} # method -> level
+        def get_level(method, path=()):
+            if method in path:
+                raise ValueError('Circular test dependencies: ' +
+                                 ' -> '.join(path + (method,)))
+            if method not in levels:
+                dependencies = [name for name in getattr(tests.get(method),
+                                '_dependencies', ()) if name in methods]
+                levels[method] = 1 + max((get_level(name, path + (method,))
+                                          for name in dependencies),
+                                         default=-1)
+            return levels[method]
+
+        grouped = []
+        for method in methods:
+            level = get_level(method)
+            while len(grouped) <= level:
+                grouped.append([])
+            grouped[level].append(method)
+        return grouped
+
+    @staticmethod
+    def depends_on(*test_names):
+        ''' Returns a decorator marking a test as depending on test_names.
+
+        When run together, a test is run after the tests it depends on, and is
+            skipped if any of them don't pass, e.g.:
+
+                @TestRun.depends_on('test_classes_exist')
+                def test_setup_canvas(self):
+                    ...
+
+        TestRun.depends_on(*str) -> function
+        
+        '''
+        def decorator(test):
+            test._dependencies = test_names
+            return test
+        return decorator
+
+    def _get_fingerprints(self, methods):
+        ''' Returns the fingerprints of the inputs of methods, by method.
+
+        Each fingerprint is a hash of the test's suite and name, the suite's
+            attributes and fixtures, and the source files of the suite's module
+            and every module it uses, directly or indirectly, which isn't part
+            of Python or an installed package (e.g. the student's module, and
+            this module). If any of those can't be found or compared, the
+            fingerprints are unknown (None), and the tests aren't cached.
+
+        self._get_fingerprints(list[str]) -> dict[str: str/None]
+
+        '''
+        suite_hash = self._get_suite_hash()
+        if suite_hash is None:
+            return dict.fromkeys(methods)
+        return {method: hashlib.sha256('{}.{}'.format(suite_hash, method)
+                                       .encode()).hexdigest()
+                for method in methods}
+
+    def _get_suite_hash(self):
+        ''' Returns a hash of the inputs shared by this suite's tests, or None
+            if they can't all be found (see _get_fingerprints).
+
+        self._get_suite_hash() -> str/None
+
+        '''
+        # functions and classes are described by name, and their modules are
+        #  hashed (e.g. reference solutions defined as lambdas in __init__)
+        state = [('memory_limit', repr(self.memory_limit)),
+                 ('cpu_limit', repr(self.cpu_limit))]
+        modules = [type(self).__module__]
+        for name, value in sorted(vars(self).items()):
+            if name in TestRun._RUN_STATE:
+                continue
+            if isinstance(value, (types.FunctionType, type)):
+                modules.append(value.__module__)
+                value = '<{}.{}>'.format(value.__module__, value.__qualname__)
+            else:
+                value = repr(value)
+                if ' at 0x' in value:
+                    return None # default repr, can't be compared between runs
+            state.append((name, value))
+
+        if any(name not in sys.modules for name in modules):
+            return None
+        dependencies = TestRun._get_dependencies(*map(sys.modules.get,
+                                                      modules))
+        if dependencies is None:
+            return None
+        suite_hash = hashlib.sha256(type(self).__qualname__.encode())
+        for module_name in dependencies:
+            file_hash = TestRun._hash_file(getattr(sys.modules[module_name],
+                                                   '__file__', None))
+            if file_hash is None:
+                return None # source unavailable (e.g. in IDLE's shell)
+            suite_hash.update(file_hash.encode())
+
+        # fixtures which are missing are hashed as missing
+        for path in self.fixtures:
+            suite_hash.update('{}:{}'.format(path, TestRun._hash_file(path))
+                              .encode())
+
+        suite_hash.update(repr(state).encode())
+        return suite_hash.hexdigest()
+
+    @staticmethod
+    def _get_dependencies(*modules):
+        ''' Returns the names of modules and the source modules they use, or
+            None if they can't all be found.
+
+        Modules are included if a module (or an included module) holds them or
+            something defined in them, or holds a value under the same name as
+            they do (e.g. the plain variables from an import *), unless they
+            are built in, or part of the Python installation or an installed
+            package.
+
+        TestRun._get_dependencies(*module) -> list[str]/None
+
+        '''
+        library = tuple({sys.prefix, sys.base_prefix, sys.exec_prefix,
+                         sys.base_exec_prefix})
+        # loaded modules which aren't part of Python or an installed package
+        sources = {}
+        for name, source in list(sys.modules.items()):
+            path = getattr(source, '__file__', None)
+            if path and not os.path.abspath(path).startswith(library):
+                sources[name] = source
+
+        names = list(dict.fromkeys(module.__name__ for module in modules))
+        index = 0
+        while index < len(names):
+            user = sys.modules[names[index]]
+            index += 1
+            for attr, value in list(vars(user).items()):
+                if attr.startswith('__'):
+                    continue # module details, e.g. __name__ and __builtins__
+                if isinstance(value, types.ModuleType):
+                    owners = [value.__name__]
+                else:
+                    owner = getattr(value, '__module__', None)
+                    owners = [owner] if isinstance(owner, str) else []
+                    # modules holding the same value by the same name
+                    owners += [name for name, source in sources.items()
+                               if source is not user and
+                               vars(source).get(attr, user) is value]
+                for owner in owners:
+                    if owner in names:
+                        continue
+                    if owner not in sys.modules:
+                        return None # value's module can't be checked
+                    if owner in sources:
+                        names.append(owner)
+        return names
+
+    @staticmethod
+    def _hash_file(path):
+        ''' Returns a hash of the file at path, or None if it can't be read.
+
+        Hashes are stored by modification time, so each file is only read
+            again if it has changed.
+
+        TestRun._hash_file(str/None) -> str/None
+
+        '''
+        try:
+            key = (os.path.abspath(path), os.stat(path).st_mtime_ns)
+            if key not in TestRun._file_hashes:
+                with open(path, 'rb') as source:
+                    TestRun._file_hashes[key] = \
+                            hashlib.sha256(source.read()).hexdigest()
+        except (TypeError, OSError):
+            return None
+        return TestRun._file_hashes[key]
+
+    @staticmethod
+    def _load_result_cache():
+        ''' Returns the results stored in TestRun.result_cache, by fingerprint.
+
+        Returns {} if the file is missing or unreadable.
+
+        TestRun._load_result_cache() -> dict
+
+        '''
+        try:
+            with open(TestRun.result_cache) as cache:
+                return json.load(cache)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _save_result_cache(cache):
+        ''' Adds the results in cache to TestRun.result_cache, keeping the
+            newest results.
+
+        Results are merged with those already in the file, keeping the most
+            recently used result for each fingerprint, so suites run at the
+            same time (e.g. by TestGroup) don't lose each other's results. The
+            file is locked while merging, where locking is available. Only the
+            TestRun.result_cache_size most recently used results are kept.
+
+        TestRun._save_result_cache(dict) -> None
+
+        '''
+        folder = os.path.dirname(TestRun.result_cache)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(TestRun.result_cache + '.lock', 'w') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX) # released on closing
+            cache = dict(cache)
+            for key, result in TestRun._load_result_cache().items():
+                if key not in cache or cache[key]['used'] < result['used']:
+                    cache[key] = result
+            TestRun._write_result_cache(cache)
+
+    @staticmethod
+    def _write_result_cache(cache):
+        ''' Writes the newest results in cache to TestRun.result_cache.
+
+        TestRun._write_result_cache(dict) -> None
+
+        '''
+        if len(cache) > TestRun.result_cache_size:
+            newest = sorted(cache, key=lambda key: cache[key]['used'],
+                            reverse=True)[:TestRun.result_cache_size]
+            cache = {key: cache[key] for key in newest}
+        # write to a temporary file first, so readers never see half a file
+        temporary = '{}.{}.tmp'.format(TestRun.result_cache, os.getpid())
+        with open(temporary, 'w') as cache_file:
+            json.dump(cache, cache_file)
+        os.replace(temporary, TestRun.result_cache)
+
+    def _get_timeout(self, test_name, timeout=None):
+        ''' Returns the timeout to run test_name with.
+
+        If timeout is None, uses the test's adaptive timeout if it has been
+            calibrated (and calibration isn't running), otherwise the instance
+            default timeout (see __init__ docs). Adaptive timeouts include the
+            calibrated start-up time of a test process, as the test's deadline
+            starts before its process does. Profiled tests get
+            self.profile_timeout_scale times the timeout.
+
+        self._get_timeout(str, *int) -> float
+
+        '''
+        if not timeout:
+            baseline = None if TestRun.calibrate else \
+                       self._get_baselines().get(test_name)
+            if baseline is None:
+                timeout = self._timeout
+            else:
+                timeout = round(max(TestRun.min_timeout,
+                                    TestRun.timeout_scale * baseline) +
+                                self._get_startup(), 2)
+        if self._profile:
+            return timeout * self.profile_timeout_scale
+        return timeout
+
+    @classmethod
+    def _get_baselines(cls):
+        ''' Returns the calibrated baseline durations of cls's tests.
+
+        Baselines are only returned if they were recorded for the current
+            version of the checker which defines cls.
+
+        cls._get_baselines() -> dict[str: float]
+
+        '''
+        checker_hash = cls._get_checker_hash()
+        if checker_hash is None:
+            return {}
+        return TestRun._load_timeout_cache().get(checker_hash, {}).get(
+            'suites', {}).get(cls.__name__, {})
+
+    @classmethod
+    def _get_startup(cls):
+        ''' Returns the calibrated start-up time of cls's test processes.
+
+        Uses the time recorded for the current start method, or the longest
+            recorded for any start method, or 0 if none were recorded.
+
+        cls._get_startup() -> float
+
+        '''
+        checker_hash = cls._get_checker_hash()
+        if checker_hash is None:
+            return 0
+        startup = TestRun._load_timeout_cache().get(checker_hash, {}).get(
+            'startup', {})
+        return startup.get(TestRun._get_start_method(),
+                           max(startup.values(), default=0))
+
+    @staticmethod
+    def _get_start_method():
+        ''' Returns the name of the start method set for test processes.
+
+        TestRun._get_start_method() -> str
+
+        '''
+        return multiprocessing.get_context(
+            TestRun.start_method).get_start_method()
+
+    @classmethod
+    def _get_checker_hash(cls):
+        ''' Returns a hash of the file which defines cls, or None if unknown.
+
+        cls._get_checker_hash() -> str/None
+
+        '''
+        return TestRun._hash_file(getattr(sys.modules.get(cls.__module__),
+                                          '__file__', None))
+
+    @staticmethod
+    def _load_timeout_cache():
+        ''' Returns the contents of TestRun.timeout_cache, or {} if missing.
+
+        The file is only read again if it has changed since it was last read.
+
+        TestRun._load_timeout_cache() -> dict
+
+        '''
+        try:
+            modified = os.stat(TestRun.timeout_cache).st_mtime_ns
+        except OSError:
+            return {}
+        if TestRun._timeout_data[0] != modified:
+            try:
+                with open(TestRun.timeout_cache) as cache:
+                    TestRun._timeout_data = (modified, json.load(cache))
+            except (OSError, ValueError):
+                return {} # unreadable or corrupted - treat as uncalibrated
+        return TestRun._timeout_data[1]
+
+    def _save_baselines(self, baselines):
+        ''' Records baselines (test durations by name) for this suite.
+
+        Baselines for older versions of the same checker file are removed, so
+            the cache only grows with the number of checkers. Outside IDLE, the
+            start-up time of a test process is also recorded, for the current
+            start method (keeping the longest recorded for this checker).
+
+        self._save_baselines(dict[str: float]) -> None
+
+        '''
+        checker_hash = self._get_checker_hash()
+        if checker_hash is None or not baselines:
+            return
+        path = os.path.abspath(sys.modules[type(self).__module__].__file__)
+        data = {key: value for key, value in
+                TestRun._load_timeout_cache().items()
+                if key == checker_hash or value.get('checker') != path}
+        entry = data.setdefault(checker_hash, {'checker': path, 'suites': {}})
+        entry['suites'].setdefault(type(self).__name__, {}).update(baselines)
+        if self._TP.mode == 'TERM':
+            startup = entry.setdefault('startup', {})
+            method = TestRun._get_start_method()
+            startup[method] = max(startup.get(method, 0),
+                                  round(self._measure_startup(), 3))
+
+        # write to a temporary file first, so readers never see half a file
+        temporary = '{}.{}.tmp'.format(TestRun.timeout_cache, os.getpid())
+        with open(temporary, 'w') as cache:
+            json.dump(data, cache, indent=1, sort_keys=True)
+        os.replace(temporary, TestRun.timeout_cache)
+
+    def _measure_startup(self):
+        ''' Returns the seconds taken to start a test process for this suite.
+
+        Timed from this process, from starting the test process until it
+            could send a result, as for a test which takes no time.
+
+        self._measure_startup() -> float
+
+        '''
+        recv_end, send_end = multiprocessing.Pipe(False)
         start = time.time()
+        p = TestRun._start_process(type(self).__module__, 'startup',
+                                   self._started, (send_end,))
+        send_end.close() # only the test process should send
+        try:
+            recv_end.recv()
+            return time.time() - start
+        except EOFError:
+            return 0 # process failed to start - nothing to measure
+        finally:
+            p.join()
+
+    def _started(self, send_end):
+        ''' Reports that a test process has started (see _measure_startup).
+
+        self._started(pipe) -> None
+
+        '''
+        send_end.send(None)
+
+    def _replay(self, test_name, result, verbose, timeout):
+        ''' Prints the output of a test run in another process, and returns its
+            result.
+
+        'result' is either a tuple of (result, output), or the error raised if
+            the test didn't finish (see WorkerPool.run_tests). Output is only
+            printed if it was captured (not None).
+
+        self._replay(str, tuple/Exception, bool, int) -> TestResult
+
+        '''
+        if isinstance(result, Exception):
+            self._TP.test_run(test_name)
+            return self._process_failed(test_name, result, verbose, timeout)
+
+        result, output = result
+        if output is not None:
+            TestRun._print_output(output)
+        return result
+
+    def _process_failed(self, test_name, error, verbose, timeout):
+        ''' Prints and returns the result of a test process which didn't finish.
+
+        'error' is TimeoutError if the test timed out, or EOFError if the test
+            process exited without sending a result (in which case the
+            duration of the test is unknown, and given as 0). The CPU time of
+            a test process which didn't finish is unknown, and given as 0.
+
+        self._process_failed(str, Exception, bool, int) -> TestResult
+
+        '''
+        if isinstance(error, TimeoutError):
+            # automatic timeout has occurred
+            self._TP.test_result('TIMEOUT') # test_name?
+            message = 'Automatic timeout after {} seconds'.format(timeout)
+            if verbose:
+                print('    ' + message + '\n')
+            return TestResult(test_name, TestRun.TIMEOUT, timeout, 0.0,
+                              message)
+
+        # test process exited without a result (e.g. from sys.exit)
+        self._TP.test_result('ERROR')
+        message = 'Test process exited unexpectedly'
+        if verbose:
+            print('    ' + message + '\n', file=sys.stderr)
+        return TestResult(test_name, TestRun.ERROR, 0.0, 0.0, message)
+
+    def _run_test_process(self, test_name, verbose, timeout):
+        ''' Returns the result of running test_name in a separate process.
+
+        Uses self.pool if one is set and this test suite can be sent to its
+            workers, otherwise starts a new process just for this test.
+
+        Returns a tuple of (result, output), where output is the captured
+            output of the test if self._capture is True, otherwise None (see
+            _run_captured).
+
+        Raises TimeoutError if the test takes longer than 'timeout' seconds,
+            or EOFError if the process exits without sending a result.
+
+        self._run_test_process(str, bool, int) -> tuple(TestResult, list/None)
+
+        '''
+        if self.pool is not None:
+            try:
+                return self.pool.run_test(self, test_name, verbose, timeout,
+                                          self._capture)
+            except pickle.PicklingError:
+                pass # suite can't be sent to a worker (e.g. holds a GUI)
+
+        # set up a pipe for the result
+        recv_end, send_end = multiprocessing.Pipe(False)
+        # run the test function and check for timeout
+        p = TestRun._start_process(type(self).__module__, test_name,
+            self._run_captured, (test_name, verbose, timeout, self._capture,
+                                 send_end))
+        send_end.close() # only the test process should send
+        if not recv_end.poll(self._hard_timeout(timeout)):
+            p.terminate(); p.join()
+            TestRun._remove_scratch_dirs(p.pid)
+            raise TimeoutError(test_name)
+        # test completed without timeout
+        try:
+            return recv_end.recv() # extract and return result
+        finally:
+            p.join()
+
+    def _run_captured(self, test_name, verbose, timeout, capture,
+                      send_end=None):
+        ''' Returns the result of running test_name, and its captured output.
+
+        If capture is True, output is the list of (stream_name, message)
+            writes made to sys.stdout and sys.stderr while running the test,
+            otherwise output is displayed as normal, and None is returned.
+
+        If send_end is specified, sends the result via the result pipe.
+
+        self._run_captured(str, bool, int, bool, pipe)
+            -> tuple(TestResult, list/None)
+
+        '''
+        output = None
+        if capture:
+            output = []
+            IO = TestRun._redirect_output(output)
+        limits = self._set_limits()
+        try:
+            result = self._run_test(test_name, verbose, timeout)
+        finally:
+            TestRun._reset_limits(limits)
+            if capture:
+                IO.close()
+            # make sure all printing is displayed before the result
+            sys.stdout.flush(); sys.stderr.flush()
+        if send_end: send_end.send((result, output))
+        return result, output
+
+    def _set_limits(self):
+        ''' Applies self.memory_limit and self.cpu_limit to this process.
+
+        The memory limit is applied as a limit on the process's address space
+            (RLIMIT_AS), starting from its current size, so allocating past it
+            raises a MemoryError. The CPU limit is applied as a limit on the
+            process's total CPU time (RLIMIT_CPU), starting from the CPU time
+            already used, and exceeding it raises TestRun._Timeout.
+
+        Returns the previous limits and signal handler, for _reset_limits.
+
+        self._set_limits() -> tuple(dict, handler)
+
+        '''
+        previous = {}
+        handler = None
+        if resource is None:
+            return previous, handler
+
+        if self.memory_limit:
+            previous[resource.RLIMIT_AS] = limit = \
+                    resource.getrlimit(resource.RLIMIT_AS)
+            soft = TestRun._address_space() + int(self.memory_limit)
+            if limit[1] != resource.RLIM_INFINITY:
+                soft = min(soft, limit[1])
+            resource.setrlimit(resource.RLIMIT_AS, (soft, limit[1]))
+
+        if self.cpu_limit and \
+                threading.current_thread() is threading.main_thread():
+            previous[resource.RLIMIT_CPU] = limit = \
+                    resource.getrlimit(resource.RLIMIT_CPU)
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            soft = math.ceil(usage.ru_utime + usage.ru_stime + self.cpu_limit)
+            if limit[1] != resource.RLIM_INFINITY:
+                soft = min(soft, limit[1])
+            cpu_limit = self.cpu_limit
+            def stop(signum, frame):
+                # stop further signals, then stop the test
+                resource.setrlimit(resource.RLIMIT_CPU, limit)
+                raise TestRun._Timeout('CPU limit of {} seconds exceeded'
+                                       .format(cpu_limit))
+            handler = signal.signal(signal.SIGXCPU, stop)
+            resource.setrlimit(resource.RLIMIT_CPU, (soft, limit[1]))
+
+        return previous, handler
+
+    @staticmethod
+    def _reset_limits(limits):
+        ''' Restores the limits returned by _set_limits.
+
+        TestRun._reset_limits(tuple(dict, handler)) -> None
+
+        '''
+        previous, handler = limits
+        for kind, limit in previous.items():
+            resource.setrlimit(kind, limit)
+        if handler is not None:
+            signal.signal(signal.SIGXCPU, handler)
+
+    @staticmethod
+    def _address_space():
+        ''' Returns the size of this process's address space, in bytes.
+
+        Returns 0 if it can't be found (i.e. without /proc, so limits are on
+            the total address space).
+
+        TestRun._address_space() -> int
+
+        '''
+        try:
+            with open('/proc/self/statm') as statm:
+                return int(statm.read().split()[0]) * \
+                        os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError):
+            return 0
+
+    @staticmethod
+    def _redirect_output(output):
+        ''' Returns a MultiRedirect capturing sys.stdout and sys.stderr writes.
+
+        Writes are appended to output as (stream_name, message) tuples, so
+            they can be printed in order later with _print_output. Closing the
+            MultiRedirect restores sys.stdout and sys.stderr.
+
+        TestRun._redirect_output(list) -> MultiRedirect
+
+        '''
+        return MultiRedirect(
+            Redirect(sys.stdout, TestRun._Output('stdout', output),
+                     maintain=False),
+            Redirect(sys.stderr, TestRun._Output('stderr', output),
+                     maintain=False))
+
+    @staticmethod
+    def _print_output(output, results=None):
+        ''' Prints output captured with _redirect_output, in order.
+
+        Writes recorded for the 'results' stream are written to results.
+
+        TestRun._print_output(list[tuple(str, str)], *stream) -> None
+
+        '''
+        for stream, message in output:
+            if stream == 'results':
+                results.write(message)
+            else:
+                getattr(sys, stream).write(message)
+        sys.stdout.flush()
+
+    class _Output(object):
+        ''' A write-only stream which records writes for later printing. '''
+        def __init__(self, stream_name, writes):
+            ''' Records messages written to this stream in writes.
+
+            Writes are recorded as (stream_name, message) tuples, so that
+                writes to multiple streams can share one list, and be printed
+                in the order they were made.
+
+            Constructor: TestRun._Output(str, list)
+
+            '''
+            self._stream_name = stream_name
+            self._writes = writes
+
+        def write(self, message):
+            ''' Records message as written to this stream. '''
+            self._writes.append((self._stream_name, message))
+            return len(message)
+
+        def flush(self):
+            ''' Nothing to flush - writes are recorded immediately. '''
+            pass
+
+        def close(self):
+            ''' Nothing to close - the recorded writes are kept. '''
+            pass
+
+    def _run_test(self, test_name, verbose, timeout):
+        ''' Returns the result of running test_name with the given parameters.
+
+        self._run_test(str, bool, int) -> TestResult
+
+        '''
         self._TP.test_run(test_name)
+        start = time.perf_counter(); cpu_start = time.process_time()
+        # wall and CPU time since the test started
+        elapsed = lambda: (time.perf_counter() - start,
+                           time.process_time() - cpu_start)
+        profile = {} # filled in if the test is profiled
+        outer_scratch_dir = self._scratch_dir # if used outside of a test run
+        self._scratch_dir = TestRun._make_scratch_dir(test_name)
         try:
-            exec('self.{}()'.format(test_name)) # run the function normally
+            self._call_test(test_name, timeout, profile)
             self._TP.test_result('PASS')        # test succeeded if no errors
-            if send_end: send_end.send(TestRun.PASS)
-            return TestRun.PASS
+            result = TestResult(test_name, TestRun.PASS, *elapsed())
         except (AssertionError,NameError) as e:
+            times = elapsed()
             self._TP.test_result('FAIL')        # test failed
             if verbose: print('    ' + str(e) + '\n')
-            if send_end: send_end.send(TestRun.FAIL)
-            return TestRun.FAIL
-        except KeyboardInterrupt:
-            # User-specified timeout of test occurred
-            duration = time.time() - start
+            result = TestResult(test_name, TestRun.FAIL, *times, str(e),
+                                ''.join(traceback.format_tb(e.__traceback__)))
+        except (KeyboardInterrupt, TestRun._Timeout) as e:
+            times = elapsed()
             self._TP.test_result('TIMEOUT')
+            if isinstance(e, KeyboardInterrupt):
+                # User-specified timeout of test occurred
+                message = 'User-generated timeout after {:.2f} seconds'.format(
+                    times[0])
+            else:
+                # test stopped by its CPU limit, or when profiled, stopped
+                #  just before its automatic timeout
+                message = str(e) or \
+                          'Automatic timeout after {} seconds'.format(timeout)
             if verbose:
-                print('    User-generated timeout after',
-                      '{:.2f} seconds\n'.format(duration))
-            if send_end: send_end.send(TestRun.TIMEOUT)
-            return TestRun.TIMEOUT
+                print('    ' + message + '\n')
+            result = TestResult(test_name, TestRun.TIMEOUT, *times, message)
+        except MemoryError:
+            # the test's memory is only freed after leaving this block
+            times = elapsed()
+            result = None
         except Exception as e:
+            times = elapsed()
             self._TP.test_result('ERROR')       # unknown error occurred
+            message = '{}: {}'.format(type(e).__name__, str(e))
             if verbose:
                 traceback.print_tb(e.__traceback__)
-                print('    {}: {}'.format(type(e).__name__, str(e)) + '\n',
-                      file=sys.stderr)
-            if send_end: send_end.send(TestRun.ERROR)
-            return TestRun.ERROR
+                print('    ' + message + '\n', file=sys.stderr)
+            result = TestResult(test_name, TestRun.ERROR, *times, message,
+                                ''.join(traceback.format_tb(e.__traceback__)))
+        finally:
+            shutil.rmtree(self._scratch_dir, ignore_errors=True)
+            self._scratch_dir = outer_scratch_dir
+
+        if result is None:
+            self._TP.test_result('MEMORY_EXCEEDED')
+            if self.memory_limit:
+                message = 'Memory limit of {:.1f} MiB exceeded'.format(
+                    self.memory_limit / 2**20)
+            else:
+                message = 'Ran out of memory'
+            if verbose:
+                print('    ' + message + '\n')
+            result = TestResult(test_name, TestRun.MEMORY_EXCEEDED, *times,
+                                message)
+
+        if profile:
+            result.profile = profile
+            self._TP.profile_summary(profile)
+        return result
+
+    @property
+    def scratch_dir(self):
+        ''' The path of the running test's private scratch folder.
+
+        Outside of a test run, a folder is made on first use, and removed when
+            this instance is deleted or Python exits (see __init__ docs).
+
+        self.scratch_dir -> str
+
+        '''
+        if self._scratch_dir is None:
+            self._scratch_dir = TestRun._make_scratch_dir('direct')
+            weakref.finalize(self, TestRun._remove_scratch_dir,
+                             self._scratch_dir, os.getpid())
+        return self._scratch_dir
+
+    @staticmethod
+    def _make_scratch_dir(name):
+        ''' Returns the path of a new scratch folder for this process.
+
+        TestRun._make_scratch_dir(str) -> str
+
+        '''
+        return tempfile.mkdtemp(
+            prefix=TestRun._scratch_prefix(os.getpid()) + name + '-',
+            dir=TestRun._get_scratch_root())
+
+    @staticmethod
+    def _remove_scratch_dir(path, pid):
+        ''' Removes the scratch folder at path, if this is the process which
+            made it (pid), and not a process forked from it.
+
+        TestRun._remove_scratch_dir(str, int) -> None
+
+        '''
+        if os.getpid() == pid:
+            shutil.rmtree(path, ignore_errors=True)
+
+    @staticmethod
+    def _get_scratch_root():
+        ''' Returns the folder to make scratch folders in.
+
+        None means the system's temporary folder.
+
+        TestRun._get_scratch_root() -> str/None
+
+        '''
+        if TestRun.scratch_root is not None:
+            return TestRun.scratch_root
+        if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+            return '/dev/shm' # tmpfs - files are never written to disk
+        return None
+
+    @staticmethod
+    def _scratch_prefix(pid):
+        ''' Returns the start of the scratch folder names of process pid. '''
+        return 'TestRun-{}-'.format(pid)
+
+    @staticmethod
+    def _remove_scratch_dirs(pid):
+        ''' Removes the scratch folders left by process pid (if killed).
+
+        TestRun._remove_scratch_dirs(int) -> None
+
+        '''
+        root = TestRun._get_scratch_root() or tempfile.gettempdir()
+        prefix = TestRun._scratch_prefix(pid)
+        try:
+            names = os.listdir(root)
+        except OSError:
+            return
+        for name in names:
+            if name.startswith(prefix):
+                shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+    def _call_test(self, test_name, timeout, profile):
+        ''' Calls the test method test_name, profiling it if self._profile.
+
+        When profiling, the test is run with cProfile (and tracemalloc, if
+            self.profile_memory), the cProfile stats are saved in the
+            self._profile folder, and profile is filled with a summary (see
+            TestResult). If the test is running
+            in a separate process, a timer stops it with TestRun._Timeout once
+            'timeout' seconds have passed, before the process is killed.
+
+        self._call_test(str, int, dict) -> None
+
+        '''
+        if not self._profile:
+            self._get_test(test_name)() # run the function normally
+            return
+
+        # stop the test before it's killed, if possible (only in processes)
+        timer = self._TP.mode == 'TERM' and hasattr(signal, 'setitimer') and \
+                threading.current_thread() is threading.main_thread()
+        if timer:
+            def stop(signum, frame):
+                raise TestRun._Timeout('Automatic timeout after {} seconds'
+                                       .format(timeout))
+            handler = signal.signal(signal.SIGALRM, stop)
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+
+        profiler = cProfile.Profile()
+        trace_memory = self.profile_memory
+        if trace_memory:
+            tracing = tracemalloc.is_tracing()
+            if not tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        try:
+            profiler.runcall(self._get_test(test_name))
+        finally:
+            if timer:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+                signal.signal(signal.SIGALRM, handler)
+            if trace_memory:
+                profile['peak_memory'] = tracemalloc.get_traced_memory()[1]
+                if not tracing:
+                    tracemalloc.stop()
+
+            os.makedirs(self._profile, exist_ok=True)
+            profile['stats_file'] = os.path.join(self._profile,
+                '{}.{}.prof'.format(type(self).__name__, test_name))
+            profiler.dump_stats(profile['stats_file'])
+            profile['hot_functions'] = TestRun._hot_functions(profiler)
+
+    @staticmethod
+    def _hot_functions(profiler, num=5):
+        ''' Returns the num functions which took the most time in profiler.
+
+        Functions are sorted by their own time (excluding time in functions
+            they call), and given as dictionaries with the function location,
+            number of calls, own time, and cumulative time.
+
+        TestRun._hot_functions(cProfile.Profile, *int) -> list[dict]
+
+        '''
+        stats = pstats.Stats(profiler).stats
+        hottest = sorted(stats.items(), key=lambda item: item[1][2],
+                         reverse=True)[:num]
+        return [{'function': pstats.func_std_string(function), 'calls': calls,
+                 'own_time': own_time, 'cumulative_time': cumulative_time}
+                for function, (_, calls, own_time, cumulative_time, _)
+                in hottest]
+
+    @staticmethod
+    def _get_context(module=None):
+        ''' Returns the multiprocessing context to start test processes with.
+
+        Uses TestRun.start_method. For a 'forkserver', also starts the server
+            if it isn't running (see _start_forkserver). A process forked from
+            the one which started the server can't use it, so uses 'fork', as
+            do test suites from the script being run (where module is
+            '__main__'), if 'fork' is available.
+
+        TestRun._get_context(*str) -> multiprocessing context
+
+        '''
+        context = multiprocessing.get_context(TestRun.start_method)
+        if module == '__main__' and context.get_start_method() != 'fork' and \
+                'fork' in multiprocessing.get_all_start_methods():
+            return multiprocessing.get_context('fork')
+        if context.get_start_method() == 'forkserver':
+            if TestRun._forkserver_pid not in (None, os.getpid()):
+                return multiprocessing.get_context('fork')
+            TestRun._start_forkserver(module)
+            TestRun._forkserver_pid = os.getpid()
+        return context
+
+    @staticmethod
+    def _start_forkserver(module=None):
+        ''' Starts the fork server if it isn't running, with modules preloaded.
+
+        The server imports this module, 'module' (the name of the test suite's
+            module), the modules it imports from (e.g. the student's module,
+            and numpy), and TestRun.preload. The script being run ('__main__')
+            is never preloaded, as the server would import it again without
+            running its main block. The server is given the current sys.path,
+            so modules found through changes to sys.path (like
+            sys.path.append('..') in the checkers) can also be preloaded.
+
+        TestRun._start_forkserver(*str) -> None
+
+        '''
+        preload = [__name__] + list(TestRun.preload)
+        if module in sys.modules:
+            preload.append(module)
+            for value in vars(sys.modules[module]).values():
+                if isinstance(value, types.ModuleType):
+                    preload.append(value.__name__)
+                elif isinstance(getattr(value, '__module__', None), str):
+                    preload.append(value.__module__)
+        preload = [name for name in dict.fromkeys(preload) # unique, in order
+                   if name in sys.modules and
+                   name not in ('builtins', '__main__')] + \
+                  [name for name in TestRun.preload if name not in sys.modules]
+        multiprocessing.forkserver.set_forkserver_preload(preload)
+
+        python_path = os.environ.get('PYTHONPATH')
+        os.environ['PYTHONPATH'] = os.pathsep.join(path or os.curdir
+                                                   for path in sys.path)
+        try:
+            multiprocessing.forkserver.ensure_running()
+        finally:
+            if python_path is None:
+                del os.environ['PYTHONPATH']
+            else:
+                os.environ['PYTHONPATH'] = python_path
+
+    @staticmethod
+    def _start_process(module, name, target, args):
+        ''' Returns a started process running target(*args).
+
+        'module' is the name of the test suite's module (see _get_context). If
+            target or args can't be pickled for the start method (e.g. a
+            suite which holds a GUI), the process is started with 'fork' where
+            it is available.
+
+        TestRun._start_process(str, str, function, tuple) -> Process
+
+        '''
+        context = TestRun._get_context(module)
+        p = context.Process(name=name, target=target, args=args)
+        try:
+            p.start()
+        except (pickle.PicklingError, TypeError, AttributeError):
+            if context.get_start_method() == 'fork' or 'fork' not in \
+                    multiprocessing.get_all_start_methods():
+                raise
+            p = multiprocessing.get_context('fork').Process(name=name,
+                target=target, args=args)
+            p.start()
+        return p
+
+    def _hard_timeout(self, timeout):
+        ''' Returns the seconds before a test process should be killed.
+
+        Profiled tests stop themselves at 'timeout' seconds, so are given a
+            little longer to send their results.
+
+        self._hard_timeout(int) -> int
+
+        '''
+        if self._profile:
+            return timeout + TestRun.PROFILE_GRACE
+        return timeout
+
+    class _Timeout(BaseException):
+        ''' Raised to stop a test which has run out of (CPU) time.
+
+        Not an Exception, so isn't caught by 'except Exception' in tests.
+
+        '''
+        pass
 
     def _print_IDLE_warning(self):
         ''' Prints a warning about disabled timeouts to IDLE users.
@@ -314,14 +1755,89 @@ class TestRun(object):
                     'too long.\n\n', 'stdout')
                 
 
+class TestResult(object):
+    ''' A class for storing the result of running a single test. '''
+    NAMES = {TestRun.PASS:'PASS', TestRun.FAIL:'FAIL', TestRun.ERROR:'ERROR',
+             TestRun.TIMEOUT:'TIMEOUT',
+             TestRun.MEMORY_EXCEEDED:'MEMORY_EXCEEDED',
+             TestRun.SKIPPED:'SKIPPED'}
+
+    def __init__(self, test_name, status, duration=0.0, cpu_time=0.0,
+                 message='', trace=''):
+        ''' The result of running the test test_name.
+
+        'status' is one of TestRun.PASS, TestRun.FAIL, TestRun.ERROR,
+            TestRun.TIMEOUT, TestRun.MEMORY_EXCEEDED, or TestRun.SKIPPED.
+
+        'duration' is the wall-clock time taken to run the test, in seconds.
+
+        'cpu_time' is the CPU time used by the process running the test while
+            running it, in seconds.
+
+        'message' is the failure reason (for failures), the exception type and
+            message (for errors), or a description of the timeout, memory
+            limit, or reason for skipping.
+
+        'trace' is the formatted traceback of a failure or error.
+
+        For profiled tests (see TestRun.run_test), the 'profile' attribute is
+            a dictionary of the test's 'stats_file' (path to the saved cProfile
+            stats), 'hot_functions' (the functions which took the most time),
+            and 'peak_memory' (bytes, if TestRun.profile_memory). Otherwise it
+            is None.
+
+        Constructor: TestResult(str, int, *float, *float, *str, *str)
+
+        '''
+        self.test_name = test_name
+        self.status = status
+        self.duration = duration
+        self.cpu_time = cpu_time
+        self.message = message
+        self.trace = trace
+        self.profile = None
+
+    def __repr__(self):
+        ''' A formal string representation of this TestResult. '''
+        return 'TestResult({!r}, {}, {:.6f})'.format(self.test_name,
+            TestResult.NAMES[self.status], self.duration)
+
+    def to_dict(self):
+        ''' Returns this result as a dictionary of JSON-compatible values.
+
+        self.to_dict() -> dict
+
+        '''
+        return {'test': self.test_name, 'status': self.status,
+                'result': TestResult.NAMES[self.status],
+                'duration': self.duration, 'cpu_time': self.cpu_time,
+                'message': self.message,
+                'traceback': self.trace, 'profile': self.profile}
+
+    @staticmethod
+    def from_dict(values):
+        ''' Returns the TestResult described by values (as from to_dict).
+
+        TestResult.from_dict(dict) -> TestResult
+
+        '''
+        result = TestResult(values['test'], values['status'],
+                            values['duration'], values['cpu_time'],
+                            values['message'], values['traceback'])
+        result.profile = values.get('profile')
+        return result
+
+
 class TestPrint(object):
     ''' A class for printing test success states. '''
     # Terminal/IDLE colour specifier
     ColourMap = {'TERM':
-                 {'ERROR':35, 'TIMEOUT':34, 'PASS':32, 'FAIL':31, 'STD':0},
+                 {'ERROR':35, 'TIMEOUT':34, 'PASS':32, 'FAIL':31, 'STD':0,
+                  'MEMORY_EXCEEDED':33, 'SKIPPED':37},
                  'IDLE':
                  {'ERROR':'BUILTIN', 'TIMEOUT':'DEFINITION', 'PASS':'STRING',
-                  'FAIL':'COMMENT', 'STD':'stdout'}
+                  'FAIL':'COMMENT', 'STD':'stdout',
+                  'MEMORY_EXCEEDED':'KEYWORD', 'SKIPPED':'console'}
                 }
     
     def __init__(self):
@@ -343,7 +1859,8 @@ class TestPrint(object):
     def test_result(self, success_state):
         ''' Prints success state in a standardised format.
 
-        success_state can be one of 'PASS', 'FAIL', 'ERROR' or 'TIMEOUT'.
+        success_state can be one of 'PASS', 'FAIL', 'ERROR', 'TIMEOUT',
+            'MEMORY_EXCEEDED' or 'SKIPPED'.
 
         self.test_result(str) -> None
 
@@ -386,10 +1903,15 @@ class TestPrint(object):
         print('\n#' + before + section + after + '#\n')
 
     @staticmethod
-    def section_end(num_tests, duration, passes, failures, errors, timeouts):
+    def section_end(num_tests, duration, passes, failures, errors, timeouts,
+                    memory_exceeded=0, skipped=0):
         ''' Prints a section summary and ending for the given results.
 
-        TestPrint.section_end(int, float, int, int, int, int) -> None
+        Tests which exceeded their memory limit or were skipped are only
+            mentioned if there were any.
+
+        TestPrint.section_end(int, float, int, int, int, int, *int, *int)
+            -> None
 
         '''
         # correct print output for single cases
@@ -402,11 +1924,387 @@ class TestPrint(object):
         if timeouts == 1: ts = 'timeout'
         else: ts = 'timeouts'
 
-        print('\nRan {} tests, with {} {}, {} {}, {} {}, and {} {}.'.format(
-            num_tests, passes, ps, failures, fs, errors, es, timeouts, ts))
+        counts = ['{} {}'.format(passes, ps), '{} {}'.format(failures, fs),
+                  '{} {}'.format(errors, es), '{} {}'.format(timeouts, ts)]
+        if memory_exceeded:
+            counts.append('{} memory limit{} exceeded'.format(memory_exceeded,
+                          '' if memory_exceeded == 1 else 's'))
+        if skipped:
+            counts.append('{} skipped'.format(skipped))
+
+        print('\nRan {} tests, with {}, and {}.'.format(num_tests,
+              ', '.join(counts[:-1]), counts[-1]))
         print('Testing took {:.3f}s'.format(duration))
         print('#' + '-'*78 + '#\n')
 
+    @staticmethod
+    def profile_summary(profile):
+        ''' Prints the peak memory and hottest functions of a profiled test.
+
+        TestPrint.profile_summary(dict) -> None
+
+        '''
+        if 'peak_memory' in profile:
+            print('    Peak memory: {:.1f} KiB'.format(
+                profile['peak_memory']/1024))
+        print('    Hottest functions (own time, calls, function):')
+        for function in profile['hot_functions']:
+            print('      {:>8.3f}s {:>9}  {}'.format(function['own_time'],
+                function['calls'], function['function']))
+        print('    Full profile saved to {!r}\n'.format(profile['stats_file']))
+
+    @staticmethod
+    def cached_results(num_cached):
+        ''' Prints how many test results were reused from the result cache.
+
+        TestPrint.cached_results(int) -> None
+
+        '''
+        print('\n  {} unchanged test result{} reused from the result cache'
+              .format(num_cached, ' was' if num_cached == 1 else 's were'))
+
+    @staticmethod
+    def slowest_tests(results):
+        ''' Prints a table of the given results, with their wall and CPU times.
+
+        Results are printed in the order given (generally slowest first).
+
+        TestPrint.slowest_tests(list[TestResult]) -> None
+
+        '''
+        print('Slowest tests:')
+        for result in results:
+            print('  {0:<45}{1:>9.3f}s wall{2:>9.3f}s cpu'.format(
+                result.test_name, result.duration, result.cpu_time))
+        print('#' + '-'*78 + '#\n')
+
+    @staticmethod
+    def json_result(stream, suite, result):
+        ''' Writes result as a JSON record on its own line in stream.
+
+        The record has 'type': 'test', the name of the suite (TestRun class),
+            and the values from TestResult.to_dict. The stream is flushed so
+            the record can be read as soon as the test is finished.
+
+        TestPrint.json_result(stream, str, TestResult) -> None
+
+        '''
+        record = {'type': 'test', 'suite': suite}
+        record.update(result.to_dict())
+        stream.write(json.dumps(record) + '\n')
+        stream.flush()
+
+    @staticmethod
+    def json_section_end(stream, suite, section, num_tests, duration, passes,
+                         failures, errors, timeouts, memory_exceeded=0,
+                         skipped=0):
+        ''' Writes a section summary as a JSON record on its own line in stream.
+
+        The record has 'type': 'summary', and the same values as section_end.
+
+        TestPrint.json_section_end(stream, str, str, int, float, int, int, int,
+                                   int, *int, *int) -> None
+
+        '''
+        record = {'type': 'summary', 'suite': suite, 'section': section,
+                  'tests': num_tests, 'duration': duration, 'passes': passes,
+                  'failures': failures, 'errors': errors, 'timeouts': timeouts,
+                  'memory_exceeded': memory_exceeded, 'skipped': skipped}
+        stream.write(json.dumps(record) + '\n')
+        stream.flush()
+
+
+class WorkerPool(object):
+    ''' A class for running tests in persistent worker processes. '''
+    def __init__(self, size=1):
+        ''' A pool of worker processes which are kept alive between tests.
+
+        Running each test in a new process isolates it, but starting a process
+            often takes much longer than a short test itself. Workers in a pool
+            instead run tests one after another, and are kept alive between
+            tests (and between TestRun instances), so the start-up cost is only
+            paid once per worker. A worker is only replaced if its test times
+            out, or if the worker dies while running a test.
+
+        'size' is the default number of workers used to run tests in parallel
+            (see run_tests). Single tests only ever use one worker.
+
+        To run all test suites with a pool, set TestRun.pool, as in:
+
+            TestRun.pool = WorkerPool()
+            <run tests as normal>
+            TestRun.pool.close() # stop all the workers
+
+        Workers are started when first needed, and see the program as it was
+            at that time. Workers belong to the process that started them, so
+            a copy of the pool in another process (e.g. from forking, or
+            pickling) starts its own workers. Unlike with separate processes,
+            changes a test makes to global variables can be seen by later tests
+            in the same worker. Test suites which can't be pickled (e.g. which
+            store a GUI) are run in a new process as normal. Workers are
+            started with TestRun.start_method (see TestRun docs).
+
+        Constructor: WorkerPool(*int)
+
+        '''
+        self._size = size
+        self._workers = []
+        self._pid = os.getpid() # process which owns the workers
+
+    def __del__(self):
+        ''' Clean up the worker processes. '''
+        self.close()
+
+    def __reduce__(self):
+        ''' Pickle only the pool settings - workers can't be shared. '''
+        return WorkerPool, (self._size,)
+
+    def __enter__(self):
+        ''' Initialisation functionality for usage in 'with' statements. '''
+        return self
+
+    def __exit__(self, *args):
+        ''' Cleanup functionality for usage in 'with' statements. '''
+        self.close()
+
+    def run_test(self, test_run, test_name, verbose, timeout, capture=False):
+        ''' Returns the result of running test_name from test_run in a worker.
+
+        Returns a tuple of (result, output). If capture is True, output is the
+            list of (stream_name, message) writes made to sys.stdout and
+            sys.stderr while running the test, otherwise output is displayed
+            directly by the worker, and is None.
+
+        Raises pickle.PicklingError if test_run can't be sent to a worker,
+            TimeoutError if the test takes longer than 'timeout' seconds, and
+            EOFError if the worker dies without sending a result. In the last
+            two cases the worker is replaced.
+
+        self.run_test(TestRun, str, bool, int, *bool)
+            -> tuple(TestResult, list/None)
+
+        '''
+        self._check_owner()
+        worker = self._workers[0] if self._workers else \
+                 self._start_worker(type(test_run).__module__)
+        self._send(worker, (test_run, test_name, verbose, timeout, capture))
+
+        if not worker.poll(test_run._hard_timeout(timeout)):
+            self._replace(worker)
+            raise TimeoutError(test_name)
+
+        try:
+            return worker.recv()
+        except EOFError:
+            # worker died without sending a result (e.g. from sys.exit)
+            self._replace(worker)
+            raise
+
+    def run_tests(self, test_run, test_names, verbose, timeout, workers=None):
+        ''' Yields the results of running test_names from test_run in parallel.
+
+        Results are yielded as tests finish, as tuples of (index, result),
+            where index is the position of the test in test_names. For tests
+            which finish, result is a tuple of (result, output), where output
+            is a list of the (stream_name, message) writes made to sys.stdout
+            and sys.stderr while running the test, for printing in order later.
+            For tests which don't finish, result is the TimeoutError or
+            EOFError that run_test would have raised.
+
+        'timeout' is the timeout for every test, or a list of the timeout for
+            each test in test_names.
+
+        'workers' is the number of tests to run at the same time. If left as
+            None, it is set to the size of this pool.
+
+        Raises pickle.PicklingError if test_run can't be sent to a worker.
+
+        self.run_tests(TestRun, list[str], bool, int/list[int], *int)
+            -> generator[tuple(int, tuple/Exception)]
+
+        '''
+        self._check_owner()
+        workers = workers or self._size
+        idle = self._workers[:workers] # existing workers, started if needed
+        if not isinstance(timeout, list):
+            timeout = [timeout] * len(test_names)
+        pending = list(enumerate(zip(test_names, timeout)))[::-1] # pop front
+        running = {} # worker -> (index, test_name, deadline)
+
+        try:
+            while pending or running:
+                # start tests until 'workers' tests are running
+                while pending and len(running) < workers:
+                    worker = idle.pop() if idle else \
+                             self._start_worker(type(test_run).__module__)
+                    index, (test_name, test_timeout) = pending.pop()
+                    self._send(worker, (test_run, test_name, verbose,
+                                        test_timeout, True))
+                    running[worker] = (index, test_name, time.time() +
+                                       test_run._hard_timeout(test_timeout))
+
+                # wait for the next result, or the next timeout
+                next_deadline = min(deadline for _, _, deadline in
+                                    running.values())
+                ready = multiprocessing.connection.wait(
+                    [worker.connection for worker in running],
+                    max(next_deadline - time.time(), 0))
+
+                now = time.time()
+                for worker in list(running):
+                    index, test_name, deadline = running[worker]
+                    if worker.connection in ready:
+                        try:
+                            result = worker.recv()
+                            idle.append(worker)
+                        except EOFError as e:
+                            # worker died without sending a result
+                            self._replace(worker)
+                            result = e
+                    elif deadline <= now:
+                        self._replace(worker)
+                        result = TimeoutError(test_name)
+                    else:
+                        continue # still running
+                    del running[worker]
+                    yield index, result
+        finally:
+            # workers still running tests (e.g. if stopped early) can't be
+            #  reused, because their results would be received later
+            for worker in running:
+                self._replace(worker)
+
+    def close(self):
+        ''' Stops all the workers in this pool.
+
+        The pool can still be used afterwards, in which case new workers are
+            started as required.
+
+        self.close() -> None
+
+        '''
+        self._check_owner()
+        for worker in self._workers:
+            worker.stop()
+        self._workers = []
+
+    def _check_owner(self):
+        ''' Forgets any workers which belong to another process.
+
+        Workers inherited from a parent process (e.g. from forking) are still
+            in use by the parent, so must be left alone.
+
+        self._check_owner() -> None
+
+        '''
+        if os.getpid() != self._pid:
+            self._workers = []
+            self._pid = os.getpid()
+
+    def _start_worker(self, module=None):
+        ''' Starts a new worker, and adds it to the pool.
+
+        'module' is the name of the module of the test suite the worker is for
+            (see TestRun._get_context).
+
+        self._start_worker(*str) -> WorkerPool._Worker
+
+        '''
+        worker = WorkerPool._Worker(TestRun._get_context(module))
+        self._workers.append(worker)
+        return worker
+
+    def _replace(self, worker):
+        ''' Kills worker, and removes it from the pool.
+
+        A new worker is started next time one is needed.
+
+        self._replace(WorkerPool._Worker) -> None
+
+        '''
+        worker.kill()
+        self._workers.remove(worker)
+
+    @staticmethod
+    def _send(worker, task):
+        ''' Sends task to worker.
+
+        Raises pickle.PicklingError if the task can't be pickled.
+
+        WorkerPool._send(WorkerPool._Worker, tuple) -> None
+
+        '''
+        try:
+            worker.send(task)
+        except (pickle.PicklingError, TypeError, AttributeError) as e:
+            raise pickle.PicklingError(str(e)) from e
+
+    @staticmethod
+    def _work(conn):
+        ''' Runs tests received through conn until told to stop.
+
+        Each task is a tuple of (TestRun, test_name, verbose, timeout, capture)
+            and the result of each test is sent back through conn as a tuple
+            of (result, output) (see TestRun._run_captured). A task of None
+            stops the worker.
+
+        WorkerPool._work(Connection) -> None
+
+        '''
+        while True:
+            try:
+                task = conn.recv()
+            except (EOFError, KeyboardInterrupt):
+                break # pool has been closed
+            if task is None:
+                break
+            test_run, test_name, *args = task
+            conn.send(test_run._run_captured(test_name, *args))
+
+    class _Worker(object):
+        ''' A single persistent worker process and its connection. '''
+        def __init__(self, context=multiprocessing):
+            ''' Starts a new worker process, using the multiprocessing context.
+
+            Constructor: WorkerPool._Worker(*multiprocessing context)
+
+            '''
+            self.connection, worker_end = multiprocessing.Pipe()
+            # daemonic, so any remaining workers are stopped at exit
+            self._process = context.Process(name='TestRun worker',
+                target=WorkerPool._work, args=(worker_end,), daemon=True)
+            self._process.start()
+            worker_end.close() # only the worker should hold its end
+
+        def send(self, task):
+            ''' Sends a task to the worker. '''
+            self.connection.send(task)
+
+        def poll(self, timeout):
+            ''' Returns True if a result (or EOF) arrives within timeout. '''
+            return self.connection.poll(timeout)
+
+        def recv(self):
+            ''' Returns the result sent by the worker. '''
+            return self.connection.recv()
+
+        def stop(self):
+            ''' Asks the worker to stop, killing it if it doesn't. '''
+            try:
+                self.connection.send(None)
+            except (OSError, ValueError):
+                pass # worker already dead, or connection already closed
+            self._process.join(1)
+            self.kill()
+
+        def kill(self):
+            ''' Terminates the worker and closes its connection. '''
+            if self._process.is_alive():
+                self._process.terminate()
+            self._process.join()
+            TestRun._remove_scratch_dirs(self._process.pid)
+            self.connection.close()
+
 
 class Emulator(object):
     ''' A class for holding multiple instances and emulating one. '''
@@ -425,32 +2323,73 @@ class Emulator(object):
             criteria.
             
         All methods are the same as those for a stored object in objs, with
-            the addition of the 'runs' and 'ids' arguments in each. If both
-            'runs' and 'ids' are unspecified, methods should only be called that
-            are common to all stored objs.
+            the addition of the 'runs' and 'ids' arguments in each, and return
+            a list of the values returned by each matching obj. If both 'runs'
+            and 'ids' are unspecified, methods should only be called that are
+            common to all stored objs.
 
         Constructor: Emulator(superclass, *objs)
 
         '''
         self._default = default
         self._objs = objs
+        self._selections = {} # (runs, ids) -> matching objs
         
     def __getattr__(self, attr, *args):
-        ''' Wraps called methods with _wrap function (+ 'runs', 'ids'). '''
-        return self._wrap(attr, *args)
+        ''' Wraps called methods with _wrap function (+ 'runs', 'ids').
+
+        The wrapped method is stored as an attribute of this instance, so
+            later uses of attr don't need wrapping again. It only holds a weak
+            reference to this instance, so an Emulator which is no longer used
+            is deleted straight away, rather than by the garbage collector
+            (e.g. so a dropped MultiRedirect restores the standard streams).
+
+        '''
+        if attr.startswith('__') or attr in ('_default', '_objs',
+                                             '_selections'):
+            raise AttributeError(attr) # not set up yet (e.g. unpickling)
+        wrapped = self._wrap(attr, *args)
+        setattr(self, attr, wrapped)
+        return wrapped
     
     def _wrap(self, attr, *args):
         ''' Calls requested method on all stored instances that match at least
             one class in 'runs' and have their id (index) in 'ids'.
         '''
-        def g(*a, runs=self._default, ids=range(len(self._objs)), **kw):
-            res = None
-            for index, obj in enumerate(self._objs):
-                if isinstance(obj, runs) and index in ids:
-                    res = getattr(obj, attr, *args)(*a, **kw)
-            return res
+        emulator = weakref.proxy(self) # no reference cycle once stored
+        def g(*a, runs=None, ids=None, **kw):
+            return [getattr(obj, attr, *args)(*a, **kw)
+                    for obj in emulator._select(runs, ids)]
         return g
 
+    def _select(self, runs=None, ids=None):
+        ''' Returns the stored instances matching 'runs' and 'ids'.
+
+        runs and ids default to the Emulator's default class and all ids.
+            Selections are cached, as the stored instances don't change.
+
+        self._select(*type/tuple, *iterable[int]) -> tuple
+
+        '''
+        if ids is not None:
+            ids = tuple(ids) # a generator of ids can only be used once
+        key = (runs, ids)
+        try:
+            return self._selections[key]
+        except KeyError:
+            pass
+        except TypeError:
+            key = None # unhashable 'runs' - select without caching
+
+        if runs is None:
+            runs = self._default
+        ids = range(len(self._objs)) if ids is None else set(ids)
+        selection = tuple(obj for index, obj in enumerate(self._objs)
+                          if isinstance(obj, runs) and index in ids)
+        if key is not None:
+            self._selections[key] = selection
+        return selection
+
         
 class TestGroup(Emulator):
     ''' A class for grouping TestRun instances. '''
@@ -475,16 +2414,190 @@ class TestGroup(Emulator):
         '''
         super().__init__(TestRun, *test_runs)
 
+    def run_tests(self, *args, runs=TestRun, ids=None, suites=1, **kwargs):
+        ''' Runs tests for the TestRuns matching 'runs' and 'ids'.
+
+        Arguments are the same as for TestRun.run_tests, with the addition of
+            'runs' and 'ids' (see TestGroup docs), and 'suites'.
+
+        'suites' is the number of TestRuns to run at the same time, each in a
+            separate process. Output from each TestRun is held until it
+            finishes, then printed as one section, in the order the TestRuns
+            are stored. Suites can only be run concurrently outside IDLE, and
+            'results' (if used) must be passed as a keyword argument.
+
+        self.run_tests(*list, *str, *bool, *int, *int, **type, **tuple,
+                       **int) -> None
+
+        '''
+        if suites <= 1 or TestPrint().mode != 'TERM':
+            self._wrap('run_tests')(*args, runs=runs, ids=ids, **kwargs)
+            return
+
+        test_runs = self._select(runs, ids)
+        pending = list(enumerate(test_runs))[::-1] # pop from the front
+        running = {} # connection -> (index, process)
+        finished = {} # output of suites which can't be printed yet, by index
+        next_index = 0 # index of the next suite to print
+
+        while pending or running:
+            # start suites until 'suites' suites are running
+            while pending and len(running) < suites:
+                index, test_run = pending.pop()
+                recv_end, send_end = multiprocessing.Pipe(False)
+                p = TestRun._start_process(type(test_run).__module__,
+                    type(test_run).__name__, TestGroup._run_suite,
+                    (test_run, args, kwargs, send_end))
+                send_end.close() # only the suite should send
+                running[recv_end] = (index, p)
+
+            for conn in multiprocessing.connection.wait(list(running)):
+                index, p = running.pop(conn)
+                try:
+                    finished[index] = conn.recv()
+                except EOFError:
+                    # suite process exited without a result - report it
+                    p.join()
+                    finished[index] = TestGroup._suite_failed(
+                        test_runs[index], args, kwargs, p.exitcode)
+                p.join()
+
+            # print all suites which have finished, up to the first unfinished
+            while next_index in finished:
+                output, last_failed, last_passed = finished.pop(next_index)
+                TestRun._print_output(output, kwargs.get('results'))
+                test_runs[next_index]._last_failed = last_failed
+                test_runs[next_index]._last_passed = last_passed
+                next_index += 1
+
+    @staticmethod
+    def _suite_failed(test_run, args, kwargs, exitcode):
+        ''' Returns the output of a suite whose process exited without sending
+            its results, in the form sent by _run_suite.
+
+        The output is a section for the suite (as would be printed by
+            test_run.run_tests(*args, **kwargs)), with each of its tests
+            counted as an ERROR.
+
+        TestGroup._suite_failed(TestRun, tuple, dict, int)
+            -> tuple(list[tuple(str, str)], list[str], list[str])
+
+        '''
+        options = dict(zip(('methods', 'section', 'verbose'), args), **kwargs)
+        methods = options.get('methods') or test_run.get_test_methods()
+        section = options.get('section') or type(test_run).__name__
+        suite = type(test_run).__name__
+        message = 'Suite process exited unexpectedly (exit code {})'.format(
+            exitcode)
+
+        output = []
+        IO = TestRun._redirect_output(output)
+        results = TestRun._Output('results', output)
+        TP = TestPrint()
+        try:
+            TP.print_section(section)
+            print('  ' + message + ' - no test results were received.\n',
+                  file=sys.stderr)
+            for method in methods:
+                TP.test_run(method)
+                TP.test_result('ERROR')
+                if options.get('verbose'):
+                    print('    ' + message + '\n', file=sys.stderr)
+                if kwargs.get('results') is not None:
+                    TP.json_result(results, suite,
+                        TestResult(method, TestRun.ERROR, message=message))
+            TP.section_end(len(methods), 0, 0, 0, len(methods), 0, 0, 0)
+            if kwargs.get('results') is not None:
+                TP.json_section_end(results, suite, section, len(methods), 0,
+                                    0, 0, len(methods), 0, 0, 0)
+        finally:
+            IO.close()
+        return output, list(methods), []
+
+    @staticmethod
+    def _run_suite(test_run, args, kwargs, send_end):
+        ''' Runs test_run.run_tests, and sends its output through send_end.
+
+        Output is sent as a list of the (stream_name, message) writes made to
+            sys.stdout and sys.stderr, together with the tests that didn't
+            pass and the tests that did (to allow run_failed_tests in the
+            parent process).
+
+        TestGroup._run_suite(TestRun, tuple, dict, Connection) -> None
+
+        '''
+        output = []
+        IO = TestRun._redirect_output(output)
+        test_run._capture = True # output of test processes is also needed
+        if kwargs.get('results') is not None:
+            # record results for writing to the real stream in the parent
+            kwargs = dict(kwargs, results=TestRun._Output('results', output))
+        try:
+            test_run.run_tests(*args, **kwargs)
+        finally:
+            IO.close()
+            send_end.send((output, test_run._last_failed,
+                           test_run._last_passed))
+
 
 class Redirect(object):
     ''' Redirect a stream to one or more places. '''
     # Inspiration: https://stackoverflow.com/q/616645
-    def __init__(self, in_stream, *out_streams, maintain=True):
+    buffer_size = 2**13 # characters of buffered writes held before writing
+
+    _context_streams = {} # standard stream name -> installed _ContextStream
+    _context_lock = threading.Lock() # for installing/restoring _ContextStreams
+
+    def __init__(self, in_stream, *out_streams, maintain=True, capture=False,
+                 buffered=False, local=False):
         ''' Mimic the functionality of the Unix 'Tee' command.
 
         Redirects calls to in_stream to all streams in out_streams. By default,
             out_streams includes in_stream unless 'maintain' is set to False.
 
+        If 'capture' is set to True, everything written to (or read from) the
+            Redirect is also kept in memory, and is available from
+            Redirect.getvalue() (even after closing), so output can be checked
+            without writing it to a file, as in:
+
+            with Redirect(sys.stdout, maintain=False, capture=True) as Out:
+                <desired tracked code>
+            output = Out.getvalue()
+
+        If 'buffered' is set to True, writes are collected and passed on to
+            out_streams in chunks of about Redirect.buffer_size characters,
+            which is faster for code which prints a lot (about 1.05 rather
+            than 1.39 microseconds per print in Benchmarks.py, depending on
+            the machine), at the cost of out_streams lagging behind until the
+            Redirect is flushed (as by print(..., flush=True) or input()) or
+            closed.
+
+        For reading, out_streams can also include input given directly, as a
+            string of text or an iterable of lines (e.g. a list, or a generator
+            which produces lines as they're read), as in:
+
+            with Redirect(sys.stdin, ['Name', '10'], maintain=False):
+                <code which calls input()>
+
+            Lines are only taken from an iterable when they're needed, and
+            have a newline added if they don't end with one.
+
+        By default, redirecting a standard system stream replaces it for the
+            whole program. If 'local' is set to True, the stream is only
+            redirected for the current thread or asyncio task (and tasks it
+            starts), so tests running concurrently in one process can each
+            redirect the same stream, as in:
+
+            async def run_test(inputs):
+                with Redirect(sys.stdin, inputs, maintain=False, local=True):
+                    with Redirect(sys.stdout, maintain=False, capture=True,
+                                  local=True) as Out:
+                        await <desired tracked code>
+                return Out.getvalue()
+
+            Local Redirects must be closed in the thread or task which made
+            them.
+
         Automatically restores on Redirect.close() for in_stream a standard
             system stream (sys.stdout, sys.stderr, sys.stdin), as in:
 
@@ -504,9 +2617,22 @@ class Redirect(object):
         '''
         self._maintain = maintain  # store 'maintain' state internally
         self.in_stream = in_stream # back up in_stream for later restoring
+        self._capture = io.StringIO() if capture else None
+        self._buffered = buffered
+        self._pending = []       # buffered writes not yet passed on
+        self._pending_size = 0   # characters in self._pending
 
         # determine appropriate state (in_stream == system stream?)
-        if in_stream is sys.stdout:
+        self._context = None
+        self.IDLE_mode = False
+        local_name = local and Redirect._ContextStream.get_name(in_stream)
+        if local_name:
+            self.state = local_name
+            # redirect only this context's stream
+            self._context = Redirect._ContextStream.install(self.state)
+            self.in_stream = self._context.get()
+            self._context_token = self._context.var.set(self)
+        elif in_stream is sys.stdout:
             try:
                 # attempt to redirect IDLE direct shell writes
                 self._shell = sys.stdout.shell
@@ -532,12 +2658,14 @@ class Redirect(object):
             self.state = None
 
         # determine the list of output streams
-        self._out_streams = list(out_streams)
+        self._out_streams = [Redirect._as_stream(stream)
+                             for stream in out_streams]
         self.ext_streams = len(self._out_streams)
         if self._maintain:
             self._out_streams += [self.in_stream]
             if self.state is None:
                 self.ext_streams += 1 # standard streams not counted
+        self._update_open_streams()
 
     def __del__(self):
         ''' Clean up the streams in use. '''
@@ -549,7 +2677,7 @@ class Redirect(object):
         Only works if in_stream is stdout/stderr/stdin.
 
         '''
-        pass
+        return self
 
     def __exit__(self, *args):
         ''' Cleanup functionality for usage in 'with' statements.
@@ -569,17 +2697,17 @@ class Redirect(object):
                 ret += extra
                 size -= len(extra)
                 if size <= 0:
-                    return ret
+                    break
             else:
                 ret += stream.read()
-        return ret
+        return self._captured(ret)
 
     def readline(self, size=-1):
         ''' Wrapper function for 'readline', for multiple streams. '''
         for stream in self._get_open_streams():
             ret = stream.readline(size)
             if ret != '':
-                return ret
+                return self._captured(ret)
         return ''
 
     def readlines(self, hint=-1):
@@ -591,29 +2719,48 @@ class Redirect(object):
                 ret += extra
                 hint -= sum(len(line) for line in extra)
                 if hint <= 0:
-                    return ret
+                    break
             else:
                 ret += stream.readlines() 
+        self._captured(''.join(ret))
         return ret
 
     # write-mode stream functionality
     def write(self, message):
         ''' Wrapper function for 'write', to output to all desired streams. '''
-        for stream in self._get_open_streams():
-            stream.write(message)
+        if self._buffered:
+            self._pending.append(message)
+            self._pending_size += len(message)
+            if self._pending_size >= self.buffer_size:
+                self._write_pending()
+        else:
+            for stream in self._open_streams:
+                stream.write(message)
+        if self._capture is not None:
+            self._capture.write(message)
         return len(message)
 
     def writelines(self, lines):
         ''' Wrapper function for 'writelines', for multiple streams. '''
-        for line in lines:
-            self.write(line)
+        self.write(''.join(lines))
+
+    def _write_pending(self):
+        ''' Passes buffered writes on to the open streams. '''
+        if self._pending:
+            message = ''.join(self._pending)
+            self._pending = []
+            self._pending_size = 0
+            for stream in self._open_streams:
+                stream.write(message)
 
     def shell_write(self, message, *args, **kwargs):
         ''' Wrapper function for IDLE's sys.stdXXX.shell.write. '''
+        self._write_pending()
         for stream_id in range(self.ext_streams):
             stream = self._out_streams[stream_id]
             if stream is not None:
                 stream.write(message)
+        self._captured(message)
         if self._maintain:
             self._shell.write(message, *args, **kwargs)
         return len(message)
@@ -621,13 +2768,119 @@ class Redirect(object):
     # mode independent functionality
     def flush(self):
         ''' Wrapper for stream flush - flush all streams. '''
-        for stream in self._get_open_streams():
+        self._write_pending()
+        for stream in self._open_streams:
             stream.flush()
             #os.fsync(stream.fileno()) # unsure if necessary
 
     def _get_open_streams(self):
         ''' Get the currently open streams. '''
-        return [stream for stream in self._out_streams if stream is not None]
+        return self._open_streams
+
+    @staticmethod
+    def _as_stream(stream):
+        ''' Returns stream, with text and iterables of lines made readable.
+
+        Redirect._as_stream(stream/str/iterable[str]) -> stream
+
+        '''
+        if isinstance(stream, str):
+            return io.StringIO(stream)
+        if stream is None or hasattr(stream, 'readline') or \
+                hasattr(stream, 'write'):
+            return stream
+        return Redirect._Lines(stream)
+
+    class _Lines(object):
+        ''' A read-only stream which takes lines from an iterable as needed. '''
+        def __init__(self, lines):
+            ''' A stream of the lines in iterable 'lines'.
+
+            Constructor: Redirect._Lines(iterable[str])
+
+            '''
+            self._lines = iter(lines)
+            self._line = '' # the unread part of the current line
+
+        def readline(self, size=-1):
+            ''' Returns the next line (at most 'size' characters of it). '''
+            if not self._line:
+                try:
+                    self._line = next(self._lines)
+                except StopIteration:
+                    return ''
+                if not self._line.endswith('\n'):
+                    self._line += '\n'
+            if size is None or size < 0:
+                size = len(self._line)
+            line, self._line = self._line[:size], self._line[size:]
+            return line
+
+        def read(self, size=-1):
+            ''' Returns 'size' characters, or all remaining lines. '''
+            lines = []
+            while size is None or size != 0:
+                line = self.readline(size)
+                if not line:
+                    break
+                lines.append(line)
+                if size is not None and size > 0:
+                    size -= len(line)
+            return ''.join(lines)
+
+        def readlines(self, hint=-1):
+            ''' Returns the remaining lines, or lines until 'hint' characters.
+            '''
+            lines = []
+            length = 0
+            for line in iter(self.readline, ''):
+                lines.append(line)
+                length += len(line)
+                if hint is not None and 0 < hint <= length:
+                    break
+            return lines
+
+        def flush(self):
+            ''' Nothing to flush - the stream is read-only. '''
+            pass
+
+        def close(self):
+            ''' Stops taking lines (and closes the iterable, if possible). '''
+            close = getattr(self._lines, 'close', None)
+            if close is not None:
+                close() # e.g. a generator
+            self._lines = iter(())
+            self._line = ''
+
+    def _update_open_streams(self):
+        ''' Updates the list of open streams, after streams are changed. '''
+        self._open_streams = [stream for stream in self._out_streams
+                              if stream is not None]
+
+    def _captured(self, text):
+        ''' Records text in the capture buffer (if capturing), and returns it.
+
+        self._captured(str) -> str
+
+        '''
+        if self._capture is not None:
+            self._capture.write(text)
+        return text
+
+    def getvalue(self):
+        ''' Returns the text captured so far (None if not capturing).
+
+        self.getvalue() -> str/None
+
+        '''
+        if self._capture is not None:
+            return self._capture.getvalue()
+
+    def clear(self):
+        ''' Discards the text captured so far. '''
+        if self._capture is not None:
+            self._capture.seek(0)
+            self._capture.truncate()
 
     def replace_stream(self, stream_id, stream):
         ''' Replace the stream at 'stream_id' with stream.
@@ -637,7 +2890,9 @@ class Redirect(object):
 
         '''
         if stream_id < self.ext_streams:
+            self._write_pending() # the previous stream gets earlier writes
             self._out_streams[stream_id] = stream
+            self._update_open_streams()
 
     def close(self, *stream_ids):
         ''' Close all out_streams, or the streams specified by *stream_ids.
@@ -648,6 +2903,7 @@ class Redirect(object):
         streams = [] -> also restores in_stream if one of stdin/stdout/stderr.
 
         '''
+        self._write_pending()
         if stream_ids:
             for stream_id in stream_ids:
                 if stream_id < self.ext_streams:
@@ -655,12 +2911,15 @@ class Redirect(object):
                     if stream is not None:
                         stream.close()
                         self._out_streams[stream_id] = None
+            self._update_open_streams()
             return
 
         # streams unspecifed - clean up all streams and close as necessary
         # restore stdout/stderr/stdin if modified
         if None not in [self.in_stream, self.state]:
-            if self.state == 'stdout':
+            if self._context is not None:
+                self._context.restore(self._context_token, self.in_stream)
+            elif self.state == 'stdout':
                 sys.stdout = self.in_stream
                 if self.IDLE_mode:
                     assert sys.stdout.shell == self._shell, \
@@ -676,7 +2935,90 @@ class Redirect(object):
             if stream is not None:
                 stream.close()
                 self._out_streams[index] = None
+        self._update_open_streams()
                 
+    class _ContextStream(object):
+        ''' A standard stream which passes calls on to the stream of the
+            current context (thread or asyncio task).
+        '''
+        def __init__(self, name):
+            ''' Replaces sys.<name> with a stream which follows the context.
+
+            Contexts which haven't redirected the stream use the stream which
+                was replaced.
+
+            Constructor: Redirect._ContextStream(str)
+
+            '''
+            self.name = name
+            self.default = getattr(sys, name)
+            self.var = contextvars.ContextVar('Redirect.' + name)
+            self._users = 0 # local Redirects using this stream
+            setattr(sys, name, self)
+
+        @staticmethod
+        def install(name):
+            ''' Returns the _ContextStream for sys.<name>, installing it if
+                it isn't already.
+
+            Redirect._ContextStream.install(str) -> Redirect._ContextStream
+
+            '''
+            with Redirect._context_lock:
+                stream = Redirect._context_streams.get(name)
+                if stream is None or getattr(sys, name) is not stream:
+                    stream = Redirect._ContextStream(name)
+                    Redirect._context_streams[name] = stream
+                stream._users += 1
+                return stream
+
+        @staticmethod
+        def get_name(stream):
+            ''' Returns the name of the standard stream that stream is (e.g.
+                'stdout'), or None if it isn't one.
+
+            _ContextStreams, and the streams they replace, count as their
+                standard stream, as other threads may install or restore them
+                after stream was looked up.
+
+            Redirect._ContextStream.get_name(stream) -> str/None
+
+            '''
+            if isinstance(stream, Redirect._ContextStream):
+                return stream.name
+            with Redirect._context_lock:
+                for name in ('stdout', 'stderr', 'stdin'):
+                    installed = Redirect._context_streams.get(name)
+                    if stream is getattr(sys, name) or (installed is not None
+                            and stream is installed.default):
+                        return name
+            return None
+
+        def get(self):
+            ''' Returns the stream of the current context. '''
+            return self.var.get(self.default)
+
+        def restore(self, token, stream):
+            ''' Restores the stream of the current context from a local
+                Redirect, and uninstalls this stream once none are left.
+
+            self.restore(Token, stream) -> None
+
+            '''
+            try:
+                self.var.reset(token)
+            except ValueError:
+                self.var.set(stream) # token from a copy of this context
+            with Redirect._context_lock:
+                self._users -= 1
+                if self._users == 0 and getattr(sys, self.name) is self:
+                    setattr(sys, self.name, self.default)
+                    del Redirect._context_streams[self.name]
+
+        def __getattr__(self, attr):
+            ''' Gets attr from the stream of the current context. '''
+            return getattr(self.get(), attr)
+
 class MultiRedirect(Emulator):
     ''' A class for grouping Redirect instances. '''
     def __init__(self, *redirects):
@@ -696,6 +3038,18 @@ class MultiRedirect(Emulator):
         '''
         super().__init__(Redirect, *redirects)
 
+    def getvalue(self, ids=None):
+        ''' Returns a list of the text captured by each Redirect in 'ids' (in
+            the order they're stored).
+
+        Redirects which aren't capturing give None. By default, ids is set to
+            all ids in 'redirects'.
+
+        self.getvalue(iterable[int]) -> list[str/None]
+
+        '''
+        return [redirect.getvalue() for redirect in self._select(ids=ids)]
+
 if __name__ == '__main__':
     # test a basic testing suite
     
@@ -782,6 +3136,16 @@ if __name__ == '__main__':
                            "{!r} should contain the first line of {!r}".format(
                                self._err, self._in)
 
+        def test_captured_output(self):
+            ''' Testing stdout redirection to memory (no files). '''
+            # capture stdout in memory, do not display in shell
+            with Redirect(sys.stdout, maintain=False, capture=True) as Out:
+                print('testing')
+
+            assert Out.getvalue() == 'testing\n', \
+                   "captured output should be 'testing\\n', not {!r}".format(
+                       Out.getvalue())
+
     # create a folder for the test files, if one doesn't already exist
     if not os.path.isdir('test_files'):
         os.mkdir('test_files')
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+################################################################################
+# This file contains tests of the batch autograder. Run it from this folder    #
+# with:                                                                        #
+#                                                                              #
+#   python3 -m pytest test_Autograder.py                                       #
+################################################################################
+
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from Autograder import Autograder
+import TestRun as testrun # not 'from TestRun import', so pytest doesn't collect
+                          #  the TestRun classes as tests
+
+
+class GradeTests(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+
+    def add_submission(self, student, source):
+        ''' Adds an L1 exercise file with source for student. '''
+        student_dir = os.path.join(self.folder.name, student)
+        os.mkdir(student_dir)
+        with open(os.path.join(student_dir, 'L1_1_exercises.py'), 'w') as file:
+            file.write(source)
+
+    def test_submission_hangs_on_load(self):
+        ''' A submission which never finishes loading is graded as timed out,
+            without holding up the other submissions. '''
+        self.add_submission('hangs', 'while True:\n    pass\n')
+        self.add_submission('loads', 'my_int = 1\n')
+        grader = Autograder(self.folder.name, [1], workers=1, load_timeout=1)
+
+        start = time.time()
+        results = {student: (output, records) for student, _, _, _, output,
+                   records in grader.run()}
+        self.assertLess(time.time() - start, 30)
+
+        output, records = results['hangs']
+        self.assertIn('timed out', output)
+        record = json.loads(records)
+        self.assertEqual((record['type'], record['status']),
+                         ('grading', testrun.TestRun.TIMEOUT))
+
+        output, records = results['loads']
+        statuses = {record['test']: record['status'] for record in
+                    map(json.loads, records.splitlines())
+                    if record['type'] == 'test'}
+        self.assertEqual(statuses['test_my_int'], testrun.TestRun.PASS)
+
+    def test_grading_hangs(self):
+        ''' A submission whose tests hang is stopped, and the submissions
+            waiting for the same worker are still graded. '''
+        self.add_submission('a_hangs', 'import time\n'
+                            'class Hangs(object):\n'
+                            '    @property\n'
+                            '    def __class__(self): # used by isinstance\n'
+                            '        time.sleep(60)\n'
+                            'my_int = Hangs()\n')
+        for student in ('b', 'c', 'd'):
+            self.add_submission(student, "print('loaded')\nmy_int = 1\n")
+        grader = Autograder(self.folder.name, [1], workers=1, grade_timeout=2)
+
+        start = time.time()
+        results = {student: (output, records) for student, _, _, _, output,
+                   records in grader.run()}
+        self.assertLess(time.time() - start, 30)
+
+        output, records = results['a_hangs']
+        self.assertIn('Grading timed out', output)
+        for student in ('b', 'c', 'd'):
+            output, records = results[student]
+            statuses = {record['test']: record['status'] for record in
+                        map(json.loads, records.splitlines())
+                        if record['type'] == 'test'}
+            self.assertEqual(statuses['test_my_int'], testrun.TestRun.PASS)
+            # printed output isn't saved in the student's folder
+            self.assertEqual(os.listdir(os.path.join(self.folder.name,
+                                                     student)),
+                             ['L1_1_exercises.py'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,833 @@
+#!/usr/bin/env python3
+################################################################################
+# This file contains tests of the TestRun module itself. Run it from this      #
+# folder with:                                                                 #
+#                                                                              #
+#   python3 -m pytest test_TestRun.py                                          #
+################################################################################
+
+import asyncio
+import contextlib
+import gc
+import importlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import unittest.mock
+import weakref
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import TestRun as testrun # not 'from TestRun import', so pytest doesn't collect
+                          #  the TestRun classes as tests
+
+
+class WorkerPoolTests(unittest.TestCase):
+    class Suite(testrun.TestRun):
+        pid_file = None # file each test_pid process is appended to
+
+        def test_pid(self):
+            ''' Records the process running the test. '''
+            with open(self.pid_file, 'a') as pids:
+                pids.write('{}\n'.format(os.getpid()))
+
+        def test_hangs(self):
+            ''' Takes longer than any timeout. '''
+            time.sleep(60)
+
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.Suite.pid_file = os.path.join(folder.name, 'pids.txt')
+        self.addCleanup(setattr, self.Suite, 'pid_file', None)
+
+    def get_pid(self, pool):
+        ''' Returns the process of the worker which ran test_pid. '''
+        pool.run_test(self.Suite(), 'test_pid', False, 5)
+        with open(self.Suite.pid_file) as pids:
+            return int(pids.read().split()[-1])
+
+    def test_worker_reused(self):
+        ''' Tests are run one after another in the same worker, which is
+            replaced if a test times out. '''
+        with testrun.WorkerPool() as pool:
+            pid = self.get_pid(pool)
+            self.assertNotEqual(pid, os.getpid())
+            self.assertEqual(self.get_pid(pool), pid)
+
+            start = time.time()
+            with self.assertRaises(TimeoutError):
+                pool.run_test(self.Suite(), 'test_hangs', False, 0.5)
+            self.assertLess(time.time() - start, 10)
+            self.assertNotIn(self.get_pid(pool), (pid, os.getpid()))
+
+    def test_run_tests(self):
+        ''' Suites run with a pool report the same results. '''
+        suite = self.Suite()
+        with testrun.WorkerPool() as pool, \
+                contextlib.redirect_stdout(io.StringIO()):
+            suite.pool = pool
+            suite.run_tests(timeout=0.5)
+        self.assertEqual(suite._last_failed, ['test_hangs'])
+        with open(self.Suite.pid_file) as pids:
+            self.assertNotEqual(int(pids.read()), os.getpid())
+
+
+class JsonResultTests(unittest.TestCase):
+    def test_json_lines(self):
+        ''' A record is written for each test, then a summary record. '''
+        class Suite(testrun.TestRun):
+            def test_a(self):
+                ''' Passes. '''
+                pass
+            def test_b(self):
+                ''' Fails. '''
+                assert False, 'b is wrong'
+            def test_c(self):
+                ''' Raises an error. '''
+                raise ValueError('c is invalid')
+        results = io.StringIO()
+        with contextlib.redirect_stdout(io.StringIO()):
+            Suite().run_tests(section='JSON', results=results)
+        records = [json.loads(line) for line in
+                   results.getvalue().splitlines()]
+
+        self.assertEqual([(record['type'], record['suite'], record['test'],
+                           record['result']) for record in records[:-1]],
+                         [('test', 'Suite', 'test_a', 'PASS'),
+                          ('test', 'Suite', 'test_b', 'FAIL'),
+                          ('test', 'Suite', 'test_c', 'ERROR')])
+        self.assertTrue(records[1]['message'].startswith('b is wrong'))
+        self.assertIn('ValueError', records[2]['message'])
+        self.assertIn('c is invalid', records[2]['traceback'])
+        summary = records[-1]
+        self.assertEqual((summary['type'], summary['section'],
+                          summary['tests'], summary['passes'],
+                          summary['failures'], summary['errors']),
+                         ('summary', 'JSON', 3, 1, 1, 1))
+
+
+class TimingTests(unittest.TestCase):
+    def test_slowest(self):
+        ''' Tests record their wall and CPU time, and the slowest are listed
+            slowest first. '''
+        class Suite(testrun.TestRun):
+            def test_fast(self):
+                ''' Passes straight away. '''
+                pass
+            def test_sleeps(self):
+                ''' Waits without using the CPU. '''
+                time.sleep(0.4)
+            def test_spins(self):
+                ''' Uses the CPU. '''
+                end = time.process_time() + 0.15
+                while time.process_time() < end:
+                    pass
+        results = io.StringIO()
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            Suite().run_tests(results=results, slowest=2)
+        records = {record['test']: record for record in
+                   map(json.loads, results.getvalue().splitlines()[:-1])}
+        self.assertGreaterEqual(records['test_sleeps']['duration'], 0.4)
+        self.assertLess(records['test_sleeps']['cpu_time'], 0.1)
+        self.assertGreaterEqual(records['test_spins']['cpu_time'], 0.15)
+
+        listed = output.getvalue().split('Slowest tests:')[1].split()
+        self.assertEqual([word for word in listed if word.startswith('test_')],
+                         ['test_sleeps', 'test_spins'])
+
+
+class CalibrationTests(unittest.TestCase):
+    class Suite(testrun.TestRun):
+        def test_sleeps(self):
+            ''' Waits without using the CPU. '''
+            time.sleep(0.2)
+
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        for name in ('timeout_cache', 'calibrate', '_timeout_data'):
+            self.addCleanup(setattr, testrun.TestRun, name,
+                            getattr(testrun.TestRun, name))
+        testrun.TestRun.timeout_cache = os.path.join(folder.name,
+                                                     'timeouts.json')
+        self.checker_hash = self.Suite._get_checker_hash()
+        self.method = testrun.TestRun._get_start_method()
+
+    def write_cache(self, data):
+        ''' Replaces the timeout cache with data, as a newer file. '''
+        with open(testrun.TestRun.timeout_cache, 'w') as cache:
+            json.dump(data, cache)
+        modified = time.time_ns() + 10 ** 9 * len(data) # always changes
+        os.utime(testrun.TestRun.timeout_cache, ns=(modified, modified))
+
+    def test_calibration(self):
+        ''' Calibrating records each passing test's duration, and the start-up
+            time of a test process, which both set the adaptive timeout. '''
+        testrun.TestRun.calibrate = True
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.Suite().run_tests()
+        with open(testrun.TestRun.timeout_cache) as cache:
+            entry = json.load(cache)[self.checker_hash]
+        self.assertEqual(entry['checker'], os.path.abspath(__file__))
+        baseline = entry['suites']['Suite']['test_sleeps']
+        startup = entry['startup'][self.method]
+        self.assertGreaterEqual(baseline, 0.2)
+        self.assertGreater(startup, 0)
+
+        testrun.TestRun.calibrate = False
+        self.assertEqual(self.Suite()._get_timeout('test_sleeps'),
+                         round(max(1, 10 * baseline) + startup, 2))
+
+    def test_cache_read(self):
+        ''' Adaptive timeouts follow changes to the timeout cache, and fall
+            back to the default timeout for unknown tests and checkers. '''
+        suite = self.Suite(timeout=7)
+        self.assertEqual(suite._get_timeout('test_sleeps'), 7)
+
+        self.write_cache({self.checker_hash: {'checker': __file__,
+            'suites': {'Suite': {'test_sleeps': 0.5}},
+            'startup': {self.method: 0.25, 'other': 3}}})
+        self.assertEqual(suite._get_timeout('test_sleeps'), 5.25)
+        self.assertEqual(suite._get_timeout('test_sleeps', 2), 2)
+        self.assertEqual(suite._get_timeout('test_other'), 7)
+
+        # uncalibrated start methods get the longest recorded start-up
+        self.write_cache({self.checker_hash: {'checker': __file__,
+            'suites': {'Suite': {'test_sleeps': 0.01}},
+            'startup': {'other': 0.5, 'another': 0.25}}})
+        self.assertEqual(suite._get_timeout('test_sleeps'), 1.5)
+
+        self.write_cache({'other checker': {'checker': __file__,
+            'suites': {'Suite': {'test_sleeps': 0.5}}}})
+        self.assertEqual(suite._get_timeout('test_sleeps'), 7)
+
+
+@unittest.skipIf(testrun.resource is None, 'resource limits are unavailable')
+class LimitTests(unittest.TestCase):
+    class Suite(testrun.TestRun):
+        def test_allocates(self):
+            ''' Allocates more memory than allowed. '''
+            data = bytearray(2**30)
+
+        def test_small(self):
+            ''' Allocates a little memory. '''
+            data = bytearray(2**20)
+
+        def test_spins(self):
+            ''' Uses the CPU forever. '''
+            while True:
+                pass
+
+    def test_memory_limit(self):
+        ''' Tests which allocate past the memory limit are reported as
+            exceeding it, without affecting other tests. '''
+        suite = self.Suite()
+        suite.memory_limit = 2**27
+        self.assertEqual(suite.run_test('test_allocates', False),
+                         testrun.TestRun.MEMORY_EXCEEDED)
+        self.assertEqual(suite.run_test('test_small', False),
+                         testrun.TestRun.PASS)
+
+    def test_cpu_limit(self):
+        ''' Tests which use more CPU time than allowed are timed out. '''
+        suite = self.Suite(timeout=30)
+        suite.cpu_limit = 1
+        start = time.time()
+        self.assertEqual(suite.run_test('test_spins', False),
+                         testrun.TestRun.TIMEOUT)
+        self.assertLess(time.time() - start, 10)
+
+
+class FailFastTests(unittest.TestCase):
+    @staticmethod
+    def run_suite(suite, **kwargs):
+        ''' Returns the (test, result name) of each test in a run of suite. '''
+        results = io.StringIO()
+        with contextlib.redirect_stdout(io.StringIO()):
+            suite.run_tests(results=results, **kwargs)
+        return [(record['test'], record['result']) for record in
+                map(json.loads, results.getvalue().splitlines()[:-1])]
+
+    def test_fail_fast(self):
+        ''' Tests after the first which doesn't pass are skipped. '''
+        class Suite(testrun.TestRun):
+            def test_a(self):
+                ''' Passes. '''
+                pass
+            def test_b(self):
+                ''' Fails. '''
+                assert False, 'b is wrong'
+            def test_c(self):
+                ''' Passes. '''
+                pass
+        self.assertEqual(self.run_suite(Suite(), fail_fast=True),
+                         [('test_a', 'PASS'), ('test_b', 'FAIL'),
+                          ('test_c', 'SKIPPED')])
+        self.assertEqual(self.run_suite(Suite()),
+                         [('test_a', 'PASS'), ('test_b', 'FAIL'),
+                          ('test_c', 'PASS')])
+
+    def test_depends_on(self):
+        ''' Tests run after the tests they depend on, and are skipped if
+            any of them don't pass. '''
+        class Suite(testrun.TestRun):
+            @testrun.TestRun.depends_on('test_c')
+            def test_a(self):
+                ''' Passes. '''
+                pass
+            @testrun.TestRun.depends_on('test_c', 'test_d')
+            def test_b(self):
+                ''' Passes, if run. '''
+                pass
+            def test_c(self):
+                ''' Passes. '''
+                pass
+            def test_d(self):
+                ''' Fails. '''
+                assert False, 'd is wrong'
+        self.assertEqual(self.run_suite(Suite(), workers=2),
+                         [('test_c', 'PASS'), ('test_d', 'FAIL'),
+                          ('test_a', 'PASS'), ('test_b', 'SKIPPED')])
+
+
+class RegistryTests(unittest.TestCase):
+    def test_replaced_test_method(self):
+        ''' Replacing a test method runs the new method. '''
+        class Suite(testrun.TestRun):
+            def test_a(self):
+                ''' Fails. '''
+                assert False, 'original test'
+        suite = Suite()
+        self.assertEqual(suite.run_test('test_a', False), testrun.TestRun.FAIL)
+
+        def test_a(self):
+            ''' Passes. '''
+            pass
+        Suite.test_a = test_a
+        self.assertEqual(suite.run_test('test_a', False), testrun.TestRun.PASS)
+
+    def test_instance_override(self):
+        ''' A test set on an instance takes priority over the class's. '''
+        class Suite(testrun.TestRun):
+            def test_a(self):
+                ''' Passes. '''
+                pass
+        suite = Suite()
+        def test_a():
+            ''' Fails. '''
+            assert False, 'instance test'
+        suite.test_a = test_a
+        self.assertEqual(suite.run_test('test_a', False), testrun.TestRun.FAIL)
+
+    def test_instance_test(self):
+        ''' Tests set only on an instance are found and run. '''
+        class Suite(testrun.TestRun):
+            def test_a(self):
+                ''' Passes. '''
+                pass
+        suite = Suite()
+        def test_b():
+            ''' Fails. '''
+            assert False, 'instance test'
+        suite.test_b = test_b
+        self.assertEqual(suite.get_test_methods(), ['test_a', 'test_b'])
+        with contextlib.redirect_stdout(io.StringIO()):
+            suite.run_tests()
+        self.assertEqual(suite._last_failed, ['test_b'])
+
+    def test_registry_reused(self):
+        ''' Test methods are only found again when a test method changes. '''
+        class Base(testrun.TestRun):
+            def test_a(self):
+                ''' Passes. '''
+                pass
+        class Suite(Base):
+            pass
+        registry = Suite._get_registry()
+        Suite().run_test('test_a', False)
+        self.assertIs(Suite._get_registry(), registry)
+
+        Base.test_b = Base.test_a
+        self.assertEqual(Suite().get_test_methods(), ['test_a', 'test_b'])
+        del Base.test_b
+        self.assertEqual(Suite().get_test_methods(), ['test_a'])
+
+
+class ProfileTests(unittest.TestCase):
+    def test_profiled_timeout_scaled(self):
+        ''' Profiled tests get longer than their timeout, as profiling slows
+            them down. '''
+        class Suite(testrun.TestRun):
+            def test_sleep(self):
+                ''' Takes longer than the timeout. '''
+                time.sleep(0.5)
+        suite = Suite(timeout=0.3)
+        self.assertEqual(suite.run_test('test_sleep', False),
+                         testrun.TestRun.TIMEOUT)
+        with tempfile.TemporaryDirectory() as folder:
+            self.assertEqual(suite.run_test('test_sleep', False,
+                                            profile=folder),
+                             testrun.TestRun.PASS)
+
+
+class ScratchTests(unittest.TestCase):
+    def test_direct_scratch_dir(self):
+        ''' A scratch folder is available when calling a test directly, and
+            removed with the suite. '''
+        class Suite(testrun.TestRun):
+            def test_write(self):
+                ''' Writes a file to the scratch folder. '''
+                with open(os.path.join(self.scratch_dir, 'out.txt'), 'w') as f:
+                    f.write('output')
+        suite = Suite()
+        suite.test_write()
+        scratch_dir = suite.scratch_dir
+        self.assertEqual(os.listdir(scratch_dir), ['out.txt'])
+        self.assertEqual(suite.run_test('test_write', False),
+                         testrun.TestRun.PASS)
+        self.assertEqual(suite.scratch_dir, scratch_dir)
+        del suite
+        gc.collect()
+        self.assertFalse(os.path.exists(scratch_dir))
+
+
+class EmulatorTests(unittest.TestCase):
+    def test_generator_ids(self):
+        ''' ids can be given as a generator, including when cached. '''
+        class Value(object):
+            def __init__(self, value):
+                self.value = value
+            def get(self):
+                return self.value
+        emulator = testrun.Emulator(Value, *map(Value, range(4)))
+        for repeat in range(2):
+            self.assertEqual(emulator.get(ids=(i for i in (0, 2))), [0, 2])
+
+    def test_dropped_when_unused(self):
+        ''' An Emulator is deleted as soon as it is no longer used, even once
+            its wrapped methods are cached, so its objects are cleaned up
+            (here flushing their buffered writes) without garbage collection.
+        '''
+        sinks = [RedirectTests.Sink(), RedirectTests.Sink()]
+        redirects = testrun.MultiRedirect(*(testrun.Redirect(io.StringIO(),
+            sink, maintain=False, buffered=True) for sink in sinks))
+        redirects.write('text')
+        redirects.write(' more', ids=[1])
+        self.assertEqual([sink.getvalue() for sink in sinks], ['', ''])
+
+        gc.disable()
+        try:
+            deleted = []
+            weakref.finalize(redirects, deleted.append, True)
+            del redirects
+            self.assertEqual(deleted, [True])
+            self.assertEqual([sink.getvalue() for sink in sinks],
+                             ['text', 'text more'])
+        finally:
+            gc.enable()
+
+
+class RedirectTests(unittest.TestCase):
+    def test_local_threads(self):
+        ''' Threads capture their own output with local Redirects, and the
+            standard streams are restored once they have all finished. '''
+        stdout = sys.stdout
+        captured = {}
+        start = threading.Barrier(8)
+        def capture(index):
+            start.wait()
+            for repeat in range(50):
+                with testrun.Redirect(sys.stdout, maintain=False, capture=True,
+                                      local=True) as Out:
+                    print(index)
+                    time.sleep(0.0001)
+                    print(index)
+                captured.setdefault(index, []).append(Out.getvalue())
+
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6) # switch threads as often as possible
+        try:
+            threads = [threading.Thread(target=capture, args=(index,))
+                       for index in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(switch_interval)
+
+        self.assertIs(sys.stdout, stdout)
+        for index in range(8):
+            self.assertEqual(captured[index], ['{0}\n{0}\n'.format(index)] * 50)
+
+    def test_local_tasks(self):
+        ''' asyncio tasks capture their own output with local Redirects, and
+            the standard streams are restored once they have all finished. '''
+        stdout, stdin = sys.stdout, sys.stdin
+        async def capture(index):
+            with testrun.Redirect(sys.stdin, [str(index)], maintain=False,
+                                  local=True):
+                with testrun.Redirect(sys.stdout, maintain=False,
+                                      capture=True, local=True) as Out:
+                    for repeat in range(3):
+                        print(index)
+                        await asyncio.sleep(0.001 * (index % 3))
+                    print(input())
+            return Out.getvalue()
+
+        async def capture_all():
+            return await asyncio.gather(*map(capture, range(8)))
+
+        outputs = asyncio.run(capture_all())
+        self.assertEqual(outputs, ['{0}\n'.format(index) * 4
+                                   for index in range(8)])
+        self.assertIs(sys.stdout, stdout)
+        self.assertIs(sys.stdin, stdin)
+
+
+    class Sink(object):
+        ''' An out stream which records what reaches it, even once closed. '''
+        def __init__(self):
+            self.writes = []
+        def write(self, message):
+            self.writes.append(message)
+        def flush(self):
+            pass
+        def close(self):
+            pass
+        def getvalue(self):
+            return ''.join(self.writes)
+
+    def test_buffered_flush(self):
+        ''' Buffered writes are held until flushed or closed. '''
+        sink = self.Sink()
+        with testrun.Redirect(sys.stdout, sink, maintain=False, buffered=True):
+            print('a')
+            self.assertEqual(sink.getvalue(), '')
+            sys.stdout.flush()
+            self.assertEqual(sink.getvalue(), 'a\n')
+            print('b', flush=True)
+            self.assertEqual(sink.getvalue(), 'a\nb\n')
+            print('c')
+            self.assertEqual(sink.getvalue(), 'a\nb\n')
+        self.assertEqual(sink.getvalue(), 'a\nb\nc\n')
+        self.assertEqual(len(sink.writes), 3)
+
+    def test_buffered_input(self):
+        ''' Buffered writes are passed on before input is read. '''
+        sink = self.Sink()
+        seen = [] # output written before each line was read
+        def lines():
+            for line in ('x', 'y'):
+                seen.append(sink.getvalue())
+                yield line
+        with testrun.Redirect(sys.stdin, lines(), maintain=False), \
+                testrun.Redirect(sys.stdout, sink, maintain=False,
+                                 buffered=True):
+            print('first')
+            self.assertEqual(input('? '), 'x')
+            print('second')
+            self.assertEqual(input(), 'y')
+        self.assertEqual(seen, ['first\n? ', 'first\n? second\n'])
+
+    def test_lines(self):
+        ''' Lines are read from an iterable as needed, with newlines added. '''
+        lines = testrun.Redirect._Lines(['ab', 'cd\n', 'ef'])
+        self.assertEqual(lines.readline(1), 'a')
+        self.assertEqual(lines.readline(), 'b\n')
+        self.assertEqual(lines.read(4), 'cd\ne')
+        self.assertEqual(lines.read(-1), 'f\n')
+        self.assertEqual(lines.read(), '')
+        self.assertEqual(lines.readline(), '')
+
+        lines = testrun.Redirect._Lines(iter(['ab', 'cd']))
+        self.assertEqual(lines.read(), 'ab\ncd\n')
+        lines = testrun.Redirect._Lines(['ab', 'cd', 'ef'])
+        self.assertEqual(lines.readlines(4), ['ab\n', 'cd\n'])
+        self.assertEqual(lines.readlines(), ['ef\n'])
+
+    def test_input_fallback(self):
+        ''' With maintain=True, input is read from the real stream once the
+            given lines run out. '''
+        real_stdin = io.StringIO('typed\n')
+        with contextlib.redirect_stdout(io.StringIO()), \
+                unittest.mock.patch('sys.stdin', real_stdin):
+            with testrun.Redirect(sys.stdin, ['given']) as In:
+                self.assertEqual(input(), 'given')
+                self.assertEqual(input(), 'typed')
+            self.assertIs(sys.stdin, real_stdin)
+
+
+class TestGroupTests(unittest.TestCase):
+    def test_suite_process_exits(self):
+        ''' Tests of a suite whose process dies are reported as errors. '''
+        class Passes(testrun.TestRun):
+            def test_a(self):
+                ''' Passes. '''
+                pass
+        class Exits(Passes):
+            def run_tests(self, *args, **kwargs):
+                ''' Exits the suite process without sending any results. '''
+                os._exit(3)
+        exits = Exits()
+        results = io.StringIO()
+        testrun.TestGroup(Passes(), exits).run_tests(suites=2,
+                                                     results=results)
+        records = [json.loads(line) for line in results.getvalue().splitlines()]
+        statuses = [(record['suite'], record['status'])
+                    for record in records if record['type'] == 'test']
+        self.assertEqual(statuses, [('Passes', testrun.TestRun.PASS),
+                                    ('Exits', testrun.TestRun.ERROR)])
+        self.assertEqual(records[-1]['errors'], 1)
+        self.assertEqual(exits._last_failed, ['test_a'])
+
+
+class StartMethodTests(unittest.TestCase):
+    CHECKER = '''
+import os, sys
+sys.path.insert(0, {lessons!r})
+from TestRun import TestRun
+import start_suite
+
+class MainTests(TestRun):
+    def test_reference(self):
+        \'\'\' Uses a reference solution defined in the main block. \'\'\'
+        assert reference() == 1, 'wrong reference'
+
+if __name__ == '__main__':
+    def reference():
+        return 1
+    TestRun.start_method = sys.argv[1]
+    MainTests().run_tests(workers=2)
+    start_suite.ModuleTests(os.getpid(), sys.argv[1]).run_tests(workers=2)
+'''
+    SUITE = '''
+import os
+from TestRun import TestRun
+
+class ModuleTests(TestRun):
+    def __init__(self, main_pid, start_method):
+        super().__init__()
+        self._main_pid = main_pid
+        self._start_method = start_method
+
+    def test_server(self):
+        \'\'\' Checks the test was started by a fork server if used. \'\'\'
+        assert (self._start_method == 'forkserver') == \\
+               (os.getppid() != self._main_pid), 'started by the wrong process'
+'''
+
+    def run_checker(self, start_method):
+        ''' Returns the output of running a checker with start_method. '''
+        with tempfile.TemporaryDirectory() as folder:
+            lessons = os.path.dirname(os.path.abspath(__file__))
+            with open(os.path.join(folder, 'checker.py'), 'w') as checker:
+                checker.write(self.CHECKER.format(lessons=lessons))
+            with open(os.path.join(folder, 'start_suite.py'), 'w') as suite:
+                suite.write(self.SUITE)
+            return subprocess.run([sys.executable, 'checker.py', start_method],
+                                  cwd=folder, capture_output=True, text=True,
+                                  timeout=120).stdout
+
+    def test_script_suites(self):
+        ''' Suites defined in the script being run can use reference solutions
+            from its main block, whatever the start method. '''
+        for start_method in ('fork', 'spawn', 'forkserver'):
+            with self.subTest(start_method=start_method):
+                output = self.run_checker(start_method)
+                self.assertEqual(output.count('Ran 1 tests, with 1 pass,'), 2)
+
+
+class ResultCacheTests(unittest.TestCase):
+    STUDENT = 'my_int = {}\n'
+    CHECKER = '''
+from cache_student import *
+import TestRun
+
+class CacheTests(TestRun.TestRun):
+    fixtures = ['cache_fixture.txt']
+
+    def __init__(self, expected=1):
+        super().__init__()
+        self._expected = expected
+
+    def test_my_int(self):
+        \'\'\' Testing 'my_int' correctness. \'\'\'
+        assert my_int == self._expected, "'my_int' should be {}".format(
+            self._expected)
+
+    def test_fixture(self):
+        \'\'\' Testing the fixture is as expected. \'\'\'
+        with open('cache_fixture.txt') as fixture:
+            assert fixture.read() == 'expected', 'unexpected fixture'
+'''
+    MODULES = ('cache_student', 'cache_helper', 'cache_checker')
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        sys.path.insert(0, self.folder.name)
+        self.addCleanup(sys.path.remove, self.folder.name)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.folder.name)
+        for module in self.MODULES:
+            self.addCleanup(sys.modules.pop, module, None)
+        self.addCleanup(setattr, testrun.TestRun, 'result_cache', None)
+        testrun.TestRun.result_cache = os.path.join(self.folder.name,
+                                                    'results.json')
+        self.version = 0
+        self.write_file('cache_fixture.txt', 'expected')
+        self.write_file('cache_checker.py', self.CHECKER)
+
+    def write_file(self, filename, text):
+        ''' Writes text to filename, with a new modification time. '''
+        path = os.path.join(self.folder.name, filename)
+        with open(path, 'w') as file:
+            file.write(text)
+        # make sure the modification time changes, however fast this runs
+        self.version += 1
+        mtime = os.stat(path).st_mtime_ns + self.version * 10**9
+        os.utime(path, ns=(mtime, mtime))
+
+    def write_student(self, my_int):
+        ''' Writes the student's module, and (re)imports the checker. '''
+        self.write_file('cache_student.py', self.STUDENT.format(my_int))
+        return self.import_checker()
+
+    def import_checker(self):
+        ''' Returns the checker, (re)imported with the latest modules. '''
+        importlib.invalidate_caches()
+        for module in self.MODULES:
+            sys.modules.pop(module, None)
+        return importlib.import_module('cache_checker')
+
+    def run_suite(self, suite):
+        ''' Returns the statuses from running the suite, and if they were
+            cached. '''
+        results = io.StringIO()
+        with testrun.Redirect(sys.stdout, maintain=False,
+                              capture=True) as output:
+            suite.run_tests(results=results)
+        statuses = [json.loads(line)['status'] for line in
+                    results.getvalue().splitlines()[:-1]]
+        return statuses, 'reused from the result cache' in output.getvalue()
+
+    def test_student_variable_changed(self):
+        ''' Changing a star-imported variable invalidates cached results. '''
+        checker = self.write_student(1)
+        PASS, FAIL = testrun.TestRun.PASS, testrun.TestRun.FAIL
+        self.assertEqual(self.run_suite(checker.CacheTests()),
+                         ([PASS, PASS], False))
+        self.assertEqual(self.run_suite(checker.CacheTests()),
+                         ([PASS, PASS], True))
+
+        checker = self.write_student(2)
+        self.assertEqual(self.run_suite(checker.CacheTests()),
+                         ([PASS, FAIL], False))
+
+    def test_suite_arguments_changed(self):
+        ''' Suites constructed differently don't share cached results. '''
+        checker = self.write_student(1)
+        PASS, FAIL = testrun.TestRun.PASS, testrun.TestRun.FAIL
+        self.assertEqual(self.run_suite(checker.CacheTests(1)),
+                         ([PASS, PASS], False))
+        self.assertEqual(self.run_suite(checker.CacheTests(2)),
+                         ([PASS, FAIL], False))
+        self.assertEqual(self.run_suite(checker.CacheTests(1)),
+                         ([PASS, PASS], True))
+
+    def test_fixture_changed(self):
+        ''' Changing a fixture file invalidates cached results. '''
+        checker = self.write_student(1)
+        PASS, FAIL = testrun.TestRun.PASS, testrun.TestRun.FAIL
+        self.assertEqual(self.run_suite(checker.CacheTests()),
+                         ([PASS, PASS], False))
+        self.write_file('cache_fixture.txt', 'changed')
+        self.assertEqual(self.run_suite(checker.CacheTests()),
+                         ([FAIL, PASS], False))
+
+    def test_indirect_module_changed(self):
+        ''' Changing a module the student's module imports invalidates cached
+            results. '''
+        self.STUDENT = 'import cache_helper as _helper\n' + \
+                       'my_int = _helper.get_int()\n'
+        self.write_file('cache_helper.py', 'def get_int():\n    return 1\n')
+        checker = self.write_student(None)
+        PASS, FAIL = testrun.TestRun.PASS, testrun.TestRun.FAIL
+        self.assertEqual(self.run_suite(checker.CacheTests()),
+                         ([PASS, PASS], False))
+        self.assertEqual(self.run_suite(checker.CacheTests()),
+                         ([PASS, PASS], True))
+
+        self.write_file('cache_helper.py', 'def get_int():\n    return 2\n')
+        checker = self.import_checker()
+        self.assertEqual(self.run_suite(checker.CacheTests()),
+                         ([PASS, FAIL], False))
+
+    def test_run_failed_tests(self):
+        ''' Failed tests are re-run rather than reused by run_failed_tests. '''
+        checker = self.write_student(2)
+        suite = checker.CacheTests()
+        self.run_suite(suite)
+        self.assertEqual(self.run_suite(suite)[1], True)
+        with testrun.Redirect(sys.stdout, maintain=False,
+                              capture=True) as output:
+            suite.run_failed_tests()
+        self.assertIn('1 failure', output.getvalue())
+        self.assertNotIn('reused from the result cache', output.getvalue())
+
+    def test_results_merged(self):
+        ''' Results saved by suites at the same time are all kept. '''
+        testrun.TestRun._save_result_cache({'a': {'used': 1}})
+        testrun.TestRun._save_result_cache({'b': {'used': 2}})
+        testrun.TestRun._save_result_cache({'a': {'used': 0, 'old': True}})
+        self.assertEqual(testrun.TestRun._load_result_cache(),
+                         {'a': {'used': 1}, 'b': {'used': 2}})
+
+
+class LargeResultTests(unittest.TestCase):
+    class Suite(testrun.TestRun):
+        ''' Tests with results too big to send through a pipe at once. '''
+        def test_00_fails(self):
+            ''' Fails straight away. '''
+            print('x' * 2**17)
+            assert False, 'y' * 2**17
+
+    for index in range(1, 12):
+        def test(self, index=index):
+            ''' Passes after a short time. '''
+            print('x' * 2**17)
+            time.sleep(0.02 * (index % 3))
+        setattr(Suite, 'test_{:02}_passes'.format(index), test)
+    del index, test
+
+    def test_large_result(self):
+        ''' Large results are received in full. '''
+        results = io.StringIO()
+        with testrun.Redirect(sys.stdout, maintain=False, capture=True):
+            self.Suite().run_tests(['test_00_fails'], results=results)
+        record = json.loads(results.getvalue().splitlines()[0])
+        # (pytest may add details of the assert to the message)
+        self.assertTrue(record['message'].startswith('y' * 2**17))
+
+    def test_cancelled_results(self):
+        ''' Runs cancelled while large results are being sent finish. '''
+        suite = self.Suite()
+        with testrun.Redirect(sys.stdout, maintain=False, capture=True):
+            for repeat in range(3):
+                suite.run_tests(workers=6, fail_fast=True)
+                self.assertEqual(suite._last_failed[0], 'test_00_fails')
+            with testrun.WorkerPool(6) as pool:
+                suite.pool = pool
+                suite.run_tests(workers=6, fail_fast=True)
+                self.assertEqual(suite._last_failed[0], 'test_00_fails')
+
+
+if __name__ == '__main__':
+    unittest.main()